@@ -0,0 +1,147 @@
+"""
+Compara, en páginas por segundo, la extracción de datos de las páginas de
+gráfico de Digital Decade guardadas en crudo:
+- actual: BeautifulSoup con html.parser, cinco parseos por página (tres
+  comprobaciones en la recogida y dos pasos del procesado).
+- una pasada: BeautifulSoup con html.parser, un único parseo.
+- lxml: extraccion_desi.extraer_grafico, un único parseo con lxml.
+
+Las páginas salen de los JSON de data/raw/digital_decade (las entradas
+guardadas como HTML). Si no hay ninguno, se generan páginas sintéticas con la
+misma estructura de filtros y barras.
+
+Uso (desde la raíz del repositorio):
+    python benchmarks/bench_extraccion_html.py [-d DIRECTORIO] [-n PAGINAS] [-r REPETICIONES]
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bs4 import BeautifulSoup
+
+from microservicio_ingesta.scripts.ingestion.collect_base.extraccion_desi import GraficoDesi, extraer_grafico
+
+PAISES = ["Austria", "Belgium", "Bulgaria", "Croatia", "Cyprus", "Czechia", "Denmark", "Estonia", "EU",
+          "Finland", "France", "Germany", "Greece", "Hungary", "Ireland", "Italy", "Latvia", "Lithuania",
+          "Luxembourg", "Malta", "Netherlands", "Poland", "Portugal", "Romania", "Slovakia", "Slovenia",
+          "Spain", "Sweden"]
+
+
+def cargar_paginas(directorio: Path) -> list[str]:
+    paginas = []
+    for ruta in sorted(directorio.glob("*.json")):
+        with open(ruta, encoding="utf-8") as f:
+            contenido = json.load(f)
+        for cods_nace in contenido.values():
+            paginas.extend(c for c in cods_nace.values() if isinstance(c, str) and c)
+    return paginas
+
+
+def generar_paginas(n: int) -> list[str]:
+    aleatorio = random.Random(0)
+    # Relleno con el marcado de navegación que acompaña al gráfico en la página real
+    relleno = "".join(
+        f'<div class="ecl-menu__item"><a class="ecl-link" href="/datasets/{i}">Sección {i}</a><span>{"texto " * 20}</span></div>'
+        for i in range(400)
+    )
+    paginas = []
+    for i in range(n):
+        barras = "".join(
+            f'<path fill="#004494" d="M {j} 0 L {j} 10 Z" aria-label="{pais}, {aleatorio.uniform(0, 100):.1f}%."></path>'
+            for j, pais in enumerate(PAISES)
+        )
+        paginas.append(
+            f'<html><body>{relleno}'
+            f'<div class="chart-filter"><label for="period">Period</label><div class="multiselect__tags"><span> {2024 - i % 10} </span></div></div>'
+            f'<div class="chart-filter"><label for="breakdown">Breakdown</label><div class="multiselect__tags"><span>Manufacturing</span></div></div>'
+            f'<svg><g class="highcharts-series-group"><path d="M 0 0"></path></g><g class="highcharts-tracker">{barras}</g></svg>'
+            f'</body></html>'
+        )
+    return paginas
+
+
+def _texto_filtro_bs4(soup, nombre):
+    etiqueta = soup.find("label", attrs={"for": nombre})
+    if not etiqueta:
+        return None
+    seleccion = etiqueta.find_parent("div", class_="chart-filter").select_one("div.multiselect__tags span")
+    return seleccion.text.strip() if seleccion else ""
+
+
+def _valores_bs4(soup):
+    valores = {}
+    for path in soup.select("g.highcharts-tracker path[aria-label]"):
+        etiqueta = path.get("aria-label")
+        if "," in etiqueta:
+            pais, valor = etiqueta.split(",", 1)
+            valor = valor.strip().rstrip(".%")
+            try:
+                valores[pais.strip()] = float(valor)
+            except ValueError:
+                valores[pais.strip()] = None
+    return valores
+
+
+def ruta_actual(content: str) -> GraficoDesi:
+    # Recogida: comprobar_respuesta_nace, obtener_anno_display, validar_valores_nulos
+    desglose = _texto_filtro_bs4(BeautifulSoup(content, "html.parser"), "breakdown")
+    anno = int(_texto_filtro_bs4(BeautifulSoup(content, "html.parser"), "period"))
+    _valores_bs4(BeautifulSoup(content, "html.parser"))
+    # Procesado: extraer_datos_de_html y obtener_anno_display
+    valores = _valores_bs4(BeautifulSoup(content, "html.parser"))
+    anno = int(_texto_filtro_bs4(BeautifulSoup(content, "html.parser"), "period"))
+    return GraficoDesi(anno, desglose, valores)
+
+
+def ruta_una_pasada(content: str) -> GraficoDesi:
+    soup = BeautifulSoup(content, "html.parser")
+    return GraficoDesi(int(_texto_filtro_bs4(soup, "period")), _texto_filtro_bs4(soup, "breakdown"), _valores_bs4(soup))
+
+
+def medir(funcion, paginas, repeticiones: int) -> float:
+    for content in paginas[:1]:
+        funcion(content)  # calentamiento
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        for content in paginas:
+            funcion(content)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return len(paginas) / mejor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-d", "--directorio", type=Path, default=Path("data/raw/digital_decade"))
+    parser.add_argument("-n", "--paginas", type=int, default=50, help="Páginas sintéticas si no hay guardadas")
+    parser.add_argument("-r", "--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+
+    paginas = cargar_paginas(args.directorio) if args.directorio.is_dir() else []
+    origen = f"guardadas en {args.directorio}"
+    if not paginas:
+        paginas = generar_paginas(args.paginas)
+        origen = "sintéticas"
+
+    # Las tres rutas deben extraer lo mismo
+    for content in paginas:
+        assert ruta_actual(content) == ruta_una_pasada(content) == extraer_grafico(content)
+
+    actual = medir(ruta_actual, paginas, args.repeticiones)
+    una_pasada = medir(ruta_una_pasada, paginas, args.repeticiones)
+    rapida = medir(extraer_grafico, paginas, args.repeticiones)
+
+    tamano = sum(len(content) for content in paginas) / len(paginas) / 1024
+    print(f"{len(paginas)} páginas {origen} ({tamano:.0f} KiB de media)")
+    print(f"actual (html.parser x5):     {actual:>10,.1f} páginas/s")
+    print(f"una pasada (html.parser x1): {una_pasada:>10,.1f} páginas/s  (x{una_pasada / actual:.1f})")
+    print(f"lxml (extraer_grafico):      {rapida:>10,.1f} páginas/s  (x{rapida / actual:.1f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Mide lo que cuesta importar la API en un proceso nuevo (arranque en frío y
+cada worker): tiempo de importación, memoria residente máxima y qué
+dependencias pesadas de la ingesta acaban cargadas.
+
+Uso (desde la raíz del repositorio):
+    python benchmarks/bench_importacion.py [-n REPETICIONES] [modulo ...]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+MODULOS_POR_DEFECTO = [
+    "microservicio_exposicion.main",
+    "database.modelos",
+    "modelos.enums",
+]
+
+# Dependencias que solo necesita la ingesta
+PESADAS = ["pandas", "pyaxis", "playwright", "bs4", "matplotlib", "openpyxl"]
+
+SONDA = """
+import json, resource, sys, time
+t = time.perf_counter()
+import {modulo}
+segundos = time.perf_counter() - t
+print(json.dumps({{
+    "segundos": segundos,
+    "rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "pesadas": [m for m in {pesadas!r} if m in sys.modules],
+    "modulos": len(sys.modules),
+}}))
+"""
+
+
+def medir(modulo: str) -> dict:
+    salida = subprocess.run(
+        [sys.executable, "-c", SONDA.format(modulo=modulo, pesadas=PESADAS)],
+        cwd=RAIZ, capture_output=True, text=True, check=True
+    ).stdout
+    # La última línea es la medida; las anteriores son prints de los módulos importados
+    return json.loads(salida.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modulos", nargs="*", default=MODULOS_POR_DEFECTO)
+    parser.add_argument("-n", "--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'módulo':<35} {'mediana (s)':>12} {'RSS máx (MB)':>13} {'módulos':>8}  pesadas cargadas")
+    for modulo in args.modulos:
+        medidas = [medir(modulo) for _ in range(args.repeticiones)]
+        mediana = statistics.median(m["segundos"] for m in medidas)
+        rss = max(m["rss_kb"] for m in medidas) / 1024
+        print(f"{modulo:<35} {mediana:>12.3f} {rss:>13.1f} {medidas[0]['modulos']:>8}  {', '.join(medidas[0]['pesadas']) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
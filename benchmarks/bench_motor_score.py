@@ -0,0 +1,188 @@
+"""
+Comprueba que el motor vectorizado (database.scores.scores_por_contexto) da los
+mismos scores que el cálculo anterior (agrupar las filas por contexto en Python
+y llamar a calcular_piramide en cada uno) y compara su velocidad en contextos
+por segundo, desde las filas de la consulta hasta el score de cada contexto.
+
+El conjunto de datos es fijo (semilla 0): varios países, años, sectores,
+tamaños y provincias, con las seis dimensiones y sus subdimensiones. Cada ruta
+recibe las filas tal como las devuelve su consulta: la anterior con valores
+Decimal de la columna Numeric e importancias en texto (mayúsculas, minúsculas,
+nulas o desconocidas); la vectorizada con los mismos valores ya convertidos a
+float y a peso en el SELECT (COLUMNAS_SCORE). El score global y el de cada
+dimensión deben coincidir al céntimo; si alguno difiere se listan los
+contextos y el script sale con código 1.
+
+Uso (desde la raíz del repositorio):
+    python benchmarks/bench_motor_score.py [-c CONTEXTOS] [-r REPETICIONES]
+"""
+import argparse
+import itertools
+import random
+import sys
+import time
+from collections import defaultdict, namedtuple
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from database.modelos.scores_brainnova import TODAS_PROVINCIAS
+from database.scores import MAPA_IMPORTANCIA, scores_por_contexto
+
+# Columnas de contexto de SENTENCIA_SCORES_CONTEXTO seguidas de las de score:
+# las que devolvía antes (valor Decimal, importancia en texto) y las de ahora
+CONTEXTO = "pais anio sector tamano_empresa provincia"
+FilaAnterior = namedtuple("FilaAnterior", CONTEXTO + " valor_calculado importancia_texto subdim_id dim_id dim_nombre dim_peso_porcentaje")
+Fila = namedtuple("Fila", CONTEXTO + " valor_calculado peso_importancia subdim_id dim_id dim_nombre dim_peso_porcentaje")
+
+DIMENSIONES = [
+    (1, "Emprendimiento e innovación", 10, 4),
+    (2, "Capital humano", 20, 3),
+    (3, "Ecosistema y colaboración", 15, 3),
+    (4, "Infraestructura digital", 20, 3),
+    (5, "Sostenibilidad digital", 5, 2),
+    (6, "Transformación digital", 30, 4),
+]
+IMPORTANCIAS = ["Alta", "Media", "Baja", "alta", "media", "baja", None, "Desconocida"]
+PAISES = ["España", "Francia", "Alemania", "Italia", "Portugal", "Polonia", "Suecia", "Grecia"]
+ANIOS = list(range(2015, 2025))
+SECTORES = ["Manufacturing", "Construction", "Retail", "ICT"]
+TAMANOS = ["GE10", "GE250", "10_49"]
+# Las filas sin provincia solo cuentan para el agregado de todas las provincias
+PROVINCIAS = [None, None, None, "Madrid", "Valencia"]
+
+
+def generar_filas(n: int) -> tuple[list, list]:
+    """Filas de hasta n combinaciones (país, año, sector, tamaño), en las dos formas."""
+    aleatorio = random.Random(0)
+    anteriores, filas = [], []
+    for contexto in itertools.islice(itertools.product(PAISES, ANIOS, SECTORES, TAMANOS), n):
+        for dim_id, nombre, peso, subdimensiones in DIMENSIONES:
+            # Algunos contextos no tienen datos de alguna dimensión
+            if aleatorio.random() < 0.1:
+                continue
+            for sub in range(subdimensiones):
+                for _ in range(aleatorio.randint(1, 6)):
+                    provincia = aleatorio.choice(PROVINCIAS)
+                    valor = Decimal(f"{aleatorio.uniform(0, 100):.4f}")
+                    importancia = aleatorio.choice(IMPORTANCIAS)
+                    anteriores.append(FilaAnterior(
+                        *contexto, provincia, valor, importancia, dim_id * 10 + sub, dim_id, nombre, Decimal(peso)
+                    ))
+                    filas.append(Fila(
+                        *contexto, provincia, float(valor), MAPA_IMPORTANCIA.get(importancia, 1),
+                        dim_id * 10 + sub, dim_id, nombre, float(peso)
+                    ))
+    # Mismo orden aleatorio en las dos formas
+    orden = list(range(len(filas)))
+    aleatorio.shuffle(orden)
+    return [anteriores[i] for i in orden], [filas[i] for i in orden]
+
+
+def calcular_piramide(resultados):
+    """Cálculo anterior, fila a fila con diccionarios anidados (sin cambios salvo la firma)."""
+    tree = defaultdict(lambda: defaultdict(list))
+    dim_info = {}
+
+    for row in resultados:
+        val = float(row.valor_calculado)
+        imp = row.importancia_texto if row.importancia_texto else "Baja"
+        peso = MAPA_IMPORTANCIA.get(imp, 1)
+
+        tree[row.dim_id][row.subdim_id].append({'val': val, 'w': peso})
+        if row.dim_id not in dim_info:
+            dim_info[row.dim_id] = {'nombre': row.dim_nombre, 'peso_pct': float(row.dim_peso_porcentaje)}
+
+    scores_dimensiones = {}
+    for dim_id, subdims in tree.items():
+        subdim_vals = []
+        for sub_id, inds in subdims.items():
+            num = sum(i['val'] * i['w'] for i in inds)
+            den = sum(i['w'] for i in inds)
+            subdim_vals.append(num / den if den > 0 else 0)
+        scores_dimensiones[dim_id] = sum(subdim_vals) / len(subdim_vals) if subdim_vals else 0
+
+    brainnova_score = 0
+    desglose = []
+    for dim_id, score in scores_dimensiones.items():
+        info = dim_info[dim_id]
+        contrib = score * (info['peso_pct'] / 100.0)
+        brainnova_score += contrib
+        desglose.append({
+            "dimension": info['nombre'],
+            "score_dimension": round(score, 2),
+            "peso_configurado": info['peso_pct'],
+            "contribucion_al_global": round(contrib, 2)
+        })
+
+    return {"brainnova_global_score": round(brainnova_score, 2), "desglose_por_dimension": desglose}
+
+
+def ruta_anterior(filas: list) -> dict:
+    # Agrupación anterior: cada fila cuenta para todas las provincias y para la suya
+    por_contexto = defaultdict(list)
+    for row in filas:
+        base = (row.pais, row.anio, row.sector, row.tamano_empresa)
+        por_contexto[base + (TODAS_PROVINCIAS,)].append(row)
+        if row.provincia:
+            por_contexto[base + (row.provincia,)].append(row)
+    return {clave: calcular_piramide(filas_contexto) for clave, filas_contexto in por_contexto.items()}
+
+
+def ruta_vectorizada(filas: list) -> dict:
+    return scores_por_contexto(filas)
+
+
+def por_dimension(score: dict) -> dict:
+    # El orden del desglose no forma parte del resultado: el anterior sigue el
+    # orden de aparición de las filas y el vectorizado el id de la dimensión
+    return {d["dimension"]: d for d in score["desglose_por_dimension"]}
+
+
+def diferencias(anterior: dict, vectorizado: dict) -> list:
+    distintos = []
+    for clave in anterior.keys() | vectorizado.keys():
+        a, v = anterior.get(clave), vectorizado.get(clave)
+        if a is None or v is None or a["brainnova_global_score"] != v["brainnova_global_score"] \
+                or por_dimension(a) != por_dimension(v):
+            distintos.append((clave, a, v))
+    return distintos
+
+
+def medir(funcion, filas: list, repeticiones: int) -> float:
+    """Mejor tiempo de las repeticiones, en segundos."""
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion(filas)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-c", "--contextos", type=int, default=960, help="Combinaciones sin provincia, como máximo 960")
+    parser.add_argument("-r", "--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+
+    anteriores, filas = generar_filas(args.contextos)
+
+    esperado = ruta_anterior(anteriores)
+    distintos = diferencias(esperado, ruta_vectorizada(filas))
+    if distintos:
+        print(f"{len(distintos)} de {len(esperado)} contextos no coinciden al céntimo:")
+        for clave, anterior, vectorizado in distintos[:10]:
+            print(f"  {clave}\n    anterior:    {anterior}\n    vectorizado: {vectorizado}")
+        sys.exit(1)
+
+    anterior = len(esperado) / medir(ruta_anterior, anteriores, args.repeticiones)
+    vectorizada = len(esperado) / medir(ruta_vectorizada, filas, args.repeticiones)
+
+    print(f"{len(esperado)} contextos, {len(filas)} filas: scores idénticos al céntimo")
+    print(f"anterior (calcular_piramide):       {anterior:>10,.1f} contextos/s")
+    print(f"vectorizado (scores_por_contexto):  {vectorizada:>10,.1f} contextos/s  (x{vectorizada / anterior:.1f})")
+
+
+if __name__ == "__main__":
+    main()
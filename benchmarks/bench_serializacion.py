@@ -0,0 +1,117 @@
+"""
+Compara, en filas por segundo, la serialización de /api/v1/resultados:
+- actual: un dict por fila, validación contra List[ResultadoIndicadorResponse]
+  y codificación con json (lo que hace FastAPI con response_model).
+- rápida: filas de SQLAlchemy directamente a bytes con orjson (serializacion.py).
+
+Las filas salen de la sentencia real del listado, ejecutada sobre una tabla
+hechos_indicadores en SQLite en memoria, así que no hace falta Postgres.
+
+Uso (desde la raíz del repositorio):
+    python benchmarks/bench_serializacion.py [-n FILAS] [-r REPETICIONES]
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from datetime import date
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+
+from database.modelos import HechoIndicador
+from microservicio_exposicion.schemas import ResultadoIndicadorResponse
+from microservicio_exposicion.serializacion import serializar_filas
+from microservicio_exposicion.services import sentencia_data_consulta
+
+CAMPOS = list(ResultadoIndicadorResponse.model_fields)
+
+
+def cargar_filas(n: int):
+    engine = create_engine("sqlite://")
+    HechoIndicador.__table__.create(engine)
+
+    aleatorio = random.Random(0)
+    paises = ["España", "Francia", "Alemania", "Italia", "Portugal"]
+    with engine.begin() as conexion:
+        conexion.execute(insert(HechoIndicador), [
+            {
+                "id_resultado": i,
+                "nombre_indicador": f"Indicador {i % 120}",
+                "valor_calculado": aleatorio.uniform(0, 100),
+                "periodo": date(2015 + i % 10, 1, 1),
+                "anio": 2015 + i % 10,
+                "pais": paises[i % len(paises)],
+                "provincia": "Valencia" if i % 7 == 0 else None,
+                "sector": "Manufacturing",
+                "tamano_empresa": "GE10",
+            }
+            for i in range(1, n + 1)
+        ])
+
+    with Session(engine) as db:
+        return db.execute(sentencia_data_consulta(limit=n)).all()
+
+
+def ruta_actual(filas, adaptador) -> bytes:
+    contenido = [
+        {
+            "nombre_indicador": row.nombre_indicador,
+            "resultado": float(row.resultado) if row.resultado is not None else 0.0,
+            "periodo": row.periodo,
+            "pais": row.pais,
+            "provincia": row.provincia,
+            "sector": row.sector,
+            "tamano_empresa": row.tamano_empresa
+        }
+        for row in filas
+    ]
+    validado = adaptador.validate_python(contenido)
+    return json.dumps(
+        adaptador.dump_python(validado, mode="json"),
+        ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def ruta_rapida(filas, adaptador) -> bytes:
+    return serializar_filas(filas, CAMPOS)
+
+
+def medir(funcion, filas, adaptador, repeticiones: int) -> float:
+    funcion(filas, adaptador)  # calentamiento
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion(filas, adaptador)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return len(filas) / mejor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--filas", type=int, default=5000)
+    parser.add_argument("-r", "--repeticiones", type=int, default=20)
+    args = parser.parse_args()
+
+    filas = cargar_filas(args.filas)
+    adaptador = TypeAdapter(List[ResultadoIndicadorResponse])
+
+    # Las dos rutas deben producir el mismo documento
+    assert json.loads(ruta_actual(filas, adaptador)) == json.loads(ruta_rapida(filas, adaptador))
+
+    actual = medir(ruta_actual, filas, adaptador, args.repeticiones)
+    rapida = medir(ruta_rapida, filas, adaptador, args.repeticiones)
+
+    print(f"{len(filas)} filas por respuesta")
+    print(f"actual (dict + Pydantic + json): {actual:>12,.0f} filas/s")
+    print(f"rápida (orjson desde filas):     {rapida:>12,.0f} filas/s  (x{rapida / actual:.1f})")
+
+
+if __name__ == "__main__":
+    main()
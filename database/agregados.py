@@ -0,0 +1,145 @@
+from sqlalchemy import select, delete, insert, update, func
+from sqlalchemy.orm import Session, aliased
+from database.connection import Base, SessionLocal, engine
+from database.modelos import (
+    ResultadoIndicador, ComponenteIndicador, DefinicionIndicador,
+    Subdimension, Dimension, ProcessedDatoCrudo, DatoCrudo, HechoIndicador, VersionDatos,
+    ScoreBrainnova
+)
+from database.scores import calcular_cubo_scores
+
+
+def refrescar_hechos_indicadores(db: Session):
+    """
+    Reconstruye la tabla hechos_indicadores a partir de los resultados.
+    Resuelve una única vez la cadena de joins (componente o dato crudo -> indicador
+    -> subdimensión -> dimensión) para que la API consulte una sola tabla.
+    """
+    IndicadorDesdeComponente = aliased(DefinicionIndicador)
+    IndicadorDesdeCrudo = aliased(DefinicionIndicador)
+
+    id_indicador = func.coalesce(IndicadorDesdeComponente.id, IndicadorDesdeCrudo.id)
+
+    # Un resultado puede enlazar con varios componentes del mismo indicador:
+    # DISTINCT ON se queda con una sola fila por resultado (priorizando las resueltas)
+    origen = select(
+        ResultadoIndicador.id.label('id_resultado'),
+        id_indicador.label('id_indicador')
+    ).select_from(ResultadoIndicador)\
+     .outerjoin(ResultadoIndicador.componente)\
+     .outerjoin(IndicadorDesdeComponente, ComponenteIndicador.indicador)\
+     .outerjoin(ResultadoIndicador.origen_crudo)\
+     .outerjoin(ProcessedDatoCrudo.dato_crudo_origen)\
+     .outerjoin(IndicadorDesdeCrudo, DatoCrudo.indicador)\
+     .distinct(ResultadoIndicador.id)\
+     .order_by(ResultadoIndicador.id, id_indicador.asc().nulls_last())\
+     .subquery()
+
+    seleccion = select(
+        ResultadoIndicador.id,
+        origen.c.id_indicador,
+        DefinicionIndicador.nombre,
+        DefinicionIndicador.importancia,
+        Subdimension.id,
+        Subdimension.nombre,
+        Dimension.id,
+        Dimension.nombre,
+        Dimension.peso,
+        ResultadoIndicador.valor_calculado,
+        ResultadoIndicador.periodo,
+        ResultadoIndicador.anio,
+        ResultadoIndicador.pais,
+        ResultadoIndicador.provincia,
+        ResultadoIndicador.sector,
+        ResultadoIndicador.tamano_empresa
+    ).join(origen, origen.c.id_resultado == ResultadoIndicador.id)\
+     .outerjoin(DefinicionIndicador, DefinicionIndicador.id == origen.c.id_indicador)\
+     .outerjoin(Subdimension, Subdimension.id == DefinicionIndicador.id_subdimension)\
+     .outerjoin(Dimension, Dimension.id == Subdimension.id_dimension)
+
+    columnas = [
+        'id_resultado', 'id_indicador', 'nombre_indicador', 'importancia',
+        'id_subdimension', 'nombre_subdimension', 'id_dimension', 'nombre_dimension', 'peso_dimension',
+        'valor_calculado', 'periodo', 'anio', 'pais', 'provincia', 'sector', 'tamano_empresa'
+    ]
+
+    # Borrado e inserción en la misma transacción: los lectores ven la versión
+    # anterior hasta el commit
+    db.execute(delete(HechoIndicador))
+    db.execute(insert(HechoIndicador).from_select(columnas, seleccion))
+    db.commit()
+
+
+def refrescar_scores_brainnova(db: Session):
+    """
+    Recalcula el cubo de scores Brainnova a partir de la tabla de hechos,
+    que debe estar ya refrescada.
+    """
+    scores = [
+        {
+            'pais': contexto['pais'],
+            'anio': contexto['anio'],
+            'sector': contexto['sector'],
+            'tamano_empresa': contexto['tamano_empresa'],
+            'provincia': contexto['provincia'],
+            'brainnova_global_score': contexto['score']['brainnova_global_score'],
+            'desglose_por_dimension': contexto['score']['desglose_por_dimension']
+        }
+        for contexto in calcular_cubo_scores(db)
+    ]
+
+    db.execute(delete(ScoreBrainnova))
+    if scores:
+        db.execute(insert(ScoreBrainnova), scores)
+    db.commit()
+
+    return len(scores)
+
+
+def incrementar_version_datos(db: Session) -> int:
+    """
+    Publica una nueva versión de los datos. La API compara este sello con el
+    de sus cachés y las descarta en cuanto cambia.
+    """
+    actualizadas = db.execute(
+        update(VersionDatos).where(VersionDatos.id == 1).values(version=VersionDatos.version + 1)
+    ).rowcount
+
+    if not actualizadas:
+        db.add(VersionDatos(id=1, version=1))
+
+    db.commit()
+    return db.query(VersionDatos.version).filter(VersionDatos.id == 1).scalar()
+
+
+def refrescar_agregados(db: Session):
+    """Regenera todas las tablas derivadas que consulta la API."""
+    print('Refrescando tabla de hechos de indicadores...')
+    refrescar_hechos_indicadores(db)
+
+    print('Precalculando scores Brainnova...')
+    total_scores = refrescar_scores_brainnova(db)
+    print(f'{total_scores} combinaciones calculadas.')
+
+    version = incrementar_version_datos(db)
+    print(f'Éxito. Tablas derivadas actualizadas (versión de datos {version}).')
+
+
+def rellenar_agregados():
+    """
+    Crea las tablas derivadas que falten y las rellena a partir de los
+    resultados ya cargados. Es idempotente: sirve para poner al día una base
+    de datos existente sin volver a ejecutar la ingesta.
+    """
+    import database.modelos  # registra todas las tablas en Base.metadata
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        refrescar_agregados(db)
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    rellenar_agregados()
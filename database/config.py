@@ -14,6 +14,35 @@ DB_NAME = os.getenv("DB_NAME", "indicadores")
 
 # Construye la URL de la base de datos de forma segura
 SQL_DATABASE_URL = f"postgresql+psycopg2://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+# La API usa el driver asíncrono (asyncpg); la ingesta y los scripts siguen con psycopg2
+SQL_DATABASE_URL_ASYNC = f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
 # Opcional: imprimir la URL sin la contraseña para depuración
-print(f"Conectando a: postgresql+psycopg2://{DB_USER}:****@{DB_HOST}:{DB_PORT}/{DB_NAME}")
\ No newline at end of file
+print(f"Conectando a: postgresql+psycopg2://{DB_USER}:****@{DB_HOST}:{DB_PORT}/{DB_NAME}")
+
+# Caché en memoria de la API (filtros y catálogos)
+CACHE_MAX_ENTRADAS = int(os.getenv("CACHE_MAX_ENTRADAS", "512"))
+CACHE_TTL_SEGUNDOS = float(os.getenv("CACHE_TTL_SEGUNDOS", "3600"))
+# Cada cuántos segundos se comprueba si la ingesta ha publicado una nueva versión de datos
+CACHE_INTERVALO_VERSION = float(os.getenv("CACHE_INTERVALO_VERSION", "2"))
+# Segundos que navegadores y CDN pueden reutilizar una respuesta sin revalidarla (ETag)
+HTTP_CACHE_MAX_AGE = int(os.getenv("HTTP_CACHE_MAX_AGE", "300"))
+
+# Pool de conexiones (cada proceso, y cada worker de la API, tiene el suyo:
+# el máximo de conexiones es workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW))
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Segundos tras los que se recicla una conexión (-1 = nunca)
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+# Límite de duración de cada consulta de la API en milisegundos (0 = sin límite).
+# No se aplica a la ingesta, cuyas cargas y refrescos pueden ser largos.
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+
+# Procesos worker de la API (1 = un solo proceso, como en desarrollo)
+API_WORKERS = int(os.getenv("API_WORKERS", "1"))
+
+# Token para las funciones de diagnóstico de la API (?_profile=1 con la
+# cabecera X-Admin-Token). Vacío = desactivadas.
+API_ADMIN_TOKEN = os.getenv("API_ADMIN_TOKEN", "")
@@ -1,24 +1,133 @@
+import os
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Optional
 from sqlalchemy.orm import declarative_base
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
 from sqlalchemy.orm import sessionmaker
-from database.config import SQL_DATABASE_URL
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from database.config import (
+    SQL_DATABASE_URL, SQL_DATABASE_URL_ASYNC,
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_POOL_PRE_PING,
+    DB_STATEMENT_TIMEOUT_MS
+)
+
+# Configuración del pool común a los dos engines
+OPCIONES_POOL = dict(
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=DB_POOL_PRE_PING
+)
+
+# Funciones (pool, segundos) a las que se pasa la duración de cada checkout
+# (las registra la API para sus métricas)
+observadores_checkout = []
+
+class CheckoutCronometrado:
+    """
+    Mixin de pool que mide cada checkout: casi cero con conexiones libres,
+    y el tiempo de espera cuando el pool está agotado.
+    """
+    nombre = None
+
+    def connect(self):
+        inicio = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            # También cuando se agota pool_timeout: es la espera más relevante
+            segundos = time.perf_counter() - inicio
+            for observador in observadores_checkout:
+                observador(self, segundos)
+
+class PoolSincrono(CheckoutCronometrado, QueuePool):
+    nombre = "sync"
+
+class PoolAsincrono(CheckoutCronometrado, AsyncAdaptedQueuePool):
+    nombre = "async"
 
 # Se crea el engine una vez en toda la aplicación
-engine = create_engine(SQL_DATABASE_URL)
+engine = create_engine(SQL_DATABASE_URL, poolclass=PoolSincrono, **OPCIONES_POOL)
 
 # Se crea la fábrica de sesiones
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Engine y sesiones asíncronas para la API (asyncpg). La ingesta sigue usando
+# el engine síncrono de arriba, sin límite de duración de las consultas.
+ajustes_servidor = {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)} if DB_STATEMENT_TIMEOUT_MS else {}
+async_engine = create_async_engine(
+    SQL_DATABASE_URL_ASYNC,
+    connect_args={"server_settings": ajustes_servidor},
+    poolclass=PoolAsincrono,
+    **OPCIONES_POOL
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+
+def _descartar_pools_heredados():
+    """
+    Los engines no abren conexiones hasta el primer uso, pero si un proceso
+    se bifurca con el pool ya en uso, el hijo no debe reutilizar esos sockets:
+    se descarta el pool heredado (sin cerrarlo, es del padre) y el hijo
+    abre el suyo propio cuando lo necesite.
+    """
+    engine.dispose(close=False)
+    async_engine.sync_engine.dispose(close=False)
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_descartar_pools_heredados)
+
+# --- INSTRUMENTACIÓN ---
+
+@dataclass
+class MetricasBD:
+    """
+    Sentencias ejecutadas, tiempo en base de datos y filas leídas. filas es
+    None si alguna sentencia no ha informado de sus filas.
+    """
+    sentencias: int = 0
+    segundos: float = 0.0
+    filas: Optional[int] = 0
+
+# Métricas de la petición en curso: la API fija una instancia por petición
+# (microservicio_exposicion.instrumentacion). Fuera de una petición es None
+# y los eventos no hacen nada.
+metricas_bd: ContextVar[Optional[MetricasBD]] = ContextVar('metricas_bd', default=None)
+
+def _antes_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    if metricas_bd.get() is not None:
+        context.inicio_metricas = time.perf_counter()
+
+def _despues_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    metricas = metricas_bd.get()
+    inicio = getattr(context, 'inicio_metricas', None)
+    if metricas is None or inicio is None:
+        return
+
+    metricas.sentencias += 1
+    metricas.segundos += time.perf_counter() - inicio
+    # psycopg2 informa de las filas de un SELECT en rowcount; el adaptador de
+    # asyncpg (y los cursores de servidor) lo dejan a -1. En ese caso el total
+    # de la petición no se conoce y se omite en vez de dar una cifra parcial.
+    if metricas.filas is not None and cursor.rowcount >= 0:
+        metricas.filas += cursor.rowcount
+    else:
+        metricas.filas = None
+
+for _engine in (engine, async_engine.sync_engine):
+    event.listen(_engine, 'before_cursor_execute', _antes_de_ejecutar)
+    event.listen(_engine, 'after_cursor_execute', _despues_de_ejecutar)
+
 # Se crea la base declarativa que usarán todos los modelos
 Base = declarative_base()
 
-def get_db():
+async def get_async_db():
     """
     Generador de dependencia para FastAPI.
-    Crea una sesión nueva para cada petición y la cierra al terminar.
+    Crea una sesión asíncrona nueva para cada petición y la cierra al terminar.
     """
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
\ No newline at end of file
+    async with AsyncSessionLocal() as db:
+        yield db
\ No newline at end of file
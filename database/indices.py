@@ -0,0 +1,57 @@
+from sqlalchemy import DDL, event, func, literal_column
+from database.connection import Base, engine
+
+# --- BÚSQUEDA DE TEXTO ---
+# pg_trgm da índices GIN capaces de resolver LIKE '%x%' y la similitud por
+# trigramas; unaccent permite buscar sin tildes. unaccent() no es IMMUTABLE
+# (depende del diccionario configurado) y no se puede usar en un índice, así
+# que se envuelve en f_unaccent fijando el diccionario.
+DDL_BUSQUEDA = [
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm"),
+    DDL("CREATE EXTENSION IF NOT EXISTS unaccent"),
+    DDL(
+        "CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text "
+        "LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT "
+        "AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$"
+    )
+]
+
+# Se ejecutan antes de crear las tablas (y sus índices) con create_all
+for ddl in DDL_BUSQUEDA:
+    event.listen(Base.metadata, 'before_create', ddl.execute_if(dialect='postgresql'))
+
+# Configuración de texto como literal: con un parámetro el planificador no
+# reconocería la expresión del índice
+CONFIGURACION_TEXTO = literal_column("'spanish'::regconfig")
+
+def texto_normalizado(expresion):
+    """Minúsculas y sin tildes. Es la expresión de los índices de trigramas."""
+    return func.f_unaccent(func.lower(expresion))
+
+def documento_busqueda(expresion):
+    """tsvector en español sin tildes. Es la expresión de los índices de texto completo."""
+    return func.to_tsvector(CONFIGURACION_TEXTO, func.f_unaccent(expresion))
+
+def consulta_busqueda(texto: str):
+    """tsquery en español sin tildes a partir del texto libre del usuario."""
+    return func.plainto_tsquery(CONFIGURACION_TEXTO, func.f_unaccent(texto))
+
+def crear_indices(bind=engine):
+    """
+    Crea las extensiones y los índices que falten en una base de datos ya
+    existente (create_all solo crea los índices de las tablas nuevas).
+    """
+    import database.modelos  # registra todas las tablas en Base.metadata
+
+    with bind.begin() as conexion:
+        if conexion.dialect.name == 'postgresql':
+            for ddl in DDL_BUSQUEDA:
+                conexion.execute(ddl)
+
+        for tabla in Base.metadata.sorted_tables:
+            for indice in tabla.indexes:
+                indice.create(conexion, checkfirst=True)
+                print(f'Índice {indice.name} en {tabla.name}: OK')
+
+if __name__ == '__main__':
+    crear_indices()
\ No newline at end of file
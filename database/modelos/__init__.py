@@ -3,7 +3,10 @@ from .datos_crudos import DatoCrudo
 from .datos_macro import DatoMacro
 from .definicion_indicadores import DefinicionIndicador
 from .dimensiones import Dimension
+from .hechos_indicadores import HechoIndicador
 from .processed_datos_crudos import ProcessedDatoCrudo
 from .processed_datos_macro import ProcessedDatoMacro
 from .resultados_indicadores import ResultadoIndicador
-from .subdimensiones import Subdimension
\ No newline at end of file
+from .scores_brainnova import ScoreBrainnova
+from .subdimensiones import Subdimension
+from .version_datos import VersionDatos
\ No newline at end of file
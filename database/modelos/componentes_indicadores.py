@@ -1,14 +1,17 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Enum, Table
+from sqlalchemy import Column, Integer, String, ForeignKey, Enum, Table, Index
 from sqlalchemy.orm import relationship
 from database.connection import Base
-from modelos.models import RolDato
+from modelos.enums import RolDato
 from enum import Enum as pyEnum
 
 componentes_resultados = Table(
     "componentes_resultados",
     Base.metadata,
     Column("id_componente", Integer, ForeignKey("componentes_indicadores.id")),
-    Column("id_resultado", Integer, ForeignKey("resultados_indicadores.id"))
+    Column("id_resultado", Integer, ForeignKey("resultados_indicadores.id")),
+    # La tabla no tiene clave primaria: un índice por cada sentido del join
+    Index("ix_componentes_resultados_resultado", "id_resultado", "id_componente"),
+    Index("ix_componentes_resultados_componente", "id_componente")
 )
 
 class FUENTES_TABLAS(pyEnum):
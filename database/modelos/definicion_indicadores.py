@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Integer, String, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from database.connection import Base
+from database.indices import texto_normalizado, documento_busqueda
 
 class DefinicionIndicador(Base):
     __tablename__ = 'definiciones_indicadores'
@@ -16,3 +17,11 @@ class DefinicionIndicador(Base):
     subdimension = relationship('Subdimension', back_populates='indicadores')
     componentes = relationship('ComponenteIndicador', back_populates='indicador')
     datos_crudos = relationship('DatoCrudo', back_populates='indicador')
+
+    __table_args__ = (
+        # Búsqueda por nombre sin tildes: subcadena/similitud (trigramas) y palabras (texto completo)
+        Index('ix_definiciones_nombre_trgm', texto_normalizado(nombre).label('nombre_normalizado'),
+              postgresql_using='gin', postgresql_ops={'nombre_normalizado': 'gin_trgm_ops'}).ddl_if(dialect='postgresql'),
+        Index('ix_definiciones_nombre_tsv', documento_busqueda(nombre),
+              postgresql_using='gin').ddl_if(dialect='postgresql'),
+    )
\ No newline at end of file
@@ -1,7 +1,7 @@
 from sqlalchemy import Column, Integer, String, Enum
 from sqlalchemy.orm import relationship
 from database.connection import Base
-from modelos.models import Dimension as DimensionEnum
+from modelos.enums import Dimension as DimensionEnum
 
 class Dimension(Base):
     __tablename__ = 'dimensiones'   
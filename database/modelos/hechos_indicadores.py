@@ -0,0 +1,49 @@
+from sqlalchemy import Column, Integer, ForeignKey, Numeric, String, DATE, Index
+from database.connection import Base
+
+
+class HechoIndicador(Base):
+    """
+    Tabla de hechos desnormalizada: una fila por resultado con el indicador,
+    su jerarquía (subdimensión y dimensión) y el contexto ya resueltos.
+    Se regenera tras cada carga desde database.agregados.
+    """
+    __tablename__ = 'hechos_indicadores'
+
+    id_resultado = Column(Integer, ForeignKey('resultados_indicadores.id', ondelete='CASCADE'), primary_key=True)
+
+    id_indicador = Column(Integer, ForeignKey('definiciones_indicadores.id', ondelete='CASCADE'))
+    nombre_indicador = Column(String(100))
+    importancia = Column(String(10))
+
+    id_subdimension = Column(Integer)
+    nombre_subdimension = Column(String(100))
+    id_dimension = Column(Integer)
+    nombre_dimension = Column(String(100))
+    peso_dimension = Column(Integer)
+
+    valor_calculado = Column(Numeric(20, 6), nullable=False)
+
+    periodo = Column(DATE)
+    anio = Column(Integer)
+    pais = Column(String(100))
+    provincia = Column(String(100))
+    sector = Column(String(300))
+    tamano_empresa = Column(String(100))
+
+    __table_args__ = (
+        # Orden estable de /api/v1/resultados y paginación por cursor
+        Index('ix_hechos_periodo_id', 'periodo', 'id_resultado'),
+        # Filtro por indicador (ya resuelto a ids) conservando el orden del listado
+        Index('ix_hechos_indicador_periodo', 'id_indicador', 'periodo', 'id_resultado'),
+        # Contexto de score (país, año, sector, tamaño) y listados por provincia
+        Index('ix_hechos_pais_anio_sector_tamano', 'pais', 'anio', 'sector', 'tamano_empresa'),
+        Index('ix_hechos_pais_provincia_anio', 'pais', 'provincia', 'anio'),
+        # Series temporales (/api/v1/series): cubre todas las columnas de la
+        # consulta para que se resuelva con un index-only scan
+        Index('ix_hechos_series', 'id_indicador', 'anio', 'pais', 'sector',
+              postgresql_include=['provincia', 'tamano_empresa', 'valor_calculado']),
+        # sector ILIKE '%x%'
+        Index('ix_hechos_sector_trgm', 'sector',
+              postgresql_using='gin', postgresql_ops={'sector': 'gin_trgm_ops'}).ddl_if(dialect='postgresql'),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey, Numeric, String, DATE
+from sqlalchemy import Column, Integer, ForeignKey, Numeric, String, DATE, Computed, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from database.connection import Base
@@ -9,14 +9,17 @@ resultados_fuente_crudo = Table(
     'resultados_fuente_crudo',
     Base.metadata,
     Column('id_resultado', Integer, ForeignKey('resultados_indicadores.id'), primary_key=True),
-    Column('id_dato_crudo', Integer, ForeignKey('processed_datos_crudos.id'), primary_key=True)
+    Column('id_dato_crudo', Integer, ForeignKey('processed_datos_crudos.id'), primary_key=True),
+    # La clave primaria empieza por id_resultado; este índice sirve el camino inverso
+    Index('ix_resultados_fuente_crudo_dato', 'id_dato_crudo')
 )
 
 resultados_fuente_macro = Table(
     'resultados_fuente_macro',
     Base.metadata,
     Column('id_resultado', Integer, ForeignKey('resultados_indicadores.id'), primary_key=True),
-    Column('id_dato_macro', Integer, ForeignKey('processed_datos_macro.id'), primary_key=True)
+    Column('id_dato_macro', Integer, ForeignKey('processed_datos_macro.id'), primary_key=True),
+    Index('ix_resultados_fuente_macro_dato', 'id_dato_macro')
 )
 
 
@@ -36,6 +39,9 @@ class ResultadoIndicador(Base):
     unidad_display = Column(String(80))
 
     periodo = Column(DATE)
+    # Año del periodo, calculado por la base de datos: filtrar por año no
+    # necesita extract() y puede usar los índices
+    anio = Column(Integer, Computed("CAST(EXTRACT(YEAR FROM periodo) AS INTEGER)", persisted=True))
     pais = Column(String(100))
     provincia = Column(String(100))
     sector = Column(String(300))
@@ -43,4 +49,10 @@ class ResultadoIndicador(Base):
 
     componente = relationship('ComponenteIndicador', secondary=componentes_resultados, back_populates='resultados')
     origen_crudo = relationship('ProcessedDatoCrudo', secondary=resultados_fuente_crudo, back_populates='resultados')
-    origen_macro = relationship('ProcessedDatoMacro', secondary=resultados_fuente_macro, back_populates='resultados')
\ No newline at end of file
+    origen_macro = relationship('ProcessedDatoMacro', secondary=resultados_fuente_macro, back_populates='resultados')
+
+    __table_args__ = (
+        # Mismas formas que los filtros reales: contexto de score y listado por provincia
+        Index('ix_resultados_pais_anio_sector_tamano', 'pais', 'anio', 'sector', 'tamano_empresa'),
+        Index('ix_resultados_pais_provincia_anio', 'pais', 'provincia', 'anio'),
+    )
\ No newline at end of file
@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, String, Float, JSON, DateTime
+from sqlalchemy.sql import func
+from database.connection import Base
+
+# Valor de 'provincia' para el score agregado de todas las provincias
+# (la columna forma parte de la clave primaria y no admite nulos)
+TODAS_PROVINCIAS = ''
+
+class ScoreBrainnova(Base):
+    """
+    Score Brainnova precalculado para cada combinación de contexto
+    (país, año, sector, tamaño de empresa y provincia). Se regenera tras
+    cada carga para que la API resuelva el score con una búsqueda por clave.
+    """
+    __tablename__ = 'scores_brainnova'
+
+    pais = Column(String(100), primary_key=True)
+    anio = Column(Integer, primary_key=True)
+    sector = Column(String(300), primary_key=True)
+    tamano_empresa = Column(String(100), primary_key=True)
+    provincia = Column(String(100), primary_key=True, default=TODAS_PROVINCIAS)
+
+    brainnova_global_score = Column(Float, nullable=False)
+    desglose_por_dimension = Column(JSON, nullable=False)
+
+    fecha_calculo = Column(DateTime, server_default=func.now())
\ No newline at end of file
@@ -1,7 +1,7 @@
 from sqlalchemy import Column, Integer, String, ForeignKey, Enum
 from sqlalchemy.orm import relationship
 from database.connection import Base
-from modelos.models import Subdimension as SubdimensionEnum
+from modelos.enums import Subdimension as SubdimensionEnum
 
 class Subdimension(Base):
     __tablename__ = 'subdimensiones'
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, DateTime
+from sqlalchemy.sql import func
+from database.connection import Base
+
+class VersionDatos(Base):
+    """
+    Sello de versión de los datos publicados. La ingesta lo incrementa al
+    terminar cada carga y la API lo usa para invalidar sus cachés.
+    """
+    __tablename__ = 'version_datos'
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    actualizado = Column(DateTime, server_default=func.now(), onupdate=func.now())
\ No newline at end of file
@@ -0,0 +1,215 @@
+# Motor del score Brainnova. Está en la capa de base de datos porque lo usan
+# tanto la API (microservicio_exposicion) como el refresco de agregados de la
+# ingesta (database.agregados), y ninguna de las dos debe depender de la otra.
+from operator import itemgetter
+
+import numpy as np
+from sqlalchemy import select, case, cast, Float
+from sqlalchemy.orm import Session
+
+from database.modelos import HechoIndicador
+from database.modelos.scores_brainnova import TODAS_PROVINCIAS
+
+MAPA_IMPORTANCIA = {"Alta": 3, "Media": 2, "Baja": 1, "alta": 3, "media": 2, "baja": 1}
+
+# Importancia como número, calculada en SQL (nula o desconocida = Baja)
+PESO_IMPORTANCIA = case(MAPA_IMPORTANCIA, value=HechoIndicador.importancia, else_=1)
+
+# Columnas de la tabla de hechos que necesita el motor, ya numéricas: la
+# conversión de Numeric a float y de la importancia a peso la hace Postgres
+COLUMNAS_SCORE = [
+    cast(HechoIndicador.valor_calculado, Float).label('valor_calculado'),
+    PESO_IMPORTANCIA.label('peso_importancia'),
+    HechoIndicador.id_subdimension.label('subdim_id'),
+    HechoIndicador.id_dimension.label('dim_id'),
+    HechoIndicador.nombre_dimension.label('dim_nombre'),
+    cast(HechoIndicador.peso_dimension, Float).label('dim_peso_porcentaje')
+]
+
+
+def _codificar(valores) -> tuple[np.ndarray, list]:
+    """Asigna a cada valor un código entero por orden de aparición."""
+    codigos = {valor: i for i, valor in enumerate(dict.fromkeys(valores))}
+    indices = np.fromiter(map(codigos.__getitem__, valores), dtype=np.int64, count=len(valores))
+    return indices, list(codigos)
+
+
+def transponer(filas, n_columnas: int) -> list:
+    """
+    Una lista por columna a partir de las filas de una consulta. Se recorre
+    columna a columna con itemgetter en lugar de zip(*filas), que crea un
+    iterador por fila y dispara el recolector de basura con muchas filas.
+    """
+    return [list(map(itemgetter(i), filas)) for i in range(n_columnas)]
+
+
+def marco_desde_columnas(columnas_score, contexto: np.ndarray | None = None, indices: np.ndarray | None = None) -> dict:
+    """
+    Marco columnar del motor.
+    - columnas_score: las columnas de COLUMNAS_SCORE, una secuencia por columna.
+    - contexto: código entero (0..n-1) del contexto de cada fila del marco; por
+      defecto todas son del contexto 0.
+    - indices: fila de origen de cada fila del marco, cuando una fila cuenta
+      para varios contextos o para ninguno; por defecto cada fila una vez.
+    """
+    valor, peso, id_subdimension, id_dimension, nombre_dimension, peso_dimension = columnas_score
+
+    dim = np.asarray(id_dimension, dtype=np.int64)
+    # Nombre y peso de cada dimensión: los de su primera fila
+    ids_dimension, primera_fila = np.unique(dim, return_index=True)
+    marco = {
+        'valor': np.asarray(valor, dtype=np.float64),
+        'peso': np.asarray(peso, dtype=np.float64),
+        'id_subdimension': np.asarray(id_subdimension, dtype=np.int64),
+        'id_dimension': dim,
+    }
+    if indices is not None:
+        marco = {columna: vector[indices] for columna, vector in marco.items()}
+
+    marco['contexto'] = np.zeros(len(marco['valor']), dtype=np.int64) if contexto is None else contexto
+    marco['info_dimension'] = {
+        dim_id: (nombre_dimension[i], float(peso_dimension[i]))
+        for dim_id, i in zip(ids_dimension.tolist(), primera_fila.tolist())
+    }
+    return marco
+
+
+def calcular_scores(marco: dict) -> dict:
+    """
+    Calcula el score de todos los contextos presentes en el marco con
+    agrupaciones vectorizadas:
+    indicador -> subdimensión (media ponderada por importancia)
+    -> dimensión (media aritmética) -> global (ponderado por el peso de la dimensión).
+    Devuelve {código de contexto: {"brainnova_global_score": ..., "desglose_por_dimension": [...]}}
+    con los mismos redondeos que el cálculo fila a fila.
+    """
+    ctx = marco['contexto']
+    if not len(ctx):
+        return {}
+
+    valor, peso, info_dimension = marco['valor'], marco['peso'], marco['info_dimension']
+
+    # Dimensiones y subdimensiones como códigos 0..n-1 (en orden de id)
+    ids_dimension, dim = np.unique(marco['id_dimension'], return_inverse=True)
+    ids_subdimension, sub = np.unique(marco['id_subdimension'], return_inverse=True)
+    dim, sub = dim.ravel(), sub.ravel()
+
+    # (contexto, dimensión, subdimensión) se codifica en un solo entero para
+    # agrupar con np.unique sobre un vector, mucho más rápido que con axis=0.
+    # El orden de los grupos es: contexto, id de dimensión, id de subdimensión
+    n_dim, n_sub = len(ids_dimension), len(ids_subdimension)
+    claves_sub, inv_sub = np.unique((ctx * n_dim + dim) * n_sub + sub, return_inverse=True)
+    inv_sub = inv_sub.ravel()
+
+    # Nivel 1: media ponderada por (contexto, dimensión, subdimensión)
+    num = np.bincount(inv_sub, weights=valor * peso)
+    den = np.bincount(inv_sub, weights=peso)
+    media_sub = np.divide(num, den, out=np.zeros_like(num), where=den > 0)
+
+    # Nivel 2: media aritmética de subdimensiones por (contexto, dimensión)
+    claves_dim, inv_dim = np.unique(claves_sub // n_sub, return_inverse=True)
+    inv_dim = inv_dim.ravel()
+    ctx_dim, ids_dim = claves_dim // n_dim, ids_dimension[claves_dim % n_dim]
+    score_dim = np.bincount(inv_dim, weights=media_sub) / np.bincount(inv_dim)
+
+    # Nivel 3: contribución al global según el peso de la dimensión
+    peso_dim = np.array([info_dimension[d][1] for d in ids_dim.tolist()], dtype=np.float64)
+    contribucion = score_dim * (peso_dim / 100.0)
+    score_global = np.bincount(ctx_dim, weights=contribucion)
+
+    resultados = {
+        int(i): {"brainnova_global_score": round(float(score_global[i]), 2), "desglose_por_dimension": []}
+        for i in np.unique(ctx_dim).tolist()
+    }
+
+    for i, dim_id, score, contrib in zip(ctx_dim.tolist(), ids_dim.tolist(), score_dim.tolist(), contribucion.tolist()):
+        nombre, peso_pct = info_dimension[dim_id]
+        resultados[i]["desglose_por_dimension"].append({
+            "dimension": nombre,
+            "score_dimension": round(score, 2),
+            "peso_configurado": peso_pct,
+            "contribucion_al_global": round(contrib, 2)
+        })
+
+    return resultados
+
+
+# Columnas de contexto + score, solo filas con jerarquía y contexto completos
+COLUMNAS_CONTEXTO = ('pais', 'anio', 'sector', 'tamano_empresa', 'provincia')
+SENTENCIA_SCORES_CONTEXTO = select(
+    *(getattr(HechoIndicador, columna) for columna in COLUMNAS_CONTEXTO),
+    *COLUMNAS_SCORE
+).where(
+    HechoIndicador.id_subdimension != None,
+    HechoIndicador.id_dimension != None,
+    HechoIndicador.pais != None,
+    HechoIndicador.anio != None,
+    HechoIndicador.sector != None,
+    HechoIndicador.tamano_empresa != None
+)
+
+
+def scores_por_contexto(filas) -> dict:
+    """
+    Scores de todas las combinaciones (país, año, sector, tamaño, provincia)
+    presentes en las filas de SENTENCIA_SCORES_CONTEXTO. Cada fila cuenta para
+    el agregado de todas las provincias (TODAS_PROVINCIAS) y, si la tiene, para
+    su provincia. El contexto de cada fila se calcula con códigos enteros por
+    columna, sin construir una clave por fila.
+    """
+    if not filas:
+        return {}
+
+    columnas = transponer(filas, len(COLUMNAS_CONTEXTO) + len(COLUMNAS_SCORE))
+    contexto, columnas_score = columnas[:len(COLUMNAS_CONTEXTO)], columnas[len(COLUMNAS_CONTEXTO):]
+    *columnas_base, provincia = contexto
+
+    # (país, año, sector, tamaño) como un solo entero en base mixta
+    base = np.zeros(len(filas), dtype=np.int64)
+    valores_base = []
+    for columna in columnas_base:
+        codigos, valores = _codificar(columna)
+        base = base * len(valores) + codigos
+        valores_base.append(valores)
+
+    codigo_provincia, provincias = _codificar(provincia)
+    todas = len(provincias)  # código del agregado de todas las provincias
+    con_provincia = np.flatnonzero(np.array([bool(p) for p in provincias])[codigo_provincia])
+
+    indices = np.concatenate([np.arange(len(filas)), con_provincia])
+    clave = base[indices] * (todas + 1) + np.concatenate([np.full(len(filas), todas), codigo_provincia[con_provincia]])
+    claves, primera, codigo_contexto = np.unique(clave, return_index=True, return_inverse=True)
+
+    scores = calcular_scores(marco_desde_columnas(columnas_score, codigo_contexto.ravel(), indices))
+
+    # Se deshace la codificación solo una vez por contexto
+    resultados = {}
+    for i, (clave_base, codigo) in enumerate(zip((claves // (todas + 1)).tolist(), (claves % (todas + 1)).tolist())):
+        partes = []
+        for valores in reversed(valores_base):
+            clave_base, resto = divmod(clave_base, len(valores))
+            partes.append(valores[resto])
+        pais, anio, sector, tamano = reversed(partes)
+        resultados[(pais, anio, sector, tamano, TODAS_PROVINCIAS if codigo == todas else provincias[codigo])] = scores[i]
+
+    return resultados
+
+
+def calcular_cubo_scores(db: Session):
+    """
+    Calcula el score de todas las combinaciones (país, año, sector, tamaño, provincia)
+    con datos, leyendo la tabla de hechos una sola vez. Para cada combinación
+    sin provincia se genera además el score agregado (TODAS_PROVINCIAS), que es
+    el que devuelve calcular_brainnova_score cuando no se filtra por provincia.
+    """
+    filas = db.execute(SENTENCIA_SCORES_CONTEXTO).all()
+
+    for (pais, anio, sector, tamano, provincia), score in scores_por_contexto(filas).items():
+        yield {
+            "pais": pais,
+            "anio": anio,
+            "sector": sector,
+            "tamano_empresa": tamano,
+            "provincia": provincia,
+            "score": score
+        }
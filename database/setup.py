@@ -7,14 +7,17 @@ from database.modelos.componentes_indicadores import ComponenteIndicador as Comp
 from database.modelos.datos_crudos import DatoCrudo
 from database.modelos.resultados_indicadores import ResultadoIndicador
 from database.modelos.datos_macro import DatoMacro
-from modelos.models import Dimension, Subdimension
+from modelos.enums import Dimension, Subdimension
 from data.processed.indicadores.indicators import CATALOGO_COMPLETO
 from data.processed.indicadores.formulas import CATALOGO_OPERACIONES
 from data.processed.indicadores.roles import CATALOGO_ROLES
-from modelos.models import RolDato as RolDatoEnum
+from modelos.enums import RolDato as RolDatoEnum
 from collections import Counter
 from data.processed.indicadores.indicators import CATALOGO_COMPLETO
+from database.indices import crear_indices
+from database.agregados import rellenar_agregados
 from sqlalchemy import text
+from sqlalchemy.schema import CreateColumn
 
 
 DATOS_ESG = {
@@ -104,6 +107,26 @@ def create_tables():
     Base.metadata.create_all(bind=engine)
     print("Éxito. Tablas creadas (o ya existían).")
 
+def actualizar_esquema():
+    """
+    Pone al día una base de datos ya creada: crea las tablas nuevas, aplica lo
+    que create_all no hace con las tablas existentes (la columna calculada anio
+    de resultados_indicadores y los índices y extensiones de búsqueda que
+    falten) y rellena las tablas derivadas que consulta la API.
+    """
+    print("Actualizando esquema de tablas existentes...")
+    Base.metadata.create_all(bind=engine)
+
+    columna_anio = ResultadoIndicador.__table__.c.anio
+    with engine.begin() as connection:
+        definicion = CreateColumn(columna_anio).compile(dialect=connection.dialect)
+        connection.execute(text(f'ALTER TABLE resultados_indicadores ADD COLUMN IF NOT EXISTS {definicion}'))
+
+    crear_indices(engine)
+    print("Éxito. Esquema actualizado.")
+
+    rellenar_agregados()
+
 def seed_data(lista_indicadores):
     db = SessionLocal()
     try:
@@ -200,4 +223,5 @@ def fusionar_datos():
 if __name__ == '__main__':
     reset_database()
     create_tables()
+    actualizar_esquema()
     seed_data(fusionar_datos())    
\ No newline at end of file
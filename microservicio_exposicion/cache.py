@@ -0,0 +1,156 @@
+import asyncio
+import inspect
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.config import CACHE_MAX_ENTRADAS, CACHE_TTL_SEGUNDOS, CACHE_INTERVALO_VERSION
+from database.connection import AsyncSessionLocal
+from database.modelos import VersionDatos
+from microservicio_exposicion.metricas import CONSULTAS_CACHE
+
+
+class CacheLRU:
+    """
+    Caché en memoria acotada, con expulsión LRU y caducidad por TTL.
+    En la API se usa desde el bucle de eventos: la leen y escriben las
+    corrutinas de services_async, y la tarea de fondo vigilar_version_datos la
+    vacía cuando cambia la versión de datos. El lock nunca se retiene durante
+    un await, así que no bloquea el bucle, y la hace segura también desde hilos.
+    """
+
+    def __init__(self, max_entradas: int = CACHE_MAX_ENTRADAS, ttl: float = CACHE_TTL_SEGUNDOS):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, clave):
+        """Devuelve (encontrado, valor)."""
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                return False, None
+
+            caduca, valor = entrada
+            if caduca < time.monotonic():
+                del self._datos[clave]
+                return False, None
+
+            self._datos.move_to_end(clave)
+            return True, valor
+
+    def guardar(self, clave, valor):
+        with self._lock:
+            self._datos[clave] = (time.monotonic() + self.ttl, valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+
+    def __len__(self):
+        return len(self._datos)
+
+
+cache_api = CacheLRU()
+
+_version = {'valor': None, 'leida': 0.0}
+_version_lock = threading.Lock()
+
+SENTENCIA_VERSION = select(VersionDatos.version).where(VersionDatos.id == 1)
+
+
+def _version_vigente():
+    """Devuelve la versión conocida si se leyó hace menos de CACHE_INTERVALO_VERSION segundos."""
+    if _version['valor'] is not None and time.monotonic() - _version['leida'] < CACHE_INTERVALO_VERSION:
+        return _version['valor']
+    return None
+
+
+def _registrar_version(valor) -> int:
+    """Guarda la versión leída; si ha cambiado se vacía la caché entera en ese momento."""
+    valor = valor or 0
+    with _version_lock:
+        if valor != _version['valor']:
+            cache_api.limpiar()
+        _version['valor'] = valor
+        _version['leida'] = time.monotonic()
+    return valor
+
+
+async def version_datos_async(db: AsyncSession) -> int:
+    """
+    Sello de versión de los datos publicado por la ingesta.
+    Se consulta como mucho cada CACHE_INTERVALO_VERSION segundos.
+    """
+    vigente = _version_vigente()
+    if vigente is not None:
+        return vigente
+    return _registrar_version(await db.scalar(SENTENCIA_VERSION))
+
+
+def version_conocida():
+    """
+    Última versión de datos leída por este proceso, sin consultar la base de
+    datos (None si todavía no se ha leído ninguna).
+    """
+    return _version['valor']
+
+
+async def vigilar_version_datos(intervalo: float = CACHE_INTERVALO_VERSION):
+    """
+    Tarea de fondo de la API: relee la versión de datos cada `intervalo`
+    segundos para que version_conocida() esté siempre al día sin que las
+    peticiones tengan que consultarla.
+    """
+    while True:
+        try:
+            async with AsyncSessionLocal() as db:
+                _registrar_version(await db.scalar(SENTENCIA_VERSION))
+        except Exception as e:
+            # Si la base de datos no responde se conserva la última versión conocida
+            print(f"No se pudo leer la versión de datos: {e}")
+        await asyncio.sleep(intervalo)
+
+
+def cacheado(nombre: str):
+    """
+    Decorador para corrutinas de servicio cuyo primer argumento es la
+    AsyncSession. La clave es (nombre, versión de datos, resto de argumentos),
+    de modo que cada combinación de filtros tiene su propia entrada.
+    """
+    def decorador(funcion):
+        if not inspect.iscoroutinefunction(funcion):
+            raise TypeError(f"cacheado('{nombre}') solo admite corrutinas (async def)")
+
+        firma = inspect.signature(funcion)
+        aciertos = CONSULTAS_CACHE.labels(nombre, 'acierto')
+        fallos = CONSULTAS_CACHE.labels(nombre, 'fallo')
+
+        def parametros(db, args, kwargs):
+            argumentos = firma.bind(db, *args, **kwargs)
+            argumentos.apply_defaults()
+            return tuple((k, v) for k, v in argumentos.arguments.items() if k != 'db')
+
+        @wraps(funcion)
+        async def envoltorio(db: AsyncSession, *args, **kwargs):
+            clave = (nombre, await version_datos_async(db), parametros(db, args, kwargs))
+            encontrado, valor = cache_api.obtener(clave)
+            (aciertos if encontrado else fallos).inc()
+            if encontrado:
+                return valor
+
+            valor = await funcion(db, *args, **kwargs)
+            cache_api.guardar(clave, valor)
+            return valor
+
+        return envoltorio
+
+    return decorador
@@ -0,0 +1,64 @@
+import hashlib
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import Response
+
+from database.config import HTTP_CACHE_MAX_AGE
+from microservicio_exposicion.cache import version_conocida
+
+
+def calcular_etag(version: int, ruta: str, query: str) -> str:
+    """
+    ETag débil: versión de datos + ruta + parámetros. Es débil porque la
+    misma representación puede enviarse comprimida de distintas formas.
+    """
+    huella = hashlib.sha1(f"{ruta}?{query}".encode()).hexdigest()[:16]
+    return f'W/"v{version}-{huella}"'
+
+
+def _coincide(if_none_match: str, etag: str) -> bool:
+    candidatos = [e.strip() for e in if_none_match.split(",")]
+    # La comparación de If-None-Match es débil: se ignora el prefijo W/
+    return "*" in candidatos or etag.removeprefix("W/") in (c.removeprefix("W/") for c in candidatos)
+
+
+class ETagVersionDatos:
+    """
+    Middleware ASGI de GET condicional para endpoints cuyo contenido solo
+    cambia con la versión de datos publicada por la ingesta.
+    - Añade ETag y Cache-Control a las respuestas 200.
+    - Si If-None-Match coincide, responde 304 sin llegar al endpoint (y por
+      tanto sin tocar Postgres): la versión se lee de memoria.
+    Mientras el proceso no conoce ninguna versión las peticiones pasan tal cual.
+    """
+
+    def __init__(self, app, rutas: list[str], max_age: int = HTTP_CACHE_MAX_AGE):
+        self.app = app
+        self.rutas = set(rutas)
+        self.cache_control = f"public, max-age={max_age}"
+
+    async def __call__(self, scope, receive, send):
+        version = version_conocida()
+        if (
+            scope["type"] != "http"
+            or scope["method"] not in ("GET", "HEAD")
+            or scope["path"] not in self.rutas
+            or version is None
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        etag = calcular_etag(version, scope["path"], scope["query_string"].decode("latin-1"))
+        cabeceras = {"ETag": etag, "Cache-Control": self.cache_control}
+
+        if_none_match = Headers(scope=scope).get("if-none-match")
+        if if_none_match and _coincide(if_none_match, etag):
+            await Response(status_code=304, headers=cabeceras)(scope, receive, send)
+            return
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start" and mensaje["status"] == 200:
+                MutableHeaders(scope=mensaje).update(cabeceras)
+            await send(mensaje)
+
+        await self.app(scope, receive, enviar)
@@ -0,0 +1,173 @@
+import hmac
+import json
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+from urllib.parse import urlencode
+
+from starlette.datastructures import Headers, MutableHeaders, QueryParams
+from starlette.responses import Response
+
+from database.config import API_ADMIN_TOKEN
+from database.connection import MetricasBD, metricas_bd
+from microservicio_exposicion.metricas import observar_peticion
+
+# Una línea JSON por petición, para poder filtrar y agregar los logs
+logger = logging.getLogger("microservicio_exposicion.peticiones")
+if not logger.handlers:
+    _manejador = logging.StreamHandler()
+    _manejador.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_manejador)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+class MetricasPeticion:
+    """Tiempos y contadores de una petición de la API."""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.bd = MetricasBD()
+        self.serializacion = 0.0
+
+    def milisegundos(self) -> dict:
+        total = (time.perf_counter() - self.inicio) * 1000
+        bd = self.bd.segundos * 1000
+        serializacion = self.serializacion * 1000
+        return {
+            "total": total,
+            "bd": bd,
+            "serializacion": serializacion,
+            "app": max(total - bd - serializacion, 0.0),
+        }
+
+    def server_timing(self) -> str:
+        ms = self.milisegundos()
+        filas = f", {self.bd.filas} filas" if self.bd.filas is not None else ""
+        return (
+            f'bd;dur={ms["bd"]:.1f};desc="{self.bd.sentencias} sentencias{filas}", '
+            f'ser;dur={ms["serializacion"]:.1f}, '
+            f'app;dur={ms["app"]:.1f}, '
+            f'total;dur={ms["total"]:.1f}'
+        )
+
+
+_metricas_peticion: ContextVar[Optional[MetricasPeticion]] = ContextVar("metricas_peticion", default=None)
+
+
+@contextmanager
+def medir_serializacion():
+    """Suma la duración del bloque al tiempo de serialización de la petición en curso."""
+    metricas = _metricas_peticion.get()
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        if metricas is not None:
+            metricas.serializacion += time.perf_counter() - inicio
+
+
+class InstrumentacionPeticiones:
+    """
+    Middleware ASGI que mide cada petición: sentencias SQL, tiempo en base de
+    datos y filas leídas (eventos del engine en database/connection.py),
+    tiempo de serialización JSON y latencia total.
+    - Añade la cabecera Server-Timing (visible en las DevTools del navegador).
+      Se calcula al empezar la respuesta: en las descargas en streaming no
+      incluye lo que se lee después.
+    - Escribe una línea JSON por petición al terminarla, ya con todo, y
+      registra su latencia en /metrics.
+    - Con ?_profile=1 (o ?_profile=html) y la cabecera X-Admin-Token igual a
+      API_ADMIN_TOKEN, ejecuta la petición bajo pyinstrument y devuelve el
+      perfil muestreado en lugar de la respuesta.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        consulta = QueryParams(scope["query_string"].decode("latin-1"))
+        if consulta.get("_profile") in ("1", "html"):
+            await self._perfilar(scope, receive, send, consulta)
+            return
+
+        await self._medir(scope, receive, send)
+
+    async def _medir(self, scope, receive, send):
+        metricas = MetricasPeticion()
+        testigo_bd = metricas_bd.set(metricas.bd)
+        testigo = _metricas_peticion.set(metricas)
+        estado = 500
+
+        async def enviar(mensaje):
+            nonlocal estado
+            if mensaje["type"] == "http.response.start":
+                estado = mensaje["status"]
+                cabeceras = MutableHeaders(scope=mensaje)
+                cabeceras.append("Server-Timing", metricas.server_timing())
+                cabeceras.append("Timing-Allow-Origin", "*")
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            metricas_bd.reset(testigo_bd)
+            _metricas_peticion.reset(testigo)
+            ms = metricas.milisegundos()
+            observar_peticion(scope, estado, ms["total"] / 1000)
+            logger.info(json.dumps({
+                "metodo": scope["method"],
+                "ruta": scope["path"],
+                "consulta": scope["query_string"].decode("latin-1"),
+                "estado": estado,
+                "total_ms": round(ms["total"], 1),
+                "bd_ms": round(ms["bd"], 1),
+                "serializacion_ms": round(ms["serializacion"], 1),
+                "sentencias": metricas.bd.sentencias,
+                "filas": metricas.bd.filas,
+            }, ensure_ascii=False))
+
+    async def _perfilar(self, scope, receive, send, consulta: QueryParams):
+        token = Headers(scope=scope).get("x-admin-token", "")
+        if not API_ADMIN_TOKEN or not hmac.compare_digest(token, API_ADMIN_TOKEN):
+            await Response("Perfilado no autorizado", status_code=403)(scope, receive, send)
+            return
+
+        try:
+            # Solo se importa al perfilar: no carga nada en el arranque
+            from pyinstrument import Profiler
+        except ImportError:
+            await Response("pyinstrument no está instalado", status_code=501)(scope, receive, send)
+            return
+
+        formato = consulta["_profile"]
+        # La petición se ejecuta sin _profile y sin If-None-Match (para que no
+        # acabe en un 304) y su respuesta se descarta
+        resto = [(clave, valor) for clave, valor in consulta.multi_items() if clave != "_profile"]
+        alcance = {
+            **scope,
+            "query_string": urlencode(resto).encode("latin-1"),
+            "headers": [(k, v) for k, v in scope["headers"] if k != b"if-none-match"],
+        }
+
+        async def descartar(mensaje):
+            pass
+
+        perfilador = Profiler(interval=0.001, async_mode="enabled")
+        perfilador.start()
+        try:
+            await self._medir(alcance, receive, descartar)
+        finally:
+            perfilador.stop()
+
+        if formato == "html":
+            respuesta = Response(perfilador.output_html(), media_type="text/html")
+        else:
+            respuesta = Response(perfilador.output_text(unicode=True, color=False), media_type="text/plain")
+        await respuesta(scope, receive, send)
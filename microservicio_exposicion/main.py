@@ -1,17 +1,75 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Literal
 
 # Importaciones locales
-from database.connection import get_db
-from microservicio_exposicion.schemas import ResultadoIndicadorResponse, ScoreRequest, ScoreResponse, FiltrosResponse
-from microservicio_exposicion.services import obtener_data_consulta, calcular_brainnova_score, obtener_nombres_indicadores_disponibles, obtener_filtros_unicos, obtener_filtros_disponibles
+from database.config import API_WORKERS
+from database.connection import get_async_db, AsyncSessionLocal
+from microservicio_exposicion.schemas import ResultadoIndicadorResponse, ScoreRequest, ScoreResponse, FiltrosResponse, ScoreBatchRequest, ScoreBatchItem, IndicadorBusquedaResponse, DimensionEstadisticas, ValorIndicadorResponse, KPIDestacadoResponse, ResumenDashboardResponse, SeriesResponse, RankingResponse
+from microservicio_exposicion.services import codificar_cursor
+from microservicio_exposicion.serializacion import RespuestaJSON, JSONMedido, serializar_filas
+from microservicio_exposicion.cache import vigilar_version_datos
+from microservicio_exposicion.cache_http import ETagVersionDatos
+from microservicio_exposicion.instrumentacion import InstrumentacionPeticiones
+from microservicio_exposicion.metricas import SCORES_SIN_DATOS, exportar_metricas, preparar_multiproceso, marcar_proceso_terminado
+from microservicio_exposicion.services_async import obtener_data_consulta, calcular_brainnova_score, obtener_nombres_indicadores_disponibles, obtener_filtros_basicos, obtener_filtros_disponibles, exportar_resultados, obtener_score_precalculado, calcular_scores_lote, buscar_indicadores
+from microservicio_exposicion.services_async import obtener_estadisticas_dimensiones, obtener_ultimos_valores, obtener_top_indicadores, obtener_kpis_destacados, obtener_resumen_dashboard, obtener_series, obtener_ranking
 
-from database.modelos import ResultadoIndicador
 import uvicorn
 
-app = FastAPI(title="Brainnova API")
+try:
+    # brotli con gzip como alternativa para los clientes que no lo aceptan
+    from brotli_asgi import BrotliMiddleware
+except ImportError:
+    BrotliMiddleware = None
+
+@asynccontextmanager
+async def ciclo_vida(app: FastAPI):
+    # Mantiene en memoria la versión de datos que usan la caché y los ETag
+    vigilancia = asyncio.create_task(vigilar_version_datos())
+    yield
+    vigilancia.cancel()
+    marcar_proceso_terminado()
+
+app = FastAPI(title="Brainnova API", lifespan=ciclo_vida, default_response_class=JSONMedido)
+
+# Los middleware añadidos después envuelven a los anteriores: el orden final
+# es CORS -> métricas -> compresión -> ETag -> endpoint, así que los 304 también
+# llevan CORS y el tiempo total incluye la compresión.
+
+# GET condicional (ETag / 304) en los endpoints que solo cambian con cada carga
+app.add_middleware(
+    ETagVersionDatos,
+    rutas=[
+        "/api/v1/resultados",
+        "/api/v1/filtros-globales",
+        "/api/v1/filtros-disponibles",
+        "/api/v1/indicadores-disponibles",
+        "/api/v1/indicadores/buscar",
+        "/api/v1/dashboard/dimensiones",
+        "/api/v1/dashboard/ultimos-valores",
+        "/api/v1/dashboard/top-indicadores",
+        "/api/v1/dashboard/kpis-destacados",
+        "/api/v1/dashboard/resumen",
+        "/api/v1/series",
+        "/api/v1/ranking",
+    ],
+)
+
+# Compresión negociada con Accept-Encoding
+if BrotliMiddleware is not None:
+    app.add_middleware(BrotliMiddleware, minimum_size=1000, gzip_fallback=True)
+else:
+    app.add_middleware(GZipMiddleware, minimum_size=1000)
+
+# Server-Timing, log estructurado por petición y ?_profile=1 (ver instrumentacion.py)
+app.add_middleware(InstrumentacionPeticiones)
 
 # Configuración CORS
 origins = ["http://localhost:3000", "http://localhost:5173", "http://localhost:4173", "*"]
@@ -21,55 +79,100 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Server-Timing"],
 )
 
-from fastapi import FastAPI, Depends, Query
+from fastapi import FastAPI, Depends, Query, Response
 from typing import List, Optional
-from sqlalchemy.orm import Session
 
+CAMPOS_RESULTADO = list(ResultadoIndicadorResponse.model_fields)
+
+# response_model documenta el esquema en OpenAPI; la respuesta se serializa
+# directamente desde las filas sin revalidarla (ver serializacion.py)
 @app.get("/api/v1/resultados", response_model=List[ResultadoIndicadorResponse])
-def leer_resultados(
+async def leer_resultados(
     page: int = Query(1, ge=1),
     per_page: int = Query(1000, le=5000),
+    cursor: Optional[str] = Query(None, description="Cursor opaco devuelto en la cabecera X-Next-Cursor"),
     pais: Optional[str] = None,
     periodo: Optional[int] = None,
     sector: Optional[str] = None,
     tamano_empresa: Optional[str] = None, 
     provincia: Optional[str] = None,  # <--- 1. AÑADE ESTO (Faltaba recibirlo)
     nombre_indicador: Optional[str] = Query(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     skip = (page - 1) * per_page
     
-    datos = obtener_data_consulta(
-        db=db,
-        skip=skip,
-        limit=per_page,
-        pais=pais,
-        periodo=periodo,
-        sector=sector,
-        nombre_indicador=nombre_indicador,
-        tamano=tamano_empresa,
-        provincia=provincia  
-    )
+    try:
+        datos = await obtener_data_consulta(
+            db=db,
+            skip=skip,
+            limit=per_page,
+            pais=pais,
+            periodo=periodo,
+            sector=sector,
+            nombre_indicador=nombre_indicador,
+            tamano=tamano_empresa,
+            provincia=provincia,
+            cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    response = RespuestaJSON(serializar_filas(datos, CAMPOS_RESULTADO))
+
+    # Página completa: puede haber más filas, se anuncia el cursor de la siguiente
+    if len(datos) == per_page:
+        ultimo = datos[-1]
+        response.headers["X-Next-Cursor"] = codificar_cursor(ultimo.periodo, ultimo.id_resultado)
     
-    return [
-        {
-            "nombre_indicador": row.nombre_indicador,
-            "resultado": float(row.resultado) if row.resultado is not None else 0.0,
-            "periodo": row.periodo,
-            "pais": row.pais,
-            "provincia": row.provincia,
-            "sector": row.sector,
-            "tamano_empresa": row.tamano_empresa
-        }
-        for row in datos
-    ]
+    return response
+
+@app.get("/api/v1/resultados/export")
+async def exportar_resultados_stream(
+    formato: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    pais: Optional[str] = None,
+    periodo: Optional[int] = None,
+    sector: Optional[str] = None,
+    tamano_empresa: Optional[str] = None,
+    provincia: Optional[str] = None,
+    nombre_indicador: Optional[str] = Query(None)
+):
+    """
+    Exporta todos los resultados que cumplen los filtros en NDJSON o CSV.
+    Las filas se envían según se leen de la base de datos, sin paginar.
+    """
+    # La sesión vive lo mismo que el stream, no lo que dura la función
+    async def generar():
+        async with AsyncSessionLocal() as db:
+            async for bloque in exportar_resultados(
+                db=db,
+                formato=formato,
+                pais=pais,
+                periodo=periodo,
+                sector=sector,
+                nombre_indicador=nombre_indicador,
+                tamano=tamano_empresa,
+                provincia=provincia
+            ):
+                yield bloque
+
+    media_type = "text/csv; charset=utf-8" if formato == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        generar(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="resultados.{formato}"'}
+    )
 
 # --- ENDPOINT 2: Cálculo Score ---
 @app.post("/api/v1/brainnova-score", response_model=ScoreResponse)
-def get_brainnova_score(req: ScoreRequest, db: Session = Depends(get_db)):
-    resultado = calcular_brainnova_score(
+async def get_brainnova_score(
+    req: ScoreRequest,
+    recompute: bool = Query(False, description="Ignora el score precalculado y lo calcula en el momento"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    contexto = dict(
         db=db,
         pais=req.pais,
         periodo=req.periodo,
@@ -77,50 +180,230 @@ def get_brainnova_score(req: ScoreRequest, db: Session = Depends(get_db)):
         tamano=req.tamano_empresa,
         provincia=req.provincia
     )
+
+    resultado = None if recompute else await obtener_score_precalculado(**contexto)
+
+    # Sin precálculo (o si se pide expresamente) se usa el cálculo en vivo
+    if resultado is None:
+        resultado = await calcular_brainnova_score(**contexto)
     
     if not resultado:
+        SCORES_SIN_DATOS.inc()
         raise HTTPException(status_code=404, detail="No hay datos suficientes para calcular el score")
     
     return resultado
 
+@app.post("/api/v1/brainnova-score/batch", response_model=List[ScoreBatchItem])
+async def get_brainnova_scores_lote(req: ScoreBatchRequest, db: AsyncSession = Depends(get_async_db)):
+    """
+    Calcula varios scores en una sola petición: una lista de contextos,
+    un producto cartesiano (ej: todos los países para 2023/sector/tamaño) o ambos.
+    Los contextos sin datos se omiten de la respuesta. El producto debe fijar
+    al menos una lista y el lote no puede pasar de 1000 combinaciones.
+    """
+    if not req.contextos and req.producto is None:
+        raise HTTPException(status_code=400, detail="Indica al menos un contexto o un producto de contextos")
+
+    try:
+        return await calcular_scores_lote(
+            db=db,
+            contextos=[
+                {
+                    "pais": c.pais,
+                    "periodo": c.periodo,
+                    "sector": c.sector,
+                    "tamano": c.tamano_empresa,
+                    "provincia": c.provincia
+                }
+                for c in req.contextos
+            ],
+            producto=req.producto.model_dump() if req.producto else None
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.get("/api/v1/indicadores-disponibles", response_model=List[str])
-def lista_indicadores_activos(db: Session = Depends(get_db)):
+async def lista_indicadores_activos(db: AsyncSession = Depends(get_async_db)):
     """
     Devuelve la lista de indicadores que tienen datos reales asociados.
     Ideal para rellenar desplegables (Select) en el Frontend.
     """
-    nombres = obtener_nombres_indicadores_disponibles(db)
+    nombres = await obtener_nombres_indicadores_disponibles(db)
     return nombres
 
+@app.get("/api/v1/indicadores/buscar", response_model=List[IndicadorBusquedaResponse])
+async def buscar_indicadores_por_nombre(
+    q: str = Query(..., min_length=2, max_length=100, description="Texto a buscar en el nombre del indicador"),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Busca indicadores por nombre sin distinguir mayúsculas ni tildes,
+    ordenados de más a menos relevante. Tolera palabras sueltas y erratas.
+    """
+    return await buscar_indicadores(db, q.strip(), limit)
+
 @app.get("/api/v1/filtros-disponibles")
-def obtener_filtros(db: Session = Depends(get_db)):
+async def obtener_filtros(db: AsyncSession = Depends(get_async_db)):
     """
     Devuelve todos los valores posibles para los desplegables de filtrado
     """
-    return {
-        "paises": [r[0] for r in obtener_filtros_unicos(db, ResultadoIndicador.pais)],
-        "periodos": [r[0].year for r in obtener_filtros_unicos(db, ResultadoIndicador.periodo)], # Ojo con .year si es Date
-        "sectores": [r[0] for r in obtener_filtros_unicos(db, ResultadoIndicador.sector) if r[0]], # if r[0] filtra nulos
-        "tamano_empresa": [r[0] for r in obtener_filtros_unicos(db, ResultadoIndicador.tamano_empresa) if r[0]]
-    }
+    return await obtener_filtros_basicos(db)
 
 @app.get("/api/v1/filtros-globales", response_model=FiltrosResponse)
-def get_filtros_globales(
+async def get_filtros_globales(
     pais: Optional[str] = None,
     periodo: Optional[int] = None,
     sector: Optional[str] = None,
     tamano: Optional[str] = None,
     nombre_indicador: Optional[str] = Query(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Devuelve opciones de filtrado.
     Si envías parámetros (ej: ?pais=España), las listas devueltas (provincias, sectores...)
     se filtrarán para mostrar solo lo disponible en ese contexto.
     """
-    return obtener_filtros_disponibles(db, pais, periodo, sector, tamano, nombre_indicador=nombre_indicador)
+    return await obtener_filtros_disponibles(db, pais, periodo, sector, tamano, nombre_indicador=nombre_indicador)
+
+# --- DASHBOARD ---
+# Cada endpoint resuelve en una sola consulta lo que el frontend calculaba
+# descargando tablas enteras y agregando en el navegador.
+
+@app.get("/api/v1/dashboard/dimensiones", response_model=List[DimensionEstadisticas])
+async def dashboard_dimensiones(
+    pais: Optional[str] = Query(None, description="Si se indica, indicadores_con_datos cuenta solo los datos de ese país"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Dimensiones con sus subdimensiones, el número de indicadores definidos
+    y cuántos tienen datos.
+    """
+    return await obtener_estadisticas_dimensiones(db, pais)
+
+@app.get("/api/v1/dashboard/ultimos-valores", response_model=List[ValorIndicadorResponse])
+async def dashboard_ultimos_valores(
+    pais: Optional[str] = None,
+    periodo: Optional[int] = None,
+    dimension: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Último valor disponible de cada indicador (el año más reciente; a igualdad,
+    el dato nacional) y su número de resultados.
+    """
+    return await obtener_ultimos_valores(db, pais, periodo, dimension)
+
+@app.get("/api/v1/dashboard/top-indicadores", response_model=List[ValorIndicadorResponse])
+async def dashboard_top_indicadores(
+    limit: int = Query(10, ge=1, le=100),
+    pais: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Indicadores ordenados por importancia y cantidad de datos, con su último valor.
+    """
+    return await obtener_top_indicadores(db, limit, pais)
+
+@app.get("/api/v1/dashboard/kpis-destacados", response_model=List[KPIDestacadoResponse])
+async def dashboard_kpis_destacados(
+    pais: str = "España",
+    limit: int = Query(3, ge=1, le=20),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    KPIs de la portada: prioriza los datos del país pedido y los indicadores
+    de importancia alta.
+    """
+    return await obtener_kpis_destacados(db, pais, limit)
+
+@app.get("/api/v1/dashboard/resumen", response_model=ResumenDashboardResponse)
+async def dashboard_resumen(
+    pais: str = "España",
+    limit_kpis: int = Query(3, ge=1, le=20),
+    limit_top: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Dimensiones, KPIs destacados y top de indicadores en una sola petición.
+    """
+    return await obtener_resumen_dashboard(db, pais, limit_kpis, limit_top)
+
+# --- SERIES TEMPORALES ---
+
+MAX_INDICADORES_SERIE = 20
+
+@app.get("/api/v1/series", response_model=SeriesResponse)
+async def leer_series(
+    indicador: List[str] = Query(..., description="Nombre exacto del indicador; se puede repetir"),
+    agrupar: Literal["pais", "sector"] = "pais",
+    pais: List[str] = Query([], description="Países a incluir; se puede repetir (vacío = todos)"),
+    sector: Optional[str] = None,
+    tamano_empresa: Optional[str] = None,
+    provincia: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Series temporales en formato columnar para gráficos de tendencia: por cada
+    indicador, la lista de años y un array de valores por país o sector
+    alineado con ella (null donde no hay dato). Sin sector o tamaño se usa el
+    total que publique cada indicador (filas sin desglose, 'Total', GE10...);
+    si alguno no tiene total se responde 400 con los valores disponibles.
+    """
+    if len(indicador) > MAX_INDICADORES_SERIE:
+        raise HTTPException(status_code=400, detail=f"Como máximo {MAX_INDICADORES_SERIE} indicadores por petición")
+
+    try:
+        return await obtener_series(
+            db, tuple(dict.fromkeys(indicador)), agrupar, tuple(sorted(set(pais))),
+            sector, tamano_empresa, provincia
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# --- RANKING ENTRE PAÍSES ---
+
+@app.get("/api/v1/ranking", response_model=RankingResponse)
+async def leer_ranking(
+    indicador: str = Query(..., description="Nombre exacto del indicador"),
+    periodo: Optional[int] = Query(None, description="Año; por defecto el último con datos"),
+    sector: Optional[str] = None,
+    tamano_empresa: Optional[str] = None,
+    provincia: Optional[str] = Query(None, description="Provincia a situar respecto al ranking de países"),
+    ascendente: bool = Query(False, description="True si un valor menor es mejor"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Ranking de países para un indicador y año: posición, percentil, z-score y
+    distancia a la media de la UE. Los agregados de la UE no entran en el ranking.
+    El sector se busca por subcadena, como en /api/v1/resultados. Sin sector o
+    tamaño se usa el total que publique el indicador; si no tiene, se responde
+    400 con los valores disponibles.
+    """
+    try:
+        return await obtener_ranking(db, indicador, periodo, sector, tamano_empresa, provincia, ascendente)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# --- MÉTRICAS ---
+
+@app.get("/metrics", include_in_schema=False)
+async def metricas():
+    """
+    Métricas en formato de texto de Prometheus: latencia por ruta y por
+    función de servicio, pool de conexiones, caché y scores sin datos.
+    """
+    return Response(exportar_metricas(), media_type=CONTENT_TYPE_LATEST)
 
 def main():
     print("🚀 Levantando API para la demo...")
     # Usamos el puerto 8000 y escuchamos en todas las interfaces (0.0.0.0)
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    if API_WORKERS > 1:
+        # Modo producción: uvicorn arranca N procesos que importan la app por su
+        # ruta, así que cada worker crea su propio pool después de arrancar
+        print(f"   {API_WORKERS} workers")
+        # Los workers comparten las métricas a través de ficheros (ver metricas.py)
+        preparar_multiproceso()
+        uvicorn.run("microservicio_exposicion.main:app", host="0.0.0.0", port=8000, workers=API_WORKERS)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
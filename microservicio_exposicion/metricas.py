@@ -0,0 +1,130 @@
+import glob
+import os
+import tempfile
+import time
+from functools import wraps
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest, multiprocess
+from sqlalchemy import event
+
+from database.connection import engine, async_engine, observadores_checkout, OPCIONES_POOL
+
+# Métricas agregadas de la API en formato Prometheus (GET /metrics).
+# Con varios workers (API_WORKERS > 1) cada proceso escribe sus valores en
+# ficheros de PROMETHEUS_MULTIPROC_DIR y /metrics los suma al exportar.
+
+PETICIONES = Histogram(
+    "brainnova_peticion_segundos",
+    "Latencia de las peticiones HTTP por ruta",
+    ["metodo", "ruta", "estado"]
+)
+
+SERVICIOS = Histogram(
+    "brainnova_servicio_segundos",
+    "Duración de las funciones de servicio (incluye los aciertos de caché)",
+    ["funcion"]
+)
+
+CHECKOUT_POOL = Histogram(
+    "brainnova_pool_checkout_segundos",
+    "Tiempo hasta obtener una conexión del pool (espera si está agotado)",
+    ["engine"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30)
+)
+
+CONEXIONES_EN_USO = Gauge(
+    "brainnova_pool_conexiones_en_uso",
+    "Conexiones prestadas por el pool (saturación = en uso / capacidad)",
+    ["engine"],
+    multiprocess_mode="livesum"
+)
+
+CAPACIDAD_POOL = Gauge(
+    "brainnova_pool_capacidad",
+    "Máximo de conexiones del pool (pool_size + max_overflow)",
+    ["engine"],
+    multiprocess_mode="livesum"
+)
+
+CONSULTAS_CACHE = Counter(
+    "brainnova_cache_consultas",
+    "Consultas a la caché de la API por función y resultado (acierto/fallo)",
+    ["cache", "resultado"]
+)
+
+SCORES_SIN_DATOS = Counter(
+    "brainnova_score_sin_datos",
+    "Peticiones de score respondidas con 404 por falta de datos"
+)
+
+
+# --- POOL DE CONEXIONES ---
+
+ENGINES = {"sync": engine, "async": async_engine.sync_engine}
+
+def _registrar_pool(nombre: str, motor):
+    CAPACIDAD_POOL.labels(nombre).set(OPCIONES_POOL["pool_size"] + OPCIONES_POOL["max_overflow"])
+    en_uso = CONEXIONES_EN_USO.labels(nombre)
+    event.listen(motor, "checkout", lambda *args: en_uso.inc())
+    event.listen(motor, "checkin", lambda *args: en_uso.dec())
+
+for _nombre, _motor in ENGINES.items():
+    _registrar_pool(_nombre, _motor)
+
+def _observar_checkout(pool, segundos: float):
+    CHECKOUT_POOL.labels(pool.nombre).observe(segundos)
+
+observadores_checkout.append(_observar_checkout)
+
+
+# --- PETICIONES Y SERVICIOS ---
+
+def observar_peticion(scope, estado: int, segundos: float):
+    # Se etiqueta con la plantilla de la ruta, no con la URL, para acotar las series
+    ruta = scope.get("route")
+    PETICIONES.labels(scope["method"], ruta.path if ruta else "sin_ruta", str(estado)).observe(segundos)
+
+def cronometrado(funcion):
+    """Decorador para corrutinas de servicio: registra su duración en SERVICIOS."""
+    histograma = SERVICIOS.labels(funcion.__name__)
+
+    @wraps(funcion)
+    async def envoltorio(*args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return await funcion(*args, **kwargs)
+        finally:
+            histograma.observe(time.perf_counter() - inicio)
+
+    return envoltorio
+
+
+# --- EXPORTACIÓN ---
+
+def es_multiproceso() -> bool:
+    return bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+def exportar_metricas() -> bytes:
+    """Texto de Prometheus con las métricas de este proceso o, con varios workers, de todos."""
+    if es_multiproceso():
+        registro = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registro)
+        return generate_latest(registro)
+    return generate_latest(REGISTRY)
+
+def preparar_multiproceso():
+    """
+    Prepara PROMETHEUS_MULTIPROC_DIR antes de arrancar los workers: lo crea si
+    no está definido y borra los ficheros de ejecuciones anteriores. Los
+    workers lo heredan del entorno y prometheus_client lo lee al importarse.
+    """
+    directorio = os.environ.get("PROMETHEUS_MULTIPROC_DIR") or tempfile.mkdtemp(prefix="brainnova-metricas-")
+    os.makedirs(directorio, exist_ok=True)
+    for fichero in glob.glob(os.path.join(directorio, "*.db")):
+        os.remove(fichero)
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = directorio
+
+def marcar_proceso_terminado():
+    """Quita de los gauges 'live' los valores de este worker al pararse."""
+    if es_multiproceso():
+        multiprocess.mark_process_dead(os.getpid())
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, Field
+from typing import Optional, List, Dict
 from datetime import date
 
 class FiltrosResponse(BaseModel):
@@ -8,6 +8,8 @@ class FiltrosResponse(BaseModel):
     sectores: List[str]
     tamanos_empresa: List[str]
     anios: List[int]
+    # Nº de resultados por valor de cada faceta, para desactivar opciones vacías
+    conteos: Dict[str, Dict[str, int]] = {}
 
 # --- SALIDA: Listado de Resultados (Endpoint GET) ---
 class ResultadoIndicadorResponse(BaseModel):
@@ -42,4 +44,100 @@ class ScoreResponse(BaseModel):
     pais: str
     periodo: int
     sector: str
-    desglose_por_dimension: List[DimensionOutput]
\ No newline at end of file
+    desglose_por_dimension: List[DimensionOutput]
+
+# --- ENTRADA: Petición de Scores en lote (Endpoint POST) ---
+class ScoreProductoRequest(BaseModel):
+    # Producto cartesiano de contextos. Una lista vacía o nula = todos los valores con datos
+    paises: Optional[List[str]] = None
+    periodos: Optional[List[int]] = None
+    sectores: Optional[List[str]] = None
+    tamanos_empresa: Optional[List[str]] = None
+    provincia: Optional[str] = None
+
+class ScoreBatchRequest(BaseModel):
+    contextos: List[ScoreRequest] = Field(default_factory=list, max_length=1000)
+    producto: Optional[ScoreProductoRequest] = None
+
+# --- SALIDA: Respuesta de Scores en lote (Endpoint POST) ---
+class ScoreBatchItem(ScoreResponse):
+    tamano_empresa: str
+    provincia: Optional[str] = None
+
+# --- SALIDA: Búsqueda de indicadores (Endpoint GET) ---
+class IndicadorBusquedaResponse(BaseModel):
+    id: int
+    nombre: str
+    subdimension: Optional[str] = None
+    dimension: Optional[str] = None
+    relevancia: float
+
+# --- SALIDA: Dashboard (Endpoints GET) ---
+class SubdimensionEstadisticas(BaseModel):
+    subdimension: str
+    total_indicadores: int
+    indicadores_con_datos: int
+
+class DimensionEstadisticas(BaseModel):
+    dimension: str
+    peso: Optional[float] = None
+    total_subdimensiones: int
+    total_indicadores: int
+    indicadores_con_datos: int
+    subdimensiones: List[SubdimensionEstadisticas]
+
+class ValorIndicadorResponse(BaseModel):
+    nombre: str
+    valor: Optional[float] = None
+    periodo: Optional[int] = None
+    pais: Optional[str] = None
+    provincia: Optional[str] = None
+    sector: Optional[str] = None
+    tamano_empresa: Optional[str] = None
+    dimension: Optional[str] = None
+    subdimension: Optional[str] = None
+    importancia: Optional[str] = None
+    total_resultados: int
+
+class KPIDestacadoResponse(ValorIndicadorResponse):
+    unidad: Optional[str] = None
+
+class ResumenDashboardResponse(BaseModel):
+    dimensiones: List[DimensionEstadisticas]
+    kpis_destacados: List[KPIDestacadoResponse]
+    top_indicadores: List[ValorIndicadorResponse]
+
+# --- SALIDA: Series temporales (Endpoint GET) ---
+class SerieIndicador(BaseModel):
+    indicador: str
+    periodos: List[int]
+    # Una lista por grupo (país o sector), alineada con periodos
+    valores: Dict[str, List[Optional[float]]]
+
+class SeriesResponse(BaseModel):
+    agrupar: str
+    series: List[SerieIndicador]
+
+# --- SALIDA: Ranking entre países (Endpoint GET) ---
+class PosicionRanking(BaseModel):
+    pais: str
+    valor: float
+    posicion: int
+    percentil: Optional[float] = None  # 0 = el peor, 1 = el mejor
+    z_score: Optional[float] = None
+    diferencia_media_ue: Optional[float] = None
+
+class PosicionProvincia(PosicionRanking):
+    provincia: str
+
+class RankingResponse(BaseModel):
+    indicador: str
+    periodo: Optional[int] = None
+    total_paises: int
+    media_paises: Optional[float] = None
+    desviacion_paises: Optional[float] = None
+    media_ue: Optional[float] = None
+    # País del agregado UE usado como media; None si se ha calculado con los países
+    fuente_media_ue: Optional[str] = None
+    paises: List[PosicionRanking]
+    provincia: Optional[PosicionProvincia] = None
@@ -0,0 +1,46 @@
+from operator import itemgetter
+from typing import Sequence
+
+import orjson
+from fastapi.responses import JSONResponse, Response
+
+from microservicio_exposicion.instrumentacion import medir_serializacion
+
+# Camino rápido para listados grandes: las filas de SQLAlchemy se convierten en
+# bytes JSON con orjson. Cada fila pasa por un dict plano (campos y valores),
+# pero no por un modelo Pydantic ni por el codificador JSON estándar.
+# Los endpoints que lo usan mantienen su response_model para que el esquema
+# de OpenAPI no cambie; al devolver un Response, FastAPI no vuelve a validar.
+
+
+class RespuestaJSON(Response):
+    """Respuesta con un cuerpo JSON ya serializado (bytes)."""
+    media_type = "application/json"
+
+
+class JSONMedido(JSONResponse):
+    """
+    Respuesta JSON por defecto de la API: igual que JSONResponse, pero anota
+    el tiempo de codificación en las métricas de la petición.
+    """
+
+    def render(self, content) -> bytes:
+        with medir_serializacion():
+            return super().render(content)
+
+
+def serializar_filas(filas: Sequence, campos: Sequence[str]) -> bytes:
+    """
+    Serializa filas de SQLAlchemy como una lista JSON de objetos con los campos
+    indicados (en ese orden, al menos dos). Las columnas se localizan una sola vez por nombre;
+    fechas, None y números los codifica orjson de forma nativa.
+    """
+    if not filas:
+        return b"[]"
+
+    with medir_serializacion():
+        columnas = filas[0]._fields
+        extraer = itemgetter(*(columnas.index(campo) for campo in campos))
+
+        return orjson.dumps([dict(zip(campos, extraer(fila))) for fila in filas])
+
@@ -1,291 +1,883 @@
-from sqlalchemy.orm import Session, aliased
-from sqlalchemy import func, extract, or_, distinct
+from sqlalchemy import select, func, distinct, or_, and_, true, false, literal, cast, tuple_, union_all, Float
 from collections import defaultdict
-from database.modelos import (
-    ResultadoIndicador, ComponenteIndicador, DefinicionIndicador, 
-    Subdimension, Dimension, ProcessedDatoCrudo, DatoCrudo
-)
+from datetime import date
+import base64
+import csv
+import io
+import json
+from database.modelos import HechoIndicador, ResultadoIndicador, ScoreBrainnova, DefinicionIndicador, Subdimension, Dimension
+from database.indices import texto_normalizado, documento_busqueda, consulta_busqueda
+from database.modelos.scores_brainnova import TODAS_PROVINCIAS
+from database.scores import calcular_scores, marco_desde_columnas, transponer, scores_por_contexto, PESO_IMPORTANCIA, COLUMNAS_SCORE, SENTENCIA_SCORES_CONTEXTO
+
+# Sentencias (select) y tratamiento de las filas de cada servicio de la API.
+# services_async.py las ejecuta; aquí no se accede a la base de datos.
+
+def codificar_cursor(periodo: date | None, id_resultado: int) -> str:
+    """
+    Construye un cursor opaco a partir de la clave de ordenación (periodo, id).
+    """
+    clave = [periodo.isoformat() if periodo else None, id_resultado]
+    return base64.urlsafe_b64encode(json.dumps(clave).encode()).decode()
 
-def obtener_filtros_unicos(db: Session, columna):
+def decodificar_cursor(cursor: str) -> tuple[date | None, int]:
     """
-    Helper genérico para sacar valores únicos de una columna de ResultadoIndicador
+    Inverso de codificar_cursor. Lanza ValueError si el cursor no es válido.
     """
-    return db.query(distinct(columna)).order_by(columna.asc()).all()
+    try:
+        periodo, id_resultado = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return (date.fromisoformat(periodo) if periodo else None), int(id_resultado)
+    except Exception as e:
+        raise ValueError(f"Cursor no válido: {cursor}") from e
+
+# Principio de la cola de filas sin periodo de la paginación por clave
+CURSOR_COLA = codificar_cursor(None, 0)
+
+def en_cola(cursor: str) -> bool:
+    """Si el cursor ya está en la cola de filas sin periodo."""
+    return decodificar_cursor(cursor)[0] is None
+
+def sentencia_filtros_unicos(columna):
+    """Valores únicos de una columna de ResultadoIndicador."""
+    return select(distinct(columna)).order_by(columna.asc())
+
+COLUMNAS_FILTROS_BASICOS = {
+    "paises": ResultadoIndicador.pais,
+    "periodos": ResultadoIndicador.anio,
+    "sectores": ResultadoIndicador.sector,
+    "tamano_empresa": ResultadoIndicador.tamano_empresa
+}
+
+def formatear_filtros_basicos(valores: dict) -> dict:
+    """valores: {clave de COLUMNAS_FILTROS_BASICOS: filas devueltas por sentencia_filtros_unicos}"""
+    return {
+        "paises": [r[0] for r in valores["paises"]],
+        "periodos": [r[0] for r in valores["periodos"] if r[0] is not None],
+        "sectores": [r[0] for r in valores["sectores"] if r[0]], # if r[0] filtra nulos
+        "tamano_empresa": [r[0] for r in valores["tamano_empresa"] if r[0]]
+    }
+
+FACETAS = {
+    "paises": "pais",
+    "sectores": "sector",
+    "tamanos_empresa": "tamano_empresa",
+    "provincias": "provincia",
+    "anios": "anio"
+}
+
+def sentencia_facetas(nombre_indicador: str = None):
+    """Combinaciones (país, sector, tamaño, provincia, año) con su número de resultados."""
+    columnas = (
+        HechoIndicador.pais,
+        HechoIndicador.sector,
+        HechoIndicador.tamano_empresa,
+        HechoIndicador.provincia,
+        HechoIndicador.anio
+    )
+    sentencia = select(*columnas, func.count().label('total'))
 
-def obtener_filtros_disponibles(
-    db: Session, 
-    pais: str = None, 
-    periodo: int = None, 
-    sector: str = None, 
-    tamano: str = None,
-    nombre_indicador: str = None
-):
-    # 1. Preparamos los alias
-    IndicadorDesdeComponente = aliased(DefinicionIndicador)
-    IndicadorDesdeCrudo = aliased(DefinicionIndicador)
-    
-    # 2. Definimos la columna consolidada del nombre
-    nombre_consolidado = func.coalesce(IndicadorDesdeComponente.nombre, IndicadorDesdeCrudo.nombre)
-
-    # 3. Función interna que construye la query CORRECTAMENTE con los JOINS
-    def get_distinct_values(target_col):
-        # IMPORTANTE: Empezamos seleccionando desde la tabla principal
-        q = db.query(distinct(target_col)).select_from(ResultadoIndicador)
-        
-        # --- APLICAR JOINS SIEMPRE QUE HAYA FILTRO DE NOMBRE ---
-        # Sin esto, el filtro where no funciona porque no conoce las tablas unidas
-        if nombre_indicador:
-            q = q.outerjoin(ResultadoIndicador.componente)\
-                 .outerjoin(IndicadorDesdeComponente, ComponenteIndicador.indicador)\
-                 .outerjoin(ResultadoIndicador.origen_crudo)\
-                 .outerjoin(ProcessedDatoCrudo.dato_crudo_origen)\
-                 .outerjoin(IndicadorDesdeCrudo, DatoCrudo.indicador)
-            
-            q = q.filter(nombre_consolidado == nombre_indicador)
-
-        # --- FILTROS DE CASCADA (Contexto) ---
-        q = q.filter(target_col != None) # Nunca devolver nulos
-
-        # Aplicamos filtros cruzados (si selecciono País, filtra Sectores, etc.)
-        if pais and target_col != ResultadoIndicador.pais:
-            q = q.filter(ResultadoIndicador.pais == pais)
-            
-        if periodo and target_col != extract('year', ResultadoIndicador.periodo):
-            q = q.filter(extract('year', ResultadoIndicador.periodo) == periodo)
-            
-        if sector and target_col != ResultadoIndicador.sector:
-            q = q.filter(ResultadoIndicador.sector == sector)
-
-        if tamano and target_col != ResultadoIndicador.tamano_empresa:
-            q = q.filter(ResultadoIndicador.tamano_empresa == tamano)
-
-        # Ordenar resultados
-        return q.order_by(target_col.asc()).all()
-
-    # 4. Ejecutar consultas
-    paises_res = get_distinct_values(ResultadoIndicador.pais)
-    sectores_res = get_distinct_values(ResultadoIndicador.sector)
-    tamanos_res = get_distinct_values(ResultadoIndicador.tamano_empresa)
-    provincias_res = get_distinct_values(ResultadoIndicador.provincia) # <--- ESTO AHORA DEVOLVERÁ DATOS
-
-    # 5. Lógica especial para años (por el extract)
-    col_anio = extract('year', ResultadoIndicador.periodo)
-    q_anios = db.query(distinct(col_anio)).select_from(ResultadoIndicador).filter(ResultadoIndicador.periodo != None)
-    
-    # Repetimos los Joins para años también
     if nombre_indicador:
-        q_anios = q_anios.outerjoin(ResultadoIndicador.componente)\
-                 .outerjoin(IndicadorDesdeComponente, ComponenteIndicador.indicador)\
-                 .outerjoin(ResultadoIndicador.origen_crudo)\
-                 .outerjoin(ProcessedDatoCrudo.dato_crudo_origen)\
-                 .outerjoin(IndicadorDesdeCrudo, DatoCrudo.indicador)\
-                 .filter(nombre_consolidado == nombre_indicador)
-    
-    if pais: q_anios = q_anios.filter(ResultadoIndicador.pais == pais)
-    
-    anios_res = q_anios.order_by(col_anio.desc()).all()
+        sentencia = sentencia.where(HechoIndicador.nombre_indicador == nombre_indicador)
 
-    return {
-        "paises": [r[0] for r in paises_res],
-        "sectores": [r[0] for r in sectores_res],
-        "tamanos_empresa": [r[0] for r in tamanos_res],
-        "provincias": [r[0] for r in provincias_res], # Ahora sí lleva datos
-        "anios": [int(r[0]) for r in anios_res]
+    return sentencia.group_by(*columnas)
+
+def resolver_facetas(combinaciones, pais: str = None, periodo: int = None, sector: str = None, tamano: str = None):
+    """
+    Resuelve la cascada de filtros sobre las combinaciones de sentencia_facetas.
+    Cada faceta se acota con el resto de filtros activos pero no con el suyo
+    (si selecciono País, se filtran Sectores, pero la lista de países sigue
+    completa), y cada valor lleva el número de resultados que tiene.
+    """
+    filtros = {"pais": pais, "anio": periodo, "sector": sector, "tamano_empresa": tamano}
+    conteos = {campo: defaultdict(int) for campo in FACETAS.values()}
+
+    for fila in combinaciones:
+        valores = fila._mapping
+        # Filtros activos que esta combinación no cumple
+        fallos = [campo for campo, valor in filtros.items() if valor and valores[campo] != valor]
+        if len(fallos) > 1:
+            continue
+
+        for campo, contador in conteos.items():
+            # Cuenta para la faceta si cumple todos los filtros salvo, como mucho, el suyo propio
+            if valores[campo] is not None and (not fallos or fallos == [campo]):
+                contador[valores[campo]] += fila.total
+
+    respuesta = {
+        faceta: sorted(conteos[campo], reverse=(campo == "anio"))
+        for faceta, campo in FACETAS.items()
+    }
+    respuesta["conteos"] = {
+        faceta: {str(valor): conteos[campo][valor] for valor in respuesta[faceta]}
+        for faceta, campo in FACETAS.items()
     }
 
-def obtener_data_consulta(
-    db: Session, 
-    skip: int = 0, 
-    limit: int = 1000,
+    return respuesta
+
+def sentencia_ids_indicadores(nombre_indicador: str):
+    """
+    Ids de los indicadores cuyo nombre contiene el texto, sin distinguir
+    mayúsculas ni tildes. Se resuelve sobre el catálogo de indicadores (índice
+    de trigramas) y no sobre cada fila de resultados.
+    """
+    return select(DefinicionIndicador.id).where(
+        texto_normalizado(DefinicionIndicador.nombre).contains(texto_normalizado(literal(nombre_indicador)))
+    )
+
+def _filtro_sector(sector: str):
+    """El sector se busca por subcadena y sin distinguir mayúsculas (ix_hechos_sector_trgm)."""
+    return HechoIndicador.sector.ilike(f"%{sector}%")
+
+def _sentencia_resultados(
     pais: str = None,
     periodo: int = None,
     sector: str = None,
     nombre_indicador: str = None,
     tamano: str = None,
-    provincia: str = None # <--- 1. ARGUMENTO NUEVO
+    provincia: str = None
 ):
-    IndicadorDesdeComponente = aliased(DefinicionIndicador)
-    IndicadorDesdeCrudo = aliased(DefinicionIndicador)
-
-    query = db.query(
-        func.coalesce(
-            IndicadorDesdeComponente.nombre, 
-            IndicadorDesdeCrudo.nombre, 
-            "Indicador Desconocido"
-        ).label('nombre_indicador'),
-        ResultadoIndicador.valor_calculado.label('resultado'),
-        ResultadoIndicador.periodo,
-        ResultadoIndicador.pais,
-        ResultadoIndicador.provincia,
-        ResultadoIndicador.sector,
-        ResultadoIndicador.tamano_empresa
+    """
+    Sentencia base de resultados con los filtros de /api/v1/resultados aplicados.
+    La comparten el listado paginado y la exportación.
+    """
+    sentencia = select(
+        HechoIndicador.id_resultado,
+        func.coalesce(HechoIndicador.nombre_indicador, "Indicador Desconocido").label('nombre_indicador'),
+        # float en la propia consulta: las filas se serializan tal cual (ver serializacion.py)
+        cast(HechoIndicador.valor_calculado, Float).label('resultado'),
+        HechoIndicador.periodo,
+        HechoIndicador.pais,
+        HechoIndicador.provincia,
+        HechoIndicador.sector,
+        HechoIndicador.tamano_empresa
     )
 
-    # Joins
-    query = query.outerjoin(ResultadoIndicador.componente)\
-                 .outerjoin(IndicadorDesdeComponente, ComponenteIndicador.indicador)\
-                 .outerjoin(ResultadoIndicador.origen_crudo)\
-                 .outerjoin(ProcessedDatoCrudo.dato_crudo_origen)\
-                 .outerjoin(IndicadorDesdeCrudo, DatoCrudo.indicador)
-
     # --- FILTROS ---
     if pais:
-        query = query.filter(ResultadoIndicador.pais == pais)
-    
+        sentencia = sentencia.where(HechoIndicador.pais == pais)
+
     if provincia:
-        query = query.filter(ResultadoIndicador.provincia == provincia)
+        sentencia = sentencia.where(HechoIndicador.provincia == provincia)
 
     if sector:
-        query = query.filter(ResultadoIndicador.sector.ilike(f"%{sector}%"))
+        sentencia = sentencia.where(_filtro_sector(sector))
 
     if tamano:
-        query = query.filter(ResultadoIndicador.tamano_empresa == tamano)
+        sentencia = sentencia.where(HechoIndicador.tamano_empresa == tamano)
 
     if periodo:
-        query = query.filter(extract('year', ResultadoIndicador.periodo) == periodo)
+        sentencia = sentencia.where(HechoIndicador.anio == periodo)
 
     if nombre_indicador:
-        busqueda = f"%{nombre_indicador}%"
-        query = query.filter(
-            or_(
-                IndicadorDesdeComponente.nombre.ilike(busqueda),
-                IndicadorDesdeCrudo.nombre.ilike(busqueda)
+        sentencia = sentencia.where(HechoIndicador.id_indicador.in_(sentencia_ids_indicadores(nombre_indicador)))
+
+    # El id desempata la ordenación para que las páginas no se solapen ni salten filas
+    return sentencia.order_by(HechoIndicador.periodo.asc(), HechoIndicador.id_resultado.asc())
+
+def sentencia_data_consulta(
+    skip: int = 0,
+    limit: int = 1000,
+    pais: str = None,
+    periodo: int = None,
+    sector: str = None,
+    nombre_indicador: str = None,
+    tamano: str = None,
+    provincia: str = None,
+    cursor: str = None
+):
+    """
+    Resultados ordenados por (periodo, id). Si se recibe un cursor se pagina
+    por clave (keyset) desde esa posición en lugar de usar OFFSET.
+    Lanza ValueError si el cursor no es válido.
+    """
+    sentencia = _sentencia_resultados(pais, periodo, sector, nombre_indicador, tamano, provincia)
+
+    # --- PAGINACIÓN POR CLAVE ---
+    # Postgres ordena los periodos nulos al final, así que van detrás de
+    # cualquier fecha: primero se recorren las filas con periodo y después,
+    # como una cola aparte, las que no lo tienen (CURSOR_COLA)
+    if cursor:
+        periodo_cursor, id_cursor = decodificar_cursor(cursor)
+        if periodo_cursor is None:
+            sentencia = sentencia.where(HechoIndicador.periodo == None, HechoIndicador.id_resultado > id_cursor)
+        else:
+            # Un solo rango de ix_hechos_periodo_id; deja fuera los periodos nulos
+            sentencia = sentencia.where(
+                tuple_(HechoIndicador.periodo, HechoIndicador.id_resultado) > tuple_(periodo_cursor, id_cursor)
             )
-        )
+        skip = 0
+
+    return sentencia.offset(skip).limit(limit)
+
+COLUMNAS_EXPORTACION = ["nombre_indicador", "resultado", "periodo", "pais", "provincia", "sector", "tamano_empresa"]
+
+def _fila_exportable(row) -> dict:
+    return {
+        "nombre_indicador": row.nombre_indicador,
+        "resultado": float(row.resultado) if row.resultado is not None else 0.0,
+        "periodo": row.periodo.isoformat() if row.periodo else None,
+        "pais": row.pais,
+        "provincia": row.provincia,
+        "sector": row.sector,
+        "tamano_empresa": row.tamano_empresa
+    }
+
+def sentencia_exportacion(tamano_lote: int = 2000, **filtros):
+    """Todos los resultados filtrados, leídos del servidor en lotes de tamano_lote filas."""
+    return _sentencia_resultados(**filtros).execution_options(yield_per=tamano_lote)
+
+def formatear_lote_exportacion(filas, formato: str, cabecera: bool = False) -> str:
+    """Convierte un lote de filas en un bloque de texto NDJSON o CSV."""
+    if formato == "csv":
+        buffer = io.StringIO()
+        escritor = csv.DictWriter(buffer, fieldnames=COLUMNAS_EXPORTACION)
+        if cabecera:
+            escritor.writeheader()
+        escritor.writerows(_fila_exportable(row) for row in filas)
+        return buffer.getvalue()
 
-    query = query.order_by(ResultadoIndicador.periodo.asc())
+    return "".join(json.dumps(_fila_exportable(row), ensure_ascii=False) + "\n" for row in filas)
 
-    return query.offset(skip).limit(limit).all()
 # --- FUNCIÓN 2: Calcular Score Brainnova ---
-def calcular_brainnova_score(db: Session, pais: str, periodo: int, sector: str, tamano: str, provincia: str = None):
-    MAPA_IMPORTANCIA = {"Alta": 3, "Media": 2, "Baja": 1, "alta": 3, "media": 2, "baja": 1}
-    
-    DefinicionViaComp = aliased(DefinicionIndicador)
-    DefinicionViaCrudo = aliased(DefinicionIndicador)
-
-    # Coalesce para ID e Importancia
-    importancia_final = func.coalesce(DefinicionViaComp.importancia, DefinicionViaCrudo.importancia)
-    id_subdim_final = func.coalesce(DefinicionViaComp.id_subdimension, DefinicionViaCrudo.id_subdimension)
-
-    query = db.query(
-        ResultadoIndicador.valor_calculado,
-        importancia_final.label('importancia_texto'),
-        Subdimension.id.label('subdim_id'),
-        Subdimension.nombre.label('subdim_nombre'),
-        Dimension.id.label('dim_id'),
-        Dimension.nombre.label('dim_nombre'),
-        Dimension.peso.label('dim_peso_porcentaje')
-    ).select_from(ResultadoIndicador)
-
-    # Joins Duales (Componente y Crudo)
-    query = query.outerjoin(ResultadoIndicador.componente)\
-                 .outerjoin(DefinicionViaComp, ComponenteIndicador.indicador)\
-                 .outerjoin(ResultadoIndicador.origen_crudo)\
-                 .outerjoin(ProcessedDatoCrudo.dato_crudo_origen)\
-                 .outerjoin(DefinicionViaCrudo, DatoCrudo.indicador)
-
-    # Join Jerarquía
-    query = query.join(Subdimension, Subdimension.id == id_subdim_final)\
-                 .join(Dimension, Dimension.id == Subdimension.id_dimension)
-
-    # FILTROS (CORRECCIÓN DE FECHA AQUÍ)
-    # Usamos extract('year') porque en BD es DATE y 'periodo' es INT (2023)
-    query = query.filter(
-        ResultadoIndicador.pais == pais,
-        extract('year', ResultadoIndicador.periodo) == periodo, 
-        ResultadoIndicador.sector == sector,
-        ResultadoIndicador.tamano_empresa == tamano
+def sentencia_brainnova_score(pais: str, periodo: int, sector: str, tamano: str, provincia: str = None):
+    sentencia = select(*COLUMNAS_SCORE)
+
+    # Solo cuentan los resultados con jerarquía resuelta
+    sentencia = sentencia.where(
+        HechoIndicador.id_subdimension != None,
+        HechoIndicador.id_dimension != None
+    )
+
+    # FILTROS
+    sentencia = sentencia.where(
+        HechoIndicador.pais == pais,
+        HechoIndicador.anio == periodo,
+        HechoIndicador.sector == sector,
+        HechoIndicador.tamano_empresa == tamano
     )
-    
+
     if provincia:
-        query = query.filter(ResultadoIndicador.provincia == provincia)
+        sentencia = sentencia.where(HechoIndicador.provincia == provincia)
 
-    resultados = query.all()
+    return sentencia
 
+def score_desde_filas(resultados, pais: str, periodo: int, sector: str):
     if not resultados:
         return None
 
-    # --- Lógica Matemática (Pirámide) ---
-    tree = defaultdict(lambda: defaultdict(list))
-    dim_info = {}
-
-    for row in resultados:
-        val = float(row.valor_calculado)
-        imp = row.importancia_texto if row.importancia_texto else "Baja"
-        peso = MAPA_IMPORTANCIA.get(imp, 1)
-        
-        tree[row.dim_id][row.subdim_id].append({'val': val, 'w': peso})
-        if row.dim_id not in dim_info:
-            dim_info[row.dim_id] = {'nombre': row.dim_nombre, 'peso_pct': float(row.dim_peso_porcentaje)}
-
-    # Nivel 1 y 2
-    scores_dimensiones = {}
-    for dim_id, subdims in tree.items():
-        subdim_vals = []
-        for sub_id, inds in subdims.items():
-            # Media Ponderada por importancia
-            num = sum(i['val'] * i['w'] for i in inds)
-            den = sum(i['w'] for i in inds)
-            subdim_vals.append(num / den if den > 0 else 0)
-        # Media Aritmética de subdimensiones
-        scores_dimensiones[dim_id] = sum(subdim_vals) / len(subdim_vals) if subdim_vals else 0
-
-    # Nivel 3 (Global)
-    brainnova_score = 0
-    desglose = []
-    for dim_id, score in scores_dimensiones.items():
-        info = dim_info[dim_id]
-        contrib = score * (info['peso_pct'] / 100.0)
-        brainnova_score += contrib
-        desglose.append({
-            "dimension": info['nombre'],
-            "score_dimension": round(score, 2),
-            "peso_configurado": info['peso_pct'],
-            "contribucion_al_global": round(contrib, 2)
-        })
+    score = calcular_scores(marco_desde_columnas(transponer(resultados, len(COLUMNAS_SCORE))))[0]
 
     return {
-        "brainnova_global_score": round(brainnova_score, 2),
+        "brainnova_global_score": score["brainnova_global_score"],
         "pais": pais, "periodo": periodo, "sector": sector,
-        "desglose_por_dimension": desglose
+        "desglose_por_dimension": score["desglose_por_dimension"]
+    }
+
+class LoteScores:
+    """
+    Prepara el cálculo de muchos scores con una sola lectura de la tabla de
+    hechos y una sola pasada del motor vectorizado.
+    - contextos: dicts con pais, periodo, sector, tamano y provincia (opcional).
+    - producto: dict con listas paises, periodos, sectores, tamanos_empresa
+      (vacía o nula = todos) y una provincia opcional; se evalúan todas sus
+      combinaciones. Debe fijar al menos una de las listas.
+    `sentencia` es None si no hay nada que calcular; si no, sus filas se pasan a `resolver`.
+    Lanza ValueError si el producto no fija nada o si el lote pasa de MAX_COMBINACIONES.
+    """
+
+    # Mismo límite que el de contextos explícitos de ScoreBatchRequest
+    MAX_COMBINACIONES = 1000
+
+    COLUMNAS_PRODUCTO = {
+        'paises': HechoIndicador.pais,
+        'periodos': HechoIndicador.anio,
+        'sectores': HechoIndicador.sector,
+        'tamanos_empresa': HechoIndicador.tamano_empresa
+    }
+
+    def __init__(self, contextos: list = (), producto: dict = None):
+        if producto and not any(producto.get(campo) for campo in self.COLUMNAS_PRODUCTO):
+            raise ValueError(f"El producto debe fijar al menos uno de: {', '.join(self.COLUMNAS_PRODUCTO)}")
+
+        self.producto = producto
+        self.solicitados = [
+            (c['pais'], c['periodo'], c['sector'], c['tamano'], c.get('provincia') or TODAS_PROVINCIAS)
+            for c in contextos
+        ]
+        self.provincia_producto = (producto.get('provincia') or TODAS_PROVINCIAS) if producto else None
+        self.sentencia = self._construir_sentencia()
+
+    def _construir_sentencia(self):
+        # Una sola consulta que cubre todos los contextos pedidos
+        condiciones = []
+        if self.solicitados:
+            # Solo las combinaciones pedidas, no el producto de sus valores por
+            # columna; la provincia no se filtra porque el agregado de todas
+            # las provincias necesita todas las filas de la combinación
+            condiciones.append(
+                tuple_(HechoIndicador.pais, HechoIndicador.anio, HechoIndicador.sector, HechoIndicador.tamano_empresa)
+                .in_(sorted({c[:4] for c in self.solicitados}))
+            )
+
+        if self.producto:
+            filtros_producto = [
+                columna.in_(self.producto[campo])
+                for campo, columna in self.COLUMNAS_PRODUCTO.items() if self.producto.get(campo)
+            ]
+            if self.provincia_producto:
+                filtros_producto.append(HechoIndicador.provincia == self.provincia_producto)
+            condiciones.append(and_(true(), *filtros_producto))
+
+        if not condiciones:
+            return None
+
+        return SENTENCIA_SCORES_CONTEXTO.where(or_(*condiciones))
+
+    def _en_producto(self, clave):
+        # clave: (pais, anio, sector, tamano_empresa, provincia), en el orden de COLUMNAS_PRODUCTO
+        return all(
+            valor in self.producto[campo]
+            for valor, campo in zip(clave, self.COLUMNAS_PRODUCTO) if self.producto.get(campo)
+        )
+
+    def resolver(self, filas) -> list:
+        """
+        Devuelve primero los contextos explícitos (en su orden) y después los del producto.
+        Las combinaciones sin datos no aparecen.
+        """
+        # El motor calcula todos los contextos de las filas leídas; aquí solo se eligen los pedidos
+        scores = scores_por_contexto(filas)
+
+        claves_producto = set()
+        if self.producto:
+            claves_producto = {
+                clave for clave in scores
+                if clave[4] == self.provincia_producto and self._en_producto(clave)
+            }
+            if len(set(self.solicitados) | claves_producto) > self.MAX_COMBINACIONES:
+                raise ValueError(f"El lote pasa de {self.MAX_COMBINACIONES} combinaciones; restringe el producto")
+
+        orden = list(dict.fromkeys(self.solicitados + sorted(claves_producto - set(self.solicitados))))
+
+        return [
+            {
+                "brainnova_global_score": scores[clave]["brainnova_global_score"],
+                "pais": clave[0], "periodo": clave[1], "sector": clave[2],
+                "tamano_empresa": clave[3], "provincia": clave[4] or None,
+                "desglose_por_dimension": scores[clave]["desglose_por_dimension"]
+            }
+            for clave in orden if clave in scores
+        ]
+
+def clave_score_precalculado(pais: str, periodo: int, sector: str, tamano: str, provincia: str = None):
+    return (pais, periodo, sector, tamano, provincia or TODAS_PROVINCIAS)
+
+def formatear_score_precalculado(fila: ScoreBrainnova | None):
+    if fila is None:
+        return None
+
+    return {
+        "brainnova_global_score": fila.brainnova_global_score,
+        "pais": fila.pais, "periodo": fila.anio, "sector": fila.sector,
+        "desglose_por_dimension": fila.desglose_por_dimension
     }
 
-def obtener_nombres_indicadores_disponibles(db: Session):
+def sentencia_nombres_indicadores():
+    # Excluimos los nulos (resultados huérfanos si los hubiera) y ordenamos alfabéticamente
+    return select(distinct(HechoIndicador.nombre_indicador))\
+        .where(HechoIndicador.nombre_indicador != None)\
+        .order_by(HechoIndicador.nombre_indicador.asc())
+
+def sentencia_buscar_indicadores(texto: str, limite: int = 20):
+    """
+    Indicadores cuyo nombre encaja con el texto, sin distinguir mayúsculas ni
+    tildes, ordenados por relevancia. Encaja si contiene las palabras buscadas
+    (texto completo en español), si contiene el texto tal cual o si se parece
+    a alguna parte del nombre (trigramas, tolera erratas).
+    """
+    nombre = texto_normalizado(DefinicionIndicador.nombre)
+    patron = texto_normalizado(literal(texto))
+    documento = documento_busqueda(DefinicionIndicador.nombre)
+    consulta = consulta_busqueda(literal(texto))
+
+    relevancia = func.greatest(
+        func.ts_rank(documento, consulta),
+        func.word_similarity(patron, nombre)
+    ).label('relevancia')
+
+    return select(
+        DefinicionIndicador.id,
+        DefinicionIndicador.nombre,
+        Subdimension.nombre.label('subdimension'),
+        Dimension.nombre.label('dimension'),
+        relevancia
+    ).outerjoin(Subdimension, Subdimension.id == DefinicionIndicador.id_subdimension)\
+     .outerjoin(Dimension, Dimension.id == Subdimension.id_dimension)\
+     .where(or_(
+        documento.op('@@')(consulta),
+        nombre.contains(patron),
+        nombre.op('%>')(patron)
+     ))\
+     .order_by(relevancia.desc(), DefinicionIndicador.nombre.asc())\
+     .limit(limite)
+
+def formatear_busqueda(filas) -> list:
+    return [
+        {
+            "id": row.id,
+            "nombre": row.nombre,
+            "subdimension": row.subdimension,
+            "dimension": row.dimension,
+            "relevancia": round(float(row.relevancia), 4)
+        }
+        for row in filas
+    ]
+
+# --- DASHBOARD: agregados en una sola consulta ---
+
+def sentencia_estadisticas_dimensiones(pais: str = None):
+    """
+    Una fila por (dimensión, subdimensión) con su número de indicadores y
+    cuántos de ellos tienen algún resultado (en el país indicado, si lo hay).
+    """
+    con_datos = select(distinct(HechoIndicador.id_indicador).label('id_indicador'))
+    if pais:
+        con_datos = con_datos.where(HechoIndicador.pais == pais)
+    con_datos = con_datos.subquery()
+
+    return select(
+        Dimension.id.label('dim_id'),
+        Dimension.nombre.label('dimension'),
+        Dimension.peso,
+        Subdimension.nombre.label('subdimension'),
+        func.count(distinct(DefinicionIndicador.id)).label('total_indicadores'),
+        func.count(distinct(con_datos.c.id_indicador)).label('indicadores_con_datos')
+    ).select_from(Dimension)\
+     .outerjoin(Subdimension, Subdimension.id_dimension == Dimension.id)\
+     .outerjoin(DefinicionIndicador, DefinicionIndicador.id_subdimension == Subdimension.id)\
+     .outerjoin(con_datos, con_datos.c.id_indicador == DefinicionIndicador.id)\
+     .group_by(Dimension.id, Dimension.nombre, Dimension.peso, Subdimension.id, Subdimension.nombre)\
+     .order_by(Dimension.peso.desc(), Dimension.nombre.asc(), Subdimension.nombre.asc())
+
+def agrupar_estadisticas_dimensiones(filas) -> list:
+    """Anida las filas de sentencia_estadisticas_dimensiones por dimensión, sumando los totales."""
+    dimensiones = {}
+    for row in filas:
+        dimension = dimensiones.setdefault(row.dim_id, {
+            "dimension": row.dimension,
+            "peso": row.peso,
+            "total_subdimensiones": 0,
+            "total_indicadores": 0,
+            "indicadores_con_datos": 0,
+            "subdimensiones": []
+        })
+        # Dimensión sin subdimensiones (outer join)
+        if row.subdimension is None:
+            continue
+
+        dimension["total_subdimensiones"] += 1
+        dimension["total_indicadores"] += row.total_indicadores
+        dimension["indicadores_con_datos"] += row.indicadores_con_datos
+        dimension["subdimensiones"].append({
+            "subdimension": row.subdimension,
+            "total_indicadores": row.total_indicadores,
+            "indicadores_con_datos": row.indicadores_con_datos
+        })
+
+    return list(dimensiones.values())
+
+def _ultimos_valores(pais: str = None, periodo: int = None, dimension: str = None, pais_preferido: str = None):
+    """
+    Subconsulta con todos los resultados filtrados, numerados dentro de cada
+    indicador del más reciente al más antiguo (posicion = 1 es el último valor)
+    y con el total de resultados del indicador. A igualdad de año se prefiere
+    el dato nacional (sin provincia); con pais_preferido, los de ese país van
+    antes que los de cualquier otro.
+    """
+    orden = [
+        HechoIndicador.anio.desc().nulls_last(),
+        HechoIndicador.provincia.is_(None).desc(),
+        HechoIndicador.id_resultado.desc()
+    ]
+    if pais_preferido:
+        # Sin nulls_last, las filas sin país (comparación NULL) irían delante
+        orden.insert(0, (HechoIndicador.pais == pais_preferido).desc().nulls_last())
+
+    sentencia = select(
+        HechoIndicador.id_resultado,
+        HechoIndicador.nombre_indicador.label('nombre'),
+        cast(HechoIndicador.valor_calculado, Float).label('valor'),
+        HechoIndicador.anio.label('periodo'),
+        HechoIndicador.pais,
+        HechoIndicador.provincia,
+        HechoIndicador.sector,
+        HechoIndicador.tamano_empresa,
+        HechoIndicador.nombre_dimension.label('dimension'),
+        HechoIndicador.nombre_subdimension.label('subdimension'),
+        HechoIndicador.importancia,
+        PESO_IMPORTANCIA.label('peso_importancia'),
+        func.count().over(partition_by=HechoIndicador.id_indicador).label('total_resultados'),
+        func.row_number().over(partition_by=HechoIndicador.id_indicador, order_by=orden).label('posicion')
+    ).where(HechoIndicador.id_indicador != None)
+
+    if pais:
+        sentencia = sentencia.where(HechoIndicador.pais == pais)
+    if periodo:
+        sentencia = sentencia.where(HechoIndicador.anio == periodo)
+    if dimension:
+        sentencia = sentencia.where(HechoIndicador.nombre_dimension == dimension)
+
+    return sentencia.subquery()
+
+COLUMNAS_VALOR_INDICADOR = [
+    'nombre', 'valor', 'periodo', 'pais', 'provincia', 'sector', 'tamano_empresa',
+    'dimension', 'subdimension', 'importancia', 'total_resultados'
+]
+
+def _seleccionar_ultimos(ultimos, *extra):
+    return select(*(ultimos.c[columna] for columna in COLUMNAS_VALOR_INDICADOR), *extra)\
+        .where(ultimos.c.posicion == 1)
+
+def sentencia_ultimos_valores(pais: str = None, periodo: int = None, dimension: str = None):
+    """Último valor de cada indicador con datos, con su jerarquía y su número de resultados."""
+    ultimos = _ultimos_valores(pais, periodo, dimension)
+    return _seleccionar_ultimos(ultimos).order_by(ultimos.c.dimension.asc(), ultimos.c.nombre.asc())
+
+def sentencia_top_indicadores(limite: int = 10, pais: str = None):
+    """Los indicadores más importantes y con más datos, con su último valor."""
+    ultimos = _ultimos_valores(pais)
+    return _seleccionar_ultimos(ultimos).order_by(
+        ultimos.c.peso_importancia.desc(),
+        ultimos.c.total_resultados.desc(),
+        ultimos.c.nombre.asc()
+    ).limit(limite)
+
+def sentencia_kpis_destacados(pais: str, limite: int = 3):
+    """
+    KPIs para la portada: último valor de cada indicador, priorizando el país
+    pedido (si un indicador no tiene datos en él se usa el de otro país),
+    después la importancia y después el valor.
+    """
+    ultimos = _ultimos_valores(pais_preferido=pais)
+    es_pais = (ultimos.c.pais == pais)
+    return _seleccionar_ultimos(ultimos, ResultadoIndicador.unidad_display.label('unidad'))\
+        .outerjoin(ResultadoIndicador, ResultadoIndicador.id == ultimos.c.id_resultado)\
+        .order_by(es_pais.desc().nulls_last(), ultimos.c.peso_importancia.desc(), ultimos.c.valor.desc().nulls_last())\
+        .limit(limite)
+
+def formatear_filas(filas) -> list:
+    return [dict(row._mapping) for row in filas]
+
+# --- TOTAL DE UN DESGLOSE ---
+
+# Columnas de desglose que, si no se piden, se sustituyen por su total
+COLUMNAS_DESGLOSE = {
+    'sector': HechoIndicador.sector,
+    'tamano_empresa': HechoIndicador.tamano_empresa,
+}
+
+# Etiquetas con las que las fuentes publican el total de un desglose cuando no
+# lo dejan en blanco, por orden de preferencia. Eurostat publica las empresas
+# con size_emp=GE10 (10 o más empleados) y el INE usa 'Total'.
+TOTALES_DESGLOSE = {
+    'sector': ('Total', 'TOTAL', 'Total sectores', 'Total actividades'),
+    'tamano_empresa': (
+        'Total', 'TOTAL', 'Total empresas', 'All enterprises',
+        'GE10', '10 persons employed or more', 'De 10 o más empleados'
+    ),
+}
+
+def sentencia_desgloses(indicadores: tuple, columnas: tuple):
+    """
+    Valores distintos (incluido el nulo) de cada columna de desglose pedida,
+    por indicador. Solo lee columnas de ix_hechos_series.
+    """
+    ids = select(DefinicionIndicador.id).where(DefinicionIndicador.nombre.in_(indicadores))
+    return union_all(*(
+        select(
+            HechoIndicador.id_indicador,
+            literal(columna).label('columna'),
+            COLUMNAS_DESGLOSE[columna].label('valor')
+        ).where(HechoIndicador.id_indicador.in_(ids)).distinct()
+        for columna in columnas
+    ))
+
+def resolver_totales(filas, nombres: dict, columnas: tuple) -> dict:
+    """
+    Para cada indicador con datos y cada columna de desglose, el valor que
+    representa el total: None si el indicador tiene filas sin ese desglose y,
+    si no, la primera etiqueta de TOTALES_DESGLOSE que aparezca en sus datos.
+    Devuelve {id_indicador: {columna: total}}.
+    Lanza ValueError con los valores disponibles si algún indicador no tiene total.
+    """
+    disponibles = defaultdict(lambda: defaultdict(set))
+    for id_indicador, columna, valor in filas:
+        disponibles[id_indicador][columna].add(valor)
+
+    totales = {}
+    for id_indicador, por_columna in disponibles.items():
+        totales[id_indicador] = {}
+        for columna in columnas:
+            valores = por_columna[columna]
+            if None in valores:
+                totales[id_indicador][columna] = None
+                continue
+            total = next((etiqueta for etiqueta in TOTALES_DESGLOSE[columna] if etiqueta in valores), None)
+            if total is None:
+                raise ValueError(
+                    f"El indicador '{nombres.get(id_indicador, id_indicador)}' no tiene total de {columna}; "
+                    f"indica uno de: {', '.join(sorted(valores))}"
+                )
+            totales[id_indicador][columna] = total
+
+    return totales
+
+def columnas_total(sector: str = None, tamano: str = None, agrupar: str = None) -> tuple:
+    """Columnas de desglose no pedidas (ni agrupadas) cuyo total hay que resolver."""
+    columnas = []
+    if not sector and agrupar != 'sector':
+        columnas.append('sector')
+    if not tamano:
+        columnas.append('tamano_empresa')
+    return tuple(columnas)
+
+def _filtro_totales(totales: dict):
+    """
+    Filas del total de cada indicador según resolver_totales: el desglose nulo
+    o la etiqueta de total que corresponda a cada uno.
+    """
+    return or_(false(), *(
+        and_(
+            HechoIndicador.id_indicador == id_indicador,
+            *(COLUMNAS_DESGLOSE[columna] == total for columna, total in por_columna.items())
+        )
+        for id_indicador, por_columna in totales.items()
+    ))
+
+# --- SERIES TEMPORALES ---
+
+# Columna por la que se separan las series de cada indicador
+GRUPOS_SERIE = {
+    'pais': HechoIndicador.pais,
+    'sector': HechoIndicador.sector,
+}
+
+def sentencia_series(indicadores: tuple, agrupar: str = 'pais', paises: tuple = (), sector: str = None, tamano: str = None, provincia: str = None, totales: dict = None):
     """
-    Devuelve una lista única de nombres de indicadores que tienen 
-    al menos un resultado calculado o extraído en la base de datos.
+    Un valor por (indicador, año, grupo) de los indicadores pedidos por nombre
+    exacto. Sin provincia se usan los datos nacionales; sin sector o tamaño
+    (salvo el sector si es el grupo), el total de cada indicador que indique
+    `totales` (ver resolver_totales). Solo se promedian las filas de distintos
+    periodos de un mismo año.
+    Solo lee columnas de ix_hechos_series, así que Postgres puede resolverla
+    con un index-only scan.
     """
-    IndicadorDesdeComponente = aliased(DefinicionIndicador)
-    IndicadorDesdeCrudo = aliased(DefinicionIndicador)
+    grupo = GRUPOS_SERIE[agrupar]
+    ids = select(DefinicionIndicador.id).where(DefinicionIndicador.nombre.in_(indicadores))
+
+    sentencia = select(
+        HechoIndicador.id_indicador,
+        HechoIndicador.anio,
+        grupo.label('grupo'),
+        cast(func.avg(HechoIndicador.valor_calculado), Float).label('valor')
+    ).where(
+        HechoIndicador.id_indicador.in_(ids),
+        HechoIndicador.anio != None,
+        grupo != None
+    )
 
-    # 1. Definimos la columna "Nombre Calculado" (La misma lógica que usamos antes)
-    nombre_consolidado = func.coalesce(
-        IndicadorDesdeComponente.nombre, 
-        IndicadorDesdeCrudo.nombre
+    if paises:
+        sentencia = sentencia.where(HechoIndicador.pais.in_(paises))
+    if sector:
+        sentencia = sentencia.where(HechoIndicador.sector == sector)
+    if tamano:
+        sentencia = sentencia.where(HechoIndicador.tamano_empresa == tamano)
+    if columnas_total(sector, tamano, agrupar):
+        sentencia = sentencia.where(_filtro_totales(totales or {}))
+    sentencia = sentencia.where(
+        HechoIndicador.provincia == provincia if provincia else HechoIndicador.provincia == None
     )
 
-    # 2. Hacemos la query buscando DISTINCT (únicos)
-    query = db.query(distinct(nombre_consolidado))
-
-    # 3. Joins (Exactamente igual que en obtener_data_consulta)
-    # Camino A: Componentes
-    query = query.outerjoin(ResultadoIndicador.componente)\
-                 .outerjoin(IndicadorDesdeComponente, ComponenteIndicador.indicador)
-    
-    # Camino B: Crudos
-    query = query.outerjoin(ResultadoIndicador.origen_crudo)\
-                 .outerjoin(ProcessedDatoCrudo.dato_crudo_origen)\
-                 .outerjoin(IndicadorDesdeCrudo, DatoCrudo.indicador)
-
-    # 4. Filtros de limpieza
-    # Excluimos los nulos (resultados huérfanos si los hubiera)
-    query = query.filter(nombre_consolidado != None)
-    
-    # 5. Ordenamos alfabéticamente
-    query = query.order_by(nombre_consolidado.asc())
-
-    result = query.all()
-    
-    # result será una lista de tuplas [('PIB',), ('Desempleo',), ...]
-    # Lo convertimos a una lista plana ['PIB', 'Desempleo']
-    return [row[0] for row in result]
\ No newline at end of file
+    return sentencia.group_by(HechoIndicador.id_indicador, HechoIndicador.anio, grupo)\
+        .order_by(HechoIndicador.id_indicador, HechoIndicador.anio, grupo)
+
+def sentencia_nombres_por_id(indicadores: tuple):
+    return select(DefinicionIndicador.id, DefinicionIndicador.nombre).where(DefinicionIndicador.nombre.in_(indicadores))
+
+def pivotar_series(filas, nombres: dict, indicadores: tuple, agrupar: str) -> dict:
+    """
+    Pasa las filas (indicador, año, grupo, valor) a formato columnar: por
+    indicador, la lista de años y una lista de valores alineada con ella por
+    cada grupo (None donde ese grupo no tiene dato). Los indicadores se
+    devuelven en el orden pedido; los que no tienen datos, con listas vacías.
+    """
+    celdas = {}
+    for id_indicador, anio, grupo, valor in filas:
+        celdas.setdefault(nombres[id_indicador], {}).setdefault(grupo, {})[anio] = valor
+
+    series = []
+    for indicador in indicadores:
+        por_grupo = celdas.get(indicador, {})
+        periodos = sorted({anio for valores in por_grupo.values() for anio in valores})
+        series.append({
+            "indicador": indicador,
+            "periodos": periodos,
+            "valores": {
+                grupo: [valores.get(anio) for anio in periodos]
+                for grupo, valores in sorted(por_grupo.items())
+            }
+        })
+
+    return {"agrupar": agrupar, "series": series}
+
+# --- RANKING ENTRE PAÍSES ---
+
+# Las fuentes europeas publican los agregados (UE, zona euro) como una fila más
+# en la columna país. Ninguno entra en el ranking de países. Como media UE se
+# usa el agregado de la UE que vaya antes en esta lista de preferencia (primero
+# por nombre exacto y después por prefijo: 'EU28', 'European Union - 28 countries'...)
+PREFERENCIA_AGREGADO_UE = ('EU27_2020', 'European Union - 27 countries (from 2020)', 'EU', 'European Union', 'UE', 'Unión Europea')
+# La zona euro no es la UE: se aparta del ranking pero no sirve como media UE
+PREFIJOS_ZONA_EURO = ('Euro area', 'EA', 'Zona euro')
+
+def es_agregado_ue(columna):
+    """Si la fila es un agregado europeo (UE o zona euro) y no un país."""
+    return or_(*(columna.like(f'{prefijo}%') for prefijo in PREFERENCIA_AGREGADO_UE + PREFIJOS_ZONA_EURO))
+
+def preferencia_agregado_ue(pais: str) -> int | None:
+    """Posición del agregado en PREFERENCIA_AGREGADO_UE (menor = preferido); None si no es de la UE."""
+    if pais.startswith(PREFIJOS_ZONA_EURO):
+        return None
+    if pais in PREFERENCIA_AGREGADO_UE:
+        return PREFERENCIA_AGREGADO_UE.index(pais)
+    for posicion, prefijo in enumerate(PREFERENCIA_AGREGADO_UE):
+        if pais.startswith(prefijo):
+            return len(PREFERENCIA_AGREGADO_UE) + posicion
+    return None
+
+def _valores_contexto(indicador: str, sector: str = None, tamano: str = None, totales: dict = None):
+    """
+    Filtros comunes del ranking: indicador por nombre exacto, sector (por
+    subcadena, como en /api/v1/resultados) y tamaño; sin ellos, el total del
+    indicador que indique `totales` (ver resolver_totales).
+    """
+    filtros = [HechoIndicador.id_indicador.in_(select(DefinicionIndicador.id).where(DefinicionIndicador.nombre == indicador))]
+    if sector:
+        filtros.append(_filtro_sector(sector))
+    if tamano:
+        filtros.append(HechoIndicador.tamano_empresa == tamano)
+    if columnas_total(sector, tamano):
+        filtros.append(_filtro_totales(totales or {}))
+    return filtros
+
+def sentencia_ranking(indicador: str, periodo: int = None, sector: str = None, tamano: str = None, provincia: str = None, ascendente: bool = False, totales: dict = None):
+    """
+    Valor por país (datos nacionales; si hay varios periodos en el año se promedian) con su
+    posición, percentil, media y desviación típica calculados con funciones
+    ventana. Las ventanas se particionan por es_ue, de modo que los agregados
+    de la UE no cuentan en el ranking de países. Con provincia se añaden sus
+    filas (es_provincia) fuera de ambas particiones, para compararlas en Python.
+    Sin periodo se usa el último año con datos del indicador en ese contexto.
+    """
+    filtros = _valores_contexto(indicador, sector, tamano, totales)
+
+    if periodo is None:
+        periodo = select(func.max(HechoIndicador.anio)).where(*filtros).scalar_subquery()
+
+    es_provincia = HechoIndicador.provincia != None
+    ambito = HechoIndicador.provincia == None
+    if provincia:
+        ambito = or_(ambito, HechoIndicador.provincia == provincia)
+
+    valores = select(
+        HechoIndicador.pais,
+        HechoIndicador.provincia,
+        es_agregado_ue(HechoIndicador.pais).label('es_ue'),
+        es_provincia.label('es_provincia'),
+        cast(func.avg(HechoIndicador.valor_calculado), Float).label('valor'),
+        HechoIndicador.anio.label('periodo')
+    ).where(*filtros, HechoIndicador.anio == periodo, HechoIndicador.pais != None, ambito)\
+     .group_by(HechoIndicador.pais, HechoIndicador.provincia, HechoIndicador.anio)\
+     .subquery()
+
+    particion = [valores.c.es_provincia, valores.c.es_ue]
+    mejor_primero = valores.c.valor.asc() if ascendente else valores.c.valor.desc()
+    peor_primero = valores.c.valor.desc() if ascendente else valores.c.valor.asc()
+
+    return select(
+        valores.c.pais,
+        valores.c.provincia,
+        valores.c.es_ue,
+        valores.c.es_provincia,
+        valores.c.valor,
+        valores.c.periodo,
+        func.rank().over(partition_by=particion, order_by=mejor_primero).label('posicion'),
+        cast(func.percent_rank().over(partition_by=particion, order_by=peor_primero), Float).label('percentil'),
+        func.avg(valores.c.valor).over(partition_by=particion).label('media'),
+        func.stddev_pop(valores.c.valor).over(partition_by=particion).label('desviacion'),
+        func.count().over(partition_by=particion).label('total')
+    ).order_by(valores.c.es_provincia, valores.c.es_ue, mejor_primero, valores.c.pais)
+
+def _comparar(valor: float, media: float, desviacion: float, media_ue: float) -> dict:
+    return {
+        "z_score": (valor - media) / desviacion if desviacion else None,
+        "diferencia_media_ue": valor - media_ue if media_ue is not None else None
+    }
+
+def formatear_ranking(filas, indicador: str, ascendente: bool = False) -> dict:
+    """
+    Separa países, agregados europeos y provincia. La media UE es la del
+    agregado de la UE preferido (PREFERENCIA_AGREGADO_UE) si la fuente lo
+    publica; si no, la media de los países. La provincia se sitúa respecto a
+    la distribución de países.
+    """
+    paises = [row for row in filas if not row.es_ue and not row.es_provincia]
+    provincias = [row for row in filas if row.es_provincia]
+    agregados_ue = [
+        row for row in filas
+        if row.es_ue and not row.es_provincia and preferencia_agregado_ue(row.pais) is not None
+    ]
+
+    media = paises[0].media if paises else None
+    desviacion = paises[0].desviacion if paises else None
+    if agregados_ue:
+        agregado = min(agregados_ue, key=lambda row: preferencia_agregado_ue(row.pais))
+        media_ue, fuente_media_ue = agregado.valor, agregado.pais
+    else:
+        media_ue, fuente_media_ue = media, None
+
+    respuesta = {
+        "indicador": indicador,
+        "periodo": filas[0].periodo if filas else None,
+        "total_paises": len(paises),
+        "media_paises": media,
+        "desviacion_paises": desviacion,
+        "media_ue": media_ue,
+        "fuente_media_ue": fuente_media_ue,
+        "paises": [
+            {
+                "pais": row.pais,
+                "valor": row.valor,
+                "posicion": row.posicion,
+                "percentil": row.percentil,
+                **_comparar(row.valor, media, desviacion, media_ue)
+            }
+            for row in paises
+        ],
+        "provincia": None
+    }
+
+    if provincias:
+        row = provincias[0]
+        mejores = sum(1 for p in paises if (p.valor < row.valor if ascendente else p.valor > row.valor))
+        peores = sum(1 for p in paises if (p.valor > row.valor if ascendente else p.valor < row.valor))
+        respuesta["provincia"] = {
+            "pais": row.pais,
+            "provincia": row.provincia,
+            "valor": row.valor,
+            "posicion": mejores + 1,
+            "percentil": peores / len(paises) if paises else None,
+            **(_comparar(row.valor, media, desviacion, media_ue) if paises else {"z_score": None, "diferencia_media_ue": None})
+        }
+
+    return respuesta
@@ -0,0 +1,214 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from database.modelos import ScoreBrainnova
+from microservicio_exposicion.cache import cacheado
+from microservicio_exposicion.metricas import cronometrado
+from microservicio_exposicion.services import (
+    COLUMNAS_FILTROS_BASICOS, LoteScores,
+    sentencia_filtros_unicos, formatear_filtros_basicos,
+    sentencia_facetas, resolver_facetas,
+    sentencia_data_consulta, CURSOR_COLA, en_cola, sentencia_exportacion, formatear_lote_exportacion,
+    sentencia_brainnova_score, score_desde_filas,
+    clave_score_precalculado, formatear_score_precalculado,
+    sentencia_nombres_indicadores,
+    sentencia_buscar_indicadores, formatear_busqueda,
+    sentencia_estadisticas_dimensiones, agrupar_estadisticas_dimensiones,
+    sentencia_ultimos_valores, sentencia_top_indicadores, sentencia_kpis_destacados, formatear_filas,
+    sentencia_desgloses, resolver_totales, columnas_total,
+    sentencia_series, sentencia_nombres_por_id, pivotar_series,
+    sentencia_ranking, formatear_ranking
+)
+
+# Servicios de la API. Las sentencias y el tratamiento de las filas están en
+# services.py; aquí se ejecutan (await). El precálculo de scores de la ingesta
+# usa database.scores directamente.
+# @cronometrado (fuera de la caché) registra su duración en /metrics.
+
+@cronometrado
+@cacheado('filtros-disponibles')
+async def obtener_filtros_basicos(db: AsyncSession):
+    """
+    Todos los valores posibles para los desplegables de filtrado, sin contexto.
+    """
+    # Una AsyncSession no admite consultas concurrentes: se lanzan una tras otra
+    valores = {}
+    for clave, columna in COLUMNAS_FILTROS_BASICOS.items():
+        valores[clave] = (await db.execute(sentencia_filtros_unicos(columna))).all()
+
+    return formatear_filtros_basicos(valores)
+
+@cronometrado
+@cacheado('filtros-globales')
+async def obtener_filtros_disponibles(
+    db: AsyncSession,
+    pais: str = None,
+    periodo: int = None,
+    sector: str = None,
+    tamano: str = None,
+    nombre_indicador: str = None
+):
+    """
+    Calcula todas las facetas de filtrado con una sola consulta agrupada.
+    """
+    combinaciones = (await db.execute(sentencia_facetas(nombre_indicador))).all()
+    return resolver_facetas(combinaciones, pais, periodo, sector, tamano)
+
+@cronometrado
+async def obtener_data_consulta(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 1000,
+    pais: str = None,
+    periodo: int = None,
+    sector: str = None,
+    nombre_indicador: str = None,
+    tamano: str = None,
+    provincia: str = None,
+    cursor: str = None
+):
+    """
+    Con cursor, si se acaban las filas con periodo la página se completa con
+    las primeras de la cola de filas sin periodo (ver sentencia_data_consulta).
+    Lanza ValueError si el cursor no es válido.
+    """
+    filtros = (pais, periodo, sector, nombre_indicador, tamano, provincia)
+    filas = (await db.execute(sentencia_data_consulta(skip, limit, *filtros, cursor=cursor))).all()
+
+    if cursor and len(filas) < limit and not en_cola(cursor):
+        filas += (await db.execute(sentencia_data_consulta(0, limit - len(filas), *filtros, cursor=CURSOR_COLA))).all()
+
+    return filas
+
+async def exportar_resultados(
+    db: AsyncSession,
+    formato: str = "ndjson",
+    tamano_lote: int = 2000,
+    **filtros
+):
+    """
+    Generador asíncrono que recorre los resultados en streaming (cursor de
+    servidor) y va devolviendo bloques NDJSON o CSV. La memoria no depende del
+    número de filas exportadas.
+    """
+    resultado = await db.stream(sentencia_exportacion(tamano_lote, **filtros))
+
+    cabecera = True
+    async for lote in resultado.partitions():
+        yield formatear_lote_exportacion(lote, formato, cabecera)
+        cabecera = False
+
+    # Sin filas, el CSV lleva al menos la cabecera
+    if cabecera and formato == "csv":
+        yield formatear_lote_exportacion([], formato, cabecera)
+
+@cronometrado
+async def calcular_brainnova_score(db: AsyncSession, pais: str, periodo: int, sector: str, tamano: str, provincia: str = None):
+    resultados = (await db.execute(sentencia_brainnova_score(pais, periodo, sector, tamano, provincia))).all()
+    return score_desde_filas(resultados, pais, periodo, sector)
+
+@cronometrado
+async def calcular_scores_lote(db: AsyncSession, contextos: list = (), producto: dict = None):
+    """Calcula muchos scores a la vez (ver services.LoteScores)."""
+    lote = LoteScores(contextos, producto)
+    if lote.sentencia is None:
+        return []
+
+    return lote.resolver((await db.execute(lote.sentencia)).all())
+
+@cronometrado
+async def obtener_score_precalculado(db: AsyncSession, pais: str, periodo: int, sector: str, tamano: str, provincia: str = None):
+    """
+    Busca el score en scores_brainnova por clave primaria. Devuelve None si
+    la combinación no está precalculada.
+    """
+    fila = await db.get(ScoreBrainnova, clave_score_precalculado(pais, periodo, sector, tamano, provincia))
+    return formatear_score_precalculado(fila)
+
+@cronometrado
+@cacheado('indicadores-disponibles')
+async def obtener_nombres_indicadores_disponibles(db: AsyncSession):
+    """
+    Devuelve una lista única de nombres de indicadores que tienen
+    al menos un resultado calculado o extraído en la base de datos.
+    """
+    return (await db.scalars(sentencia_nombres_indicadores())).all()
+
+@cronometrado
+@cacheado('indicadores-buscar')
+async def buscar_indicadores(db: AsyncSession, texto: str, limite: int = 20):
+    """
+    Búsqueda de indicadores por nombre, ordenada por relevancia
+    (ver services.sentencia_buscar_indicadores).
+    """
+    return formatear_busqueda((await db.execute(sentencia_buscar_indicadores(texto, limite))).all())
+
+# --- DASHBOARD ---
+
+@cronometrado
+@cacheado('dashboard-dimensiones')
+async def obtener_estadisticas_dimensiones(db: AsyncSession, pais: str = None):
+    return agrupar_estadisticas_dimensiones((await db.execute(sentencia_estadisticas_dimensiones(pais))).all())
+
+@cronometrado
+@cacheado('dashboard-ultimos-valores')
+async def obtener_ultimos_valores(db: AsyncSession, pais: str = None, periodo: int = None, dimension: str = None):
+    return formatear_filas((await db.execute(sentencia_ultimos_valores(pais, periodo, dimension))).all())
+
+@cronometrado
+@cacheado('dashboard-top-indicadores')
+async def obtener_top_indicadores(db: AsyncSession, limite: int = 10, pais: str = None):
+    return formatear_filas((await db.execute(sentencia_top_indicadores(limite, pais))).all())
+
+@cronometrado
+@cacheado('dashboard-kpis-destacados')
+async def obtener_kpis_destacados(db: AsyncSession, pais: str, limite: int = 3):
+    return formatear_filas((await db.execute(sentencia_kpis_destacados(pais, limite))).all())
+
+@cronometrado
+async def obtener_resumen_dashboard(db: AsyncSession, pais: str, limite_kpis: int = 3, limite_top: int = 10):
+    """Todo lo que necesita la portada del dashboard en una sola petición."""
+    return {
+        "dimensiones": await obtener_estadisticas_dimensiones(db, pais),
+        "kpis_destacados": await obtener_kpis_destacados(db, pais, limite_kpis),
+        "top_indicadores": await obtener_top_indicadores(db, limite_top, pais)
+    }
+
+# --- SERIES TEMPORALES ---
+
+@cronometrado
+@cacheado('series')
+async def obtener_series(db: AsyncSession, indicadores: tuple, agrupar: str = 'pais', paises: tuple = (), sector: str = None, tamano: str = None, provincia: str = None):
+    """
+    Lanza ValueError si falta el sector o el tamaño y algún indicador no
+    publica un total de esa columna.
+    """
+    nombres = dict((await db.execute(sentencia_nombres_por_id(indicadores))).all())
+
+    # El total de cada desglose no pedido se elige según los datos de cada indicador
+    totales = None
+    columnas = columnas_total(sector, tamano, agrupar)
+    if columnas:
+        desgloses = (await db.execute(sentencia_desgloses(indicadores, columnas))).all()
+        totales = resolver_totales(desgloses, nombres, columnas)
+
+    filas = (await db.execute(sentencia_series(indicadores, agrupar, paises, sector, tamano, provincia, totales))).all()
+    return pivotar_series(filas, nombres, indicadores, agrupar)
+
+# --- RANKING ENTRE PAÍSES ---
+
+@cronometrado
+@cacheado('ranking')
+async def obtener_ranking(db: AsyncSession, indicador: str, periodo: int = None, sector: str = None, tamano: str = None, provincia: str = None, ascendente: bool = False):
+    """
+    Lanza ValueError si falta el sector o el tamaño y el indicador no publica
+    un total de esa columna.
+    """
+    totales = None
+    columnas = columnas_total(sector, tamano)
+    if columnas:
+        indicadores = (indicador,)
+        nombres = dict((await db.execute(sentencia_nombres_por_id(indicadores))).all())
+        desgloses = (await db.execute(sentencia_desgloses(indicadores, columnas))).all()
+        totales = resolver_totales(desgloses, nombres, columnas)
+
+    filas = (await db.execute(sentencia_ranking(indicador, periodo, sector, tamano, provincia, ascendente, totales))).all()
+    return formatear_ranking(filas, indicador, ascendente)
\ No newline at end of file
@@ -1,10 +1,22 @@
+import argparse
+
 from microservicio_ingesta.run_ingestion import collecting
+from microservicio_ingesta.scripts.ingestion.collect_base.manifiesto import manifiesto
 from microservicio_ingesta.run_processing import processing
 from modelos.escribir_ficheros import FileWriter
 from microservicio_ingesta.scripts.loading.load_database import loading
 
 
 if __name__ == '__main__':
-    collecting()
-    processing()
-    loading()
+    parser = argparse.ArgumentParser(description='Recogida, procesado y carga de los datos')
+    parser.add_argument('--forzar', action='store_true', help='Procesar y cargar aunque ninguna fuente haya cambiado')
+    args = parser.parse_args()
+
+    if collecting() or args.forzar:
+        processing()
+        loading()
+        # Solo tras una carga correcta: si algo falla antes, la próxima recogida
+        # vuelve a ver los ficheros como cambiados y se reprocesan
+        manifiesto.guardar()
+    else:
+        print('Ninguna fuente ha cambiado desde la última recogida: se omiten el procesado y la carga')
@@ -1,24 +1,60 @@
-from microservicio_ingesta.scripts.ingestion.collect_eurostat.collect_data import collector_eurostat
-from microservicio_ingesta.scripts.ingestion.collect_ine.collect_data import collector_ine
-from microservicio_ingesta.scripts.ingestion.collect_cnmc.collect_data import collector_cnmc
+import argparse
+import os
+
+from microservicio_ingesta.scripts.ingestion.collect_eurostat.collect_data import FUENTES as FUENTES_EUROSTAT
+from microservicio_ingesta.scripts.ingestion.collect_ine.collect_data import FUENTES as FUENTES_INE
+from microservicio_ingesta.scripts.ingestion.collect_cnmc.collect_data import FUENTES as FUENTES_CNMC
 from microservicio_ingesta.scripts.ingestion.collect_base.collect_macro import collect_renta_per_capita
-from microservicio_ingesta.scripts.ingestion.collect_digital_decade.collect_data import collector_digital_decade
+from microservicio_ingesta.scripts.ingestion.collect_digital_decade.collect_data import FUENTES as FUENTES_DIGITAL_DECADE
+from microservicio_ingesta.scripts.ingestion.planificador import Tarea, ResultadoTarea, ejecutar_en_paralelo, imprimir_informe
+
+# Hilos de recogida. Las peticiones a cada host las limita además el
+# descargador compartido (collect_base/descargas.py)
+MAX_HILOS = int(os.getenv('INGESTA_MAX_HILOS', '8'))
 
-def collecting():
-    print('[1/5] -- Recogiendo datos de rpc...')
-    collect_renta_per_capita()
+FUENTES = ['rpc', 'eurostat', 'ine', 'cnmc', 'digital-decade']
 
-    print('[2/5] -- Recogiendo datos de eurostat...')
-    collector_eurostat()
+def tareas_recogida(fuentes: list[str] | None = None) -> list[Tarea]:
+    """
+    Una tarea por URL o tabla, no por fuente: así la recogida tarda lo que la
+    descarga más lenta y no lo que la suma de todas.
+    """
+    tareas = [
+        Tarea('rpc', 'renta_per_capita', collect_renta_per_capita),
+        *(Tarea('eurostat', c.nombre_archivo, c.recoger) for c in FUENTES_EUROSTAT),
+        *(Tarea('ine', c.nombre_archivo, c.recoger) for c in FUENTES_INE),
+        *(Tarea('cnmc', c.nombre_archivo, c.recoger) for c in FUENTES_CNMC),
+        *(Tarea('digital-decade', c.nombre_archivo, c.recoger) for c in FUENTES_DIGITAL_DECADE),
+    ]
+    if fuentes:
+        tareas = [tarea for tarea in tareas if tarea.fuente in fuentes]
+    return tareas
 
-    print('[3/5] -- Recogiendo datos de ine...')
-    collector_ine()
+def fuentes_cambiadas(resultados: list[ResultadoTarea]) -> list[str]:
+    """Fuentes con algún fichero crudo nuevo o modificado en esta recogida."""
+    return sorted({resultado.tarea.fuente for resultado in resultados if resultado.cambiado})
 
-    print('[4/5] -- Recogiendo datos de cnmc...')
-    collector_cnmc()
+def collecting(fuentes: list[str] | None = None, max_hilos: int = MAX_HILOS) -> list[str]:
+    """
+    Recoge las fuentes y devuelve las que han cambiado, para no reprocesar el resto.
+    El manifiesto actualizado queda en memoria: solo se guarda (manifiesto.guardar())
+    cuando los datos nuevos ya están cargados, para que un procesado o una carga
+    fallidos no dejen la siguiente recogida en "sin cambios".
+    """
+    tareas = tareas_recogida(fuentes)
+    print(f'-- Recogiendo {len(tareas)} conjuntos de datos de {", ".join(fuentes or FUENTES)} ({max_hilos} hilos)...')
 
-    print('[5/5] -- recogiendo datos de digital-decade...')
-    collector_digital_decade()
+    resultados, segundos = ejecutar_en_paralelo(tareas, max_hilos)
+    imprimir_informe(resultados, segundos)
+
+    cambiadas = fuentes_cambiadas(resultados)
+    print(f'Fuentes con cambios: {", ".join(cambiadas) if cambiadas else "ninguna"}')
+    return cambiadas
 
 if __name__ == '__main__':
-    collecting()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Recogida de datos de todas las fuentes en paralelo')
+    parser.add_argument('--fuentes', nargs='+', choices=FUENTES, help='Solo estas fuentes (por defecto, todas)')
+    parser.add_argument('--hilos', type=int, default=MAX_HILOS)
+    args = parser.parse_args()
+
+    collecting(args.fuentes, args.hilos)
@@ -1,14 +1,15 @@
-import json
 import os
 import requests
 
+from microservicio_ingesta.scripts.ingestion.collect_base.descargas import descargador
+from microservicio_ingesta.scripts.ingestion.collect_base.manifiesto import manifiesto, ResultadoDescarga, SIN_CAMBIOS
+
 def fetch_eurostat_data(url):
     """
     Recopila datos de la API de Eurostat y los guarda en formato JSON.
     """
     try:
-        response = requests.get(url)
-        response.raise_for_status() 
+        response = descargador.obtener(url)
         json_completo = response.json()
         return json_completo
     except requests.exceptions.RequestException as e:
@@ -16,19 +17,29 @@ def fetch_eurostat_data(url):
         return None
 
 
-def collect_data_api(url, nombre_archivo, ruta_datos_crudos):
-
-    datos = fetch_eurostat_data(url)
-
+def collect_data_api(url, nombre_archivo, ruta_datos_crudos) -> ResultadoDescarga | None:
+    """
+    Descarga condicional: con un 304 o el mismo contenido que la última vez,
+    el fichero crudo no se reescribe.
+    """
     ruta_completa_destino = os.path.join(ruta_datos_crudos, nombre_archivo)
 
-    if datos:
+    try:
+        response = descargador.obtener(url, headers=manifiesto.cabeceras_condicionales(ruta_completa_destino, url))
+        if response.status_code == 304:
+            resultado = manifiesto.no_modificado(ruta_completa_destino)
+        else:
+            # Se valida que sea JSON antes de sustituir el fichero anterior, pero
+            # se guardan los bytes tal cual llegan (sin volver a serializar)
+            if not response.json():
+                raise ValueError('respuesta vacía')
+            resultado = manifiesto.escribir_si_cambia(ruta_completa_destino, response.content, url, response.headers)
+    except (requests.exceptions.RequestException, ValueError) as e:
+        print(f'No se pudieron obtener los datos crudos de la api para la url {url}: {e}')
+        return None
 
-        with open(ruta_completa_destino, 'w', encoding='utf-8') as f:
-            json.dump(datos, f, indent=4, ensure_ascii=False)
-        
-        print(f'Datos guardados en la ruta: {ruta_completa_destino}')
+    if resultado.estado == SIN_CAMBIOS:
+        print(f'Sin cambios ({resultado.motivo}): {ruta_completa_destino}')
     else:
-        print(f'No se pudieron obtener los datos crudos de la api para la url {url}')
-
-
+        print(f'Datos guardados en la ruta: {ruta_completa_destino}')
+    return resultado
@@ -1,161 +1,368 @@
 import datetime
-from bs4 import BeautifulSoup
+import os
+import time
 import asyncio
 from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
 import pandas as pd
 from pathlib import Path
+from dataclasses import dataclass
 import json
 
+from microservicio_ingesta.scripts.ingestion.collect_base.extraccion_desi import GraficoDesi, extraer_grafico
+from microservicio_ingesta.scripts.ingestion.collect_base.manifiesto import manifiesto
+
+# Páginas de Chromium cargando a la vez por indicador
+MAX_PAGINAS = int(os.getenv('INGESTA_MAX_PAGINAS', '4'))
+
+# Tipos de recurso que no se descargan al renderizar los gráficos
+RECURSOS_BLOQUEADOS = {'image', 'font', 'media'}
+
+# 'datos': se guardan los valores de la respuesta JSON con la que la página
+# dibuja el gráfico. 'html': se guarda la página renderizada entera (modo
+# original; es también el respaldo si la captura no se puede validar)
+MODO_CAPTURA = os.getenv('INGESTA_DD_MODO', 'datos')
+
+# Claves de las observaciones en la respuesta de datos del gráfico
+CLAVES_PAIS = ('country', 'ref_area', 'ref-area', 'geo', 'country_code')
+CLAVES_VALOR = ('value', 'obs_value')
+CLAVES_PERIODO = ('period', 'time_period', 'time-period', 'year')
+
+# Nombres con los que el gráfico etiqueta a cada país
+NOMBRES_PAIS = {
+    'AT': 'Austria', 'BE': 'Belgium', 'BG': 'Bulgaria', 'HR': 'Croatia', 'CY': 'Cyprus',
+    'CZ': 'Czechia', 'DK': 'Denmark', 'EE': 'Estonia', 'EU': 'EU', 'FI': 'Finland',
+    'FR': 'France', 'DE': 'Germany', 'EL': 'Greece', 'HU': 'Hungary', 'IS': 'Iceland',
+    'IE': 'Ireland', 'IT': 'Italy', 'LV': 'Latvia', 'LT': 'Lithuania', 'LU': 'Luxembourg',
+    'MT': 'Malta', 'NL': 'Netherlands', 'NO': 'Norway', 'PL': 'Poland', 'PT': 'Portugal',
+    'RO': 'Romania', 'SK': 'Slovakia', 'SI': 'Slovenia', 'ES': 'Spain', 'SE': 'Sweden',
+    'UK': 'United Kingdom'
+}
+
 # Lista de códigos de sector NACE para iterar
 LISTA_BREAKDOWNS_EMPRESA = [
 'c', 'e', 'f', 'g', 'h', 'i', 'ict', 'j', 'l68', 'm', 'n'
 ]
 
-async def get_dynamic_html(url: str) -> str | None:
+@dataclass
+class PaginaDesi:
+    """
+    Una página de gráfico cargada. En modo 'datos' el gráfico sale de la
+    respuesta capturada y de los filtros leídos del DOM; en modo 'html' (o si
+    no se ha podido capturar la respuesta de datos), del HTML renderizado.
+    """
+    url: str
+    grafico: GraficoDesi
+    html: str | None = None
+    capturada: bool = False
+
+    def contenido(self):
+        """Lo que se guarda en crudo para esta página."""
+        if self.capturada:
+            return {'periodo': self.grafico.anno, 'valores': self.grafico.valores}
+        return self.html
+
+
+def nombre_pais(pais) -> str:
+    if isinstance(pais, dict):
+        return pais.get('label') or nombre_pais(pais.get('notation') or pais.get('code') or '')
+    return NOMBRES_PAIS.get(str(pais).upper(), str(pais))
+
+
+def observaciones_json(cuerpo, anno: int | None = None) -> dict | None:
     """
-    Navega a una URL usando Playwright y espera a que el contenido dinámico (el gráfico) cargue.
+    Busca en una respuesta JSON la lista de observaciones (objetos con país y
+    valor) y la devuelve como país -> valor. Si las observaciones traen
+    periodo, solo se toman las del año indicado.
     """
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        page = await browser.new_page()
-        
-        print(f"Navegando a: {url}")
+    if isinstance(cuerpo, list) and cuerpo and all(isinstance(o, dict) for o in cuerpo):
+        valores = {}
+        for observacion in cuerpo:
+            pais = next((observacion[c] for c in CLAVES_PAIS if c in observacion), None)
+            valor = next((observacion[c] for c in CLAVES_VALOR if c in observacion), None)
+            periodo = next((observacion[c] for c in CLAVES_PERIODO if c in observacion), None)
+
+            if pais is None or isinstance(valor, bool) or not isinstance(valor, (int, float)):
+                continue
+            if anno is not None and periodo is not None and str(periodo) != str(anno):
+                continue
+            valores[nombre_pais(pais)] = float(valor)
+        if valores:
+            return valores
+
+    hijos = cuerpo.values() if isinstance(cuerpo, dict) else cuerpo if isinstance(cuerpo, list) else []
+    for hijo in hijos:
+        if isinstance(hijo, (dict, list)):
+            valores = observaciones_json(hijo, anno)
+            if valores:
+                return valores
+    return None
+
+
+def _tolerancia(valor: float) -> float:
+    """Media unidad del último decimal de la etiqueta (el gráfico redondea)."""
+    if valor.is_integer():
+        return 0.5
+    decimales = len(repr(valor).split('.', 1)[1])
+    return 0.5 * 10 ** -decimales + 1e-9
+
+
+async def _leer_filtro(page, nombre: str) -> str | None:
+    """Texto seleccionado en un filtro del gráfico ('' si está vacío, None si no existe)."""
+    filtro = page.locator(f'div.chart-filter:has(label[for="{nombre}"])')
+    if await filtro.count() == 0:
+        return None
+    seleccionado = filtro.first.locator('div.multiselect__tags span')
+    if await seleccionado.count() == 0:
+        return ''
+    return (await seleccionado.first.inner_text()).strip()
+
+
+class PoolNavegador:
+    """
+    Un único Chromium para toda la recogida de un indicador, con un número
+    acotado de páginas que se reutilizan entre URLs. Las peticiones de
+    imágenes, fuentes y vídeo se abortan: el gráfico no las necesita.
+    """
+
+    def __init__(self, max_paginas: int = MAX_PAGINAS, modo: str = MODO_CAPTURA):
+        self.max_paginas = max_paginas
+        self.capturar = modo == 'datos'
+        # Factor entre los valores de la respuesta JSON y los que muestra el gráfico (ver calibrar)
+        self.escala = 1
+        # (url, segundos, con gráfico o no) de cada página cargada
+        self.tiempos = []
+
+    async def __aenter__(self):
+        self._playwright = await async_playwright().start()
+        try:
+            self._browser = await self._playwright.chromium.launch(headless=True)
+            self._contexto = await self._browser.new_context()
+            await self._contexto.route('**/*', self._filtrar_recursos)
+
+            # Las páginas libres esperan en la cola; si no hay ninguna, se espera a que se libere una
+            self._paginas = asyncio.Queue()
+            for _ in range(self.max_paginas):
+                self._paginas.put_nowait(await self._contexto.new_page())
+        except BaseException:
+            await self._playwright.stop()
+            raise
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._browser.close()
+        await self._playwright.stop()
+
+    @staticmethod
+    async def _filtrar_recursos(route):
+        if route.request.resource_type in RECURSOS_BLOQUEADOS:
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def cargar(self, url: str, con_html: bool = False) -> PaginaDesi | None:
+        """
+        Navega a una URL y espera a que el contenido dinámico (el gráfico)
+        cargue. None si no aparece el gráfico.
+        """
+        page = await self._paginas.get()
+        respuestas = []
+
+        def al_responder(response):
+            if response.request.resource_type in ('xhr', 'fetch'):
+                respuestas.append(response)
+
+        if self.capturar:
+            page.on('response', al_responder)
+
+        inicio = time.perf_counter()
+        pagina = None
         try:
             # Navegar a la URL. 'domcontentloaded' es suficiente porque vamos a añadir una espera manual.
             await page.goto(url, wait_until='domcontentloaded', timeout=60000)
 
-            # --- LA CLAVE DEL ARREGLO ESTÁ AQUÍ ---
             # Esperamos explícitamente a que el selector del gráfico aparezca.
             # Este selector apunta a las barras de datos del gráfico. Si aparecen, sabemos
-            # que el JavaScript ha terminado de renderizar la visualización.
+            # que el JavaScript ha terminado de renderizar la visualización (y que
+            # la respuesta con los datos ya ha llegado).
             # Si no aparece en 30 segundos (timeout), lanzará una excepción.
             await page.wait_for_selector('g.highcharts-series-group path', timeout=30000)
-            
-            print("Contenido dinámico cargado con éxito.")
-            content = await page.content()
+
+            valores = None
+            if self.capturar:
+                anno = await _leer_filtro(page, 'period')
+                anno = int(anno) if anno else None
+                valores = await self._valores_capturados(respuestas, anno)
+
+            if valores is not None:
+                grafico = GraficoDesi(anno, await _leer_filtro(page, 'breakdown'), valores)
+                pagina = PaginaDesi(url, grafico, await page.content() if con_html else None, capturada=True)
+            else:
+                # Sin datos capturados, se guarda la página entera
+                content = await page.content()
+                pagina = PaginaDesi(url, extraer_grafico(content), content)
 
         except PlaywrightTimeoutError:
             # Si el selector del gráfico no aparece en el tiempo especificado,
             # significa que probablemente no hay datos para esta combinación.
             print(f"AVISO: No se encontró el gráfico en la página para la URL. Es posible que no haya datos.")
-            content = None # Devolvemos None para indicar que no se encontró contenido.
-        
+
         except Exception as e:
             print(f"Ocurrió un error inesperado con Playwright: {e}")
-            content = None
 
         finally:
-            await browser.close()
-        
-        return content
+            if self.capturar:
+                page.remove_listener('response', al_responder)
+            segundos = time.perf_counter() - inicio
+            self.tiempos.append((url, segundos, pagina is not None))
+            print(f"[{segundos:5.1f} s] {'ok ' if pagina else '---'} {url}")
+            # Una pestaña que se ha cerrado o caído se sustituye por otra nueva
+            if page.is_closed():
+                page = await self._contexto.new_page()
+            self._paginas.put_nowait(page)
 
-async def comprobar_respuesta_nace(content: str, cod_nace: str) -> str:
-    """
-    Parsea el contenido HTML para extraer los datos del gráfico y los devuelve en un DataFrame.
-    Si no hay datos, devuelve un DataFrame vacío.
-    """
-    if not content:
+        return pagina
+
+    async def _valores_capturados(self, respuestas: list, anno: int | None) -> dict | None:
+        # La última respuesta con observaciones es la que ha dibujado el gráfico
+        for response in reversed(respuestas):
+            if 'json' not in (response.headers.get('content-type') or ''):
+                continue
+            try:
+                valores = observaciones_json(await response.json(), anno)
+            except Exception:
+                continue
+            if valores:
+                return {pais: round(valor * self.escala, 6) for pais, valor in valores.items()}
         return None
 
-    soup = BeautifulSoup(content, 'html.parser')
-
-    # Verificamos qué filtro está seleccionado. Si es "All enterprises", significa que
-    # la página no cargó el desglose para el 'cod_nace' específico y no debemos scrapear.
-    try:
-        breakdown_label = soup.find('label', attrs={'for': 'breakdown'})
-        if breakdown_label:
-            parent_div = breakdown_label.find_parent('div', class_='chart-filter')
-            selected_filter_span = parent_div.select_one('div.multiselect__tags span')
-            
-            # Si el filtro muestra "All enterprises" y no estamos pidiendo explícitamente los datos generales...
-            if selected_filter_span and selected_filter_span.text.strip() == 'All enterprises' and cod_nace != 'general':
-                print(f"AVISO: La página para el sector '{cod_nace}' muestra 'All enterprises'. Omitiendo datos.")
-                return None
-            else:
-                return content
-    except Exception as e:
-        print(f"No se pudo comprobar el filtro de desglose, continuando con el scraping. Error: {e}")
-
-
-async def obtener_anno_display(content):
-    soup = BeautifulSoup(content, 'html.parser')
-
-    period_label = soup.find('label', attrs={'for': 'period'})
-    if period_label:
-        parent_div = period_label.find_parent('div', class_='chart-filter')
-        selected_filter_span = parent_div.select_one('div.multiselect__tags span')
-        
-        return int(selected_filter_span.text.strip())
-    
-async def validar_valores_nulos(content):
-    soup = BeautifulSoup(content, 'html.parser')
-    grafico_paths = soup.select('g.highcharts-tracker path[aria-label]')
-
-    if not grafico_paths:
+    def calibrar(self, pagina: PaginaDesi):
+        """
+        Compara los valores capturados en la primera página con las etiquetas
+        del gráfico renderizado para fijar la escala (p.ej. fracciones frente a
+        porcentajes) y comprobar los nombres de país. Si no cuadran, el resto
+        del indicador se recoge en modo 'html'.
+        """
+        if not self.capturar:
+            return
+
+        etiquetas = {pais: valor for pais, valor in extraer_grafico(pagina.html).valores.items() if valor is not None}
+        capturados = pagina.grafico.valores if pagina.capturada else {}
+        for escala in (1, 100):
+            if etiquetas and set(etiquetas) <= set(capturados) and all(
+                abs(capturados[pais] * escala - valor) <= _tolerancia(valor) for pais, valor in etiquetas.items()
+            ):
+                self.escala = escala
+                print(f"Captura de datos validada contra el gráfico (escala x{escala}).")
+                return
+
+        print("AVISO: Los datos capturados no coinciden con el gráfico. Se recoge el HTML de las páginas.")
+        self.capturar = False
+
+    def imprimir_tiempos(self):
+        if not self.tiempos:
+            return
+        segundos = sorted(t[1] for t in self.tiempos)
+        con_grafico = sum(t[2] for t in self.tiempos)
+        print(f'{len(self.tiempos)} páginas ({con_grafico} con gráfico) en {self.max_paginas} pestañas: '
+              f'suma {sum(segundos):.1f} s, mediana {segundos[len(segundos) // 2]:.1f} s, máximo {segundos[-1]:.1f} s')
+        for url, t, _ in sorted(self.tiempos, key=lambda x: x[1], reverse=True)[:3]:
+            print(f'   más lenta: {t:.1f} s {url}')
+
+def pagina_valida(pagina: PaginaDesi | None, cod_nace: str) -> bool:
+    """
+    Si la página muestra el desglose pedido. Si el filtro muestra "All enterprises",
+    la página no cargó el desglose para el 'cod_nace' específico y no debemos scrapear.
+    """
+    if pagina is None or pagina.grafico.desglose is None:
         return False
-    
-    datos_extraidos = [i.get('aria-label') for i in grafico_paths]
+    if pagina.grafico.desglose == 'All enterprises' and cod_nace != 'general':
+        print(f"AVISO: La página para el sector '{cod_nace}' muestra 'All enterprises'. Omitiendo datos.")
+        return False
+    return True
+
 
-    for item in datos_extraidos:
-        if ',' in item:
-            partes = item.split(',', 1)
-            # Limpiamos el nombre del país y el valor (quitando el punto y el %)
-            valor_str = partes[1].strip().rstrip('.%')
-            if valor_str != '0':
-                return True
-            
-    return False
+def pagina_del_anno(pagina: PaginaDesi, year: int) -> bool:
+    """Si la página muestra el año pedido con algún valor distinto de cero."""
+    return pagina.grafico.anno == year and pagina.grafico.tiene_valores
 
 
-async def validar_cods_nace(url):
+async def validar_cods_nace(navegador: PoolNavegador, url):
+    paginas = await asyncio.gather(*(
+        navegador.cargar(f'{url}&breakdown=nace_{cod_nace}') for cod_nace in LISTA_BREAKDOWNS_EMPRESA
+    ))
+
     cods_nace_validos = []
-    for cod_nace in LISTA_BREAKDOWNS_EMPRESA:
-        content = await get_dynamic_html(f'{url}&breakdown=nace_{cod_nace}')
-        if  await comprobar_respuesta_nace(content, cod_nace):
+    for cod_nace, pagina in zip(LISTA_BREAKDOWNS_EMPRESA, paginas):
+        if pagina_valida(pagina, cod_nace):
             cods_nace_validos.append(cod_nace)
 
     return cods_nace_validos
 
 
-async def crear_dataframe_por_sectores(url_base: str, empresa: bool, output_path: str):
+async def recoger_anno(navegador: PoolNavegador, url_base: str, year: int, empresa: bool, lista_breakdowns_local: list) -> dict:
+    url_year = f'{url_base}&period={year}'
+    contents_year = {}
+
+    if empresa:
+        # Los sectores de un año van en orden: al primero sin datos de ese año se deja de pedir el resto
+        for cod_nace in lista_breakdowns_local:
+            url_sector = f'{url_year}&breakdown=nace_{cod_nace}'
+            pagina = await navegador.cargar(url_sector)
+            if not pagina_valida(pagina, cod_nace):
+                continue
+
+            if not pagina_del_anno(pagina, year):
+                break
+
+            contents_year[cod_nace] = pagina.contenido()
+
+    else:
+        # Caso para cuando no se filtra por empresa/sector
+        pagina = await navegador.cargar(url_year)
+        contents_year['general'] = pagina.contenido() if pagina else None
+
+    return contents_year
+
+
+async def crear_dataframe_por_sectores(navegador: PoolNavegador, url_base: str, empresa: bool, output_path: str):
     """
     Orquesta el proceso de scraping para uno o varios sectores y guarda el resultado.
+    Los años se recogen a la vez; el pool de páginas limita las que se cargan en paralelo.
     """
-    content_inicial = await get_dynamic_html(url_base)
-    act_year = int(await obtener_anno_display(content_inicial))
-    obj_year = act_year - 10
-    json_contents = {}
+    pagina_inicial = await navegador.cargar(url_base, con_html=True)
 
-    if empresa:
-        lista_breakdowns_local = await validar_cods_nace(url_base)
-    
-    # Iteramos sobre cada código de sector para las empresas
-    for year in range(act_year, obj_year, -1):
-        if year not in json_contents:
-            json_contents[year] = {}
-
-        url_year = f'{url_base}&period={year}'
+    # Sin la primera página o sin su año no se sabe qué años pedir: no se escribe nada
+    if pagina_inicial is None or pagina_inicial.grafico.anno is None:
+        motivo = "no se pudo cargar" if pagina_inicial is None else "no tiene filtro de periodo"
+        print(f"AVISO: La página inicial {motivo}; se omite {url_base}")
+        return None
 
-        if empresa:
-            for cod_nace in lista_breakdowns_local:
-                url_sector = f'{url_year}&breakdown=nace_{cod_nace}'
-                contenido_html = await get_dynamic_html(url_sector)
-                content_sector = await comprobar_respuesta_nace(contenido_html, cod_nace)
+    navegador.calibrar(pagina_inicial)
+    act_year = int(pagina_inicial.grafico.anno)
+    obj_year = act_year - 10
+    years = list(range(act_year, obj_year, -1))
 
-                if content_sector and (year != await(obtener_anno_display(content_sector)) or not await validar_valores_nulos(content_sector)):
-                    break
+    lista_breakdowns_local = await validar_cods_nace(navegador, url_base) if empresa else []
 
-                if content_sector:
-                    json_contents[year][cod_nace] = content_sector
+    contents = await asyncio.gather(*(
+        recoger_anno(navegador, url_base, year, empresa, lista_breakdowns_local) for year in years
+    ))
+    json_contents = dict(zip(years, contents))
 
-        else:
-            # Caso para cuando no se filtra por empresa/sector
-            contenido_html = await get_dynamic_html(url_year)
-            json_contents[year]['general'] = contenido_html
-        
     if json_contents:
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(json_contents, f, ensure_ascii=False, indent=4)
+        return manifiesto.escribir_si_cambia(
+            output_path,
+            json.dumps(json_contents, ensure_ascii=False, indent=4).encode('utf-8'),
+            url_base
+        )
+
+
+async def recoger_con_navegador(url: str, empresa: bool, output_path: Path):
+    async with PoolNavegador() as navegador:
+        try:
+            return await crear_dataframe_por_sectores(navegador, url, empresa, output_path)
+        finally:
+            navegador.imprimir_tiempos()
 
 
 def recoger_digital(empresa: bool, url: str, output_dir: Path, nombre_archivo: str):
@@ -166,6 +373,6 @@ def recoger_digital(empresa: bool, url: str, output_dir: Path, nombre_archivo: s
     # output_dir.mkdir(parents=True, exist_ok=True)
     ruta_completa_destino = output_dir / nombre_archivo
 
-    asyncio.run(crear_dataframe_por_sectores(url, empresa, ruta_completa_destino))
+    return asyncio.run(recoger_con_navegador(url, empresa, ruta_completa_destino))
 
 
@@ -1,10 +1,14 @@
-import requests
 import pandas as pd
 
+from microservicio_ingesta.scripts.ingestion.collect_base.descargas import descargador
+from microservicio_ingesta.scripts.ingestion.collect_base.manifiesto import manifiesto
+
+RUTA_RNBPC = 'data/raw/WorldBank/rnbpc.csv'
+
 def collect_renta_per_capita():
     # 1. OBTENER RNB PER CÁPITA EN DÓLARES (US$) DESDE 2015
     url_gni_usd = "http://api.worldbank.org/v2/country/es/indicator/NY.GNP.PCAP.CD?format=json&date=2015:2025"
-    response_gni = requests.get(url_gni_usd)
+    response_gni = descargador.obtener(url_gni_usd)
     data_gni = response_gni.json()
 
     df_gni = pd.DataFrame()
@@ -14,7 +18,7 @@ def collect_renta_per_capita():
 
     # 2. OBTENER TIPO DE CAMBIO ANUAL (EUR por US$) DESDE 2015
     url_exchange = "http://api.worldbank.org/v2/country/XC/indicator/PA.NUS.FCRF?format=json&date=2015:2025"
-    response_exchange = requests.get(url_exchange)
+    response_exchange = descargador.obtener(url_exchange)
     data_exchange = response_exchange.json()
 
     df_exchange = pd.DataFrame()
@@ -29,8 +33,13 @@ def collect_renta_per_capita():
         df_resultado = df_final[['Año', 'RNB per Cápita (€)']].sort_values('Año', ascending=False).reset_index(drop=True)
         df_resultado['RNB per Cápita (€)'] = df_resultado['RNB per Cápita (€)'].round(2)
         
-        print("RNB per Cápita de España en Euros (desde 2015) guardada")
         df_resultado['pais'] = 'España'
-        df_resultado.to_csv('data/raw/WorldBank/rnbpc.csv')
+        # El CSV se calcula a partir de dos series: se compara su contenido con el de la última recogida
+        resultado = manifiesto.escribir_si_cambia(RUTA_RNBPC, df_resultado.to_csv().encode('utf-8'))
+        if resultado.cambiado:
+            print("RNB per Cápita de España en Euros (desde 2015) guardada")
+        else:
+            print("RNB per Cápita de España en Euros sin cambios")
+        return resultado
     else:
         print("No se pudieron obtener todos los datos para realizar el cálculo.")
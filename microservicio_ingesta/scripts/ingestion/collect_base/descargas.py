@@ -0,0 +1,180 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.utils import requote_uri
+
+from microservicio_ingesta.scripts.ingestion.collect_base.manifiesto import ACTUALIZADO, Manifiesto, ResultadoDescarga
+
+# Descargas HTTP compartidas por todos los collectors:
+# - Una única requests.Session con conexiones keep-alive reutilizables.
+# - Un límite de peticiones simultáneas por host, para no saturar (ni ser
+#   bloqueados por) Eurostat, INE o CNMC al recoger en paralelo.
+# - Un gancho para reescribir las URLs (p.ej. hacia el servidor de replay
+#   local, ver replay.py) y la opción de grabar las respuestas para él.
+# - Descargas condicionales contra el manifiesto de ficheros crudos
+#   (manifiesto.py): ETag/Last-Modified y SHA-256 del contenido.
+
+# Peticiones simultáneas máximas por host (el resto usa LIMITE_POR_DEFECTO)
+LIMITES_POR_HOST = {
+    'ec.europa.eu': 4,
+    'ine.es': 2,
+    'catalogodatos.cnmc.es': 2,
+    'api.worldbank.org': 2,
+}
+LIMITE_POR_DEFECTO = 2
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+# Segundos de espera para conectar y para recibir cada bloque de la respuesta
+TIMEOUT = (10, 120)
+
+
+def clave_grabacion(url: str) -> str:
+    """Clave de una respuesta grabada: host, ruta y query de la URL original (sin esquema)."""
+    # Normalizada igual que la envía requests, para que coincida en el servidor de replay
+    partes = urlsplit(requote_uri(url))
+    recurso = partes.netloc + partes.path + (f'?{partes.query}' if partes.query else '')
+    return hashlib.sha256(recurso.encode('utf-8')).hexdigest()
+
+
+def url_replay(base: str):
+    """
+    Devuelve un reescritor que manda todas las peticiones al servidor de replay:
+    https://ine.es/a/b?x=1 -> {base}/ine.es/a/b?x=1
+    """
+    base = base.rstrip('/')
+
+    def reescribir(url: str) -> str:
+        partes = urlsplit(url)
+        return f'{base}/{partes.netloc}{partes.path}' + (f'?{partes.query}' if partes.query else '')
+
+    return reescribir
+
+
+class Descargador:
+    """
+    Cliente HTTP de la ingesta, seguro entre hilos. El límite por host se
+    aplica sobre la URL original aunque se reescriba.
+    """
+
+    def __init__(self, limites_por_host: dict = None, reescribir_url=None, directorio_grabacion: str | Path | None = None):
+        self.limites_por_host = dict(LIMITES_POR_HOST if limites_por_host is None else limites_por_host)
+        self.reescribir_url = reescribir_url
+        self.directorio_grabacion = Path(directorio_grabacion) if directorio_grabacion else None
+
+        self.sesion = requests.Session()
+        self.sesion.headers['User-Agent'] = USER_AGENT
+        # Conexiones por host que se mantienen abiertas: al menos el mayor de los límites
+        tamano_pool = max([LIMITE_POR_DEFECTO, *self.limites_por_host.values()])
+        adaptador = HTTPAdapter(pool_connections=len(self.limites_por_host) + 1, pool_maxsize=tamano_pool)
+        self.sesion.mount('http://', adaptador)
+        self.sesion.mount('https://', adaptador)
+
+        self._semaforos = {}
+        self._lock = threading.Lock()
+
+    def _semaforo(self, url: str) -> threading.BoundedSemaphore:
+        host = urlsplit(url).hostname or ''
+        with self._lock:
+            if host not in self._semaforos:
+                self._semaforos[host] = threading.BoundedSemaphore(self.limites_por_host.get(host, LIMITE_POR_DEFECTO))
+            return self._semaforos[host]
+
+    def _url_efectiva(self, url: str) -> str:
+        return self.reescribir_url(url) if self.reescribir_url else url
+
+    def _grabar(self, url: str, respuesta: requests.Response, cuerpo: Path | bytes):
+        # Un 304 no trae cuerpo que grabar
+        if self.directorio_grabacion is None or respuesta.status_code == 304:
+            return
+
+        self.directorio_grabacion.mkdir(parents=True, exist_ok=True)
+        clave = clave_grabacion(url)
+        destino = self.directorio_grabacion / f'{clave}.body'
+        if isinstance(cuerpo, Path):
+            shutil.copyfile(cuerpo, destino)
+        else:
+            destino.write_bytes(cuerpo)
+
+        metadatos = {
+            'url': url,
+            'status': respuesta.status_code,
+            'content_type': respuesta.headers.get('Content-Type'),
+            'etag': respuesta.headers.get('ETag'),
+            'last_modified': respuesta.headers.get('Last-Modified'),
+        }
+        (self.directorio_grabacion / f'{clave}.json').write_text(json.dumps(metadatos, ensure_ascii=False), encoding='utf-8')
+
+    def obtener(self, url: str, **kwargs) -> requests.Response:
+        """
+        GET con el cuerpo ya leído (se puede usar .json() o .content tras
+        liberar el hueco del host). Lanza requests.HTTPError si el estado es
+        4xx/5xx; un 304 (petición condicional) se devuelve tal cual.
+        """
+        kwargs.setdefault('timeout', TIMEOUT)
+        with self._semaforo(url):
+            respuesta = self.sesion.get(self._url_efectiva(url), **kwargs)
+            respuesta.raise_for_status()
+            contenido = respuesta.content
+
+        self._grabar(url, respuesta, contenido)
+        return respuesta
+
+    def descargar(self, url: str, destino: str | Path, manifiesto: Manifiesto | None = None, **kwargs) -> ResultadoDescarga:
+        """
+        Descarga la respuesta a un fichero por bloques, sin cargarla entera en
+        memoria. Con `manifiesto` la petición es condicional y el fichero solo
+        se reescribe si su SHA-256 ha cambiado.
+        """
+        kwargs.setdefault('timeout', TIMEOUT)
+        destino = Path(destino)
+        temporal = destino.with_name(f'{destino.name}.parcial')
+        condicionales = manifiesto.cabeceras_condicionales(destino, url) if manifiesto else {}
+        cabeceras = {**kwargs.pop('headers', {}), **condicionales}
+
+        with self._semaforo(url):
+            with self.sesion.get(self._url_efectiva(url), stream=True, headers=cabeceras, **kwargs) as respuesta:
+                respuesta.raise_for_status()
+                if respuesta.status_code == 304 and condicionales:
+                    return manifiesto.no_modificado(destino)
+
+                # Se descarga a un temporal: si falla a medias, el fichero anterior queda intacto
+                h = hashlib.sha256()
+                try:
+                    with open(temporal, 'wb') as archivo_local:
+                        for chunk in respuesta.iter_content(chunk_size=8192):
+                            archivo_local.write(chunk)
+                            h.update(chunk)
+                except BaseException:
+                    temporal.unlink(missing_ok=True)
+                    raise
+
+        self._grabar(url, respuesta, temporal)
+        if manifiesto:
+            return manifiesto.reemplazar_si_cambia(destino, temporal, h.hexdigest(), url, respuesta.headers)
+
+        os.replace(temporal, destino)
+        return ResultadoDescarga(destino, ACTUALIZADO)
+
+
+def _descargador_desde_entorno() -> Descargador:
+    """
+    INGESTA_URL_REPLAY=http://127.0.0.1:8765 manda las peticiones al servidor de replay;
+    INGESTA_GRABAR=directorio guarda cada respuesta para poder reproducirla después.
+    """
+    base_replay = os.getenv('INGESTA_URL_REPLAY')
+    return Descargador(
+        reescribir_url=url_replay(base_replay) if base_replay else None,
+        directorio_grabacion=os.getenv('INGESTA_GRABAR') or None
+    )
+
+
+# Instancia compartida por los collectors
+descargador = _descargador_desde_entorno()
@@ -0,0 +1,68 @@
+from dataclasses import dataclass, field
+
+from lxml import html as lxml_html
+
+# Extracción de los datos de una página de gráfico de Digital Decade (DESI).
+# Cada documento se parsea una sola vez, con lxml (libxml2), y el resultado lo
+# usan tanto las comprobaciones de la recogida como el procesado.
+
+# Div de un filtro del gráfico (el más cercano a su etiqueta) y texto seleccionado en él
+_XPATH_FILTRO = "ancestor::div[contains(concat(' ', normalize-space(@class), ' '), ' chart-filter ')][1]"
+_XPATH_SELECCION = ".//div[contains(concat(' ', normalize-space(@class), ' '), ' multiselect__tags ')]//span"
+# Barras del gráfico: cada una lleva 'País, valor%.' en aria-label
+_XPATH_BARRAS = "//g[contains(concat(' ', normalize-space(@class), ' '), ' highcharts-tracker ')]//path/@aria-label"
+
+
+@dataclass(frozen=True)
+class GraficoDesi:
+    # Año seleccionado en el filtro de periodo
+    anno: int | None = None
+    # Texto del filtro de desglose: None si la página no tiene ese filtro, '' si está vacío
+    desglose: str | None = None
+    # País -> valor de la barra (None si la etiqueta no es numérica)
+    valores: dict[str, float | None] = field(default_factory=dict)
+
+    @property
+    def tiene_valores(self) -> bool:
+        """Si alguna barra tiene un valor distinto de cero."""
+        return any(valor != 0 for valor in self.valores.values())
+
+
+def _texto_filtro(documento, nombre: str) -> str | None:
+    etiquetas = documento.xpath('//label[@for=$nombre]', nombre=nombre)
+    if not etiquetas:
+        return None
+    filtro = etiquetas[0].xpath(_XPATH_FILTRO)
+    if not filtro:
+        return None
+    seleccion = filtro[0].xpath(_XPATH_SELECCION)
+    return seleccion[0].text_content().strip() if seleccion else ''
+
+
+def _numero(texto: str) -> float | None:
+    try:
+        return float(texto)
+    except ValueError:
+        return None
+
+
+def extraer_grafico(content: str | None) -> GraficoDesi:
+    """Filtros seleccionados y valores por país de una página de gráfico renderizada."""
+    if not content:
+        return GraficoDesi()
+
+    documento = lxml_html.fromstring(content)
+
+    periodo = _texto_filtro(documento, 'period')
+    valores = {}
+    for etiqueta in documento.xpath(_XPATH_BARRAS):
+        if ',' in etiqueta:
+            pais, valor = etiqueta.split(',', 1)
+            # Limpiamos el nombre del país y el valor (quitando el punto y el %)
+            valores[pais.strip()] = _numero(valor.strip().rstrip('.%'))
+
+    return GraficoDesi(
+        anno=int(periodo) if periodo else None,
+        desglose=_texto_filtro(documento, 'breakdown'),
+        valores=valores
+    )
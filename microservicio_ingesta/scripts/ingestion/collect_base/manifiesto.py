@@ -0,0 +1,133 @@
+import hashlib
+import json
+import os
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Manifiesto de los ficheros crudos: por cada fichero, la URL de la que sale,
+# su ETag y Last-Modified y el SHA-256 del contenido. Con él la recogida hace
+# peticiones condicionales (304 = sin cambios) y no reescribe un fichero cuyo
+# contenido no ha cambiado, de modo que su fecha de modificación solo avanza
+# cuando el editor publica datos nuevos.
+
+RUTA_MANIFIESTO = Path('data') / 'raw' / 'manifiesto.json'
+
+NUEVO = 'nuevo'
+ACTUALIZADO = 'actualizado'
+SIN_CAMBIOS = 'sin_cambios'
+
+
+@dataclass
+class ResultadoDescarga:
+    ruta: Path
+    estado: str
+    # Por qué no ha cambiado: 304 del servidor o mismo SHA-256
+    motivo: str | None = None
+
+    @property
+    def cambiado(self) -> bool:
+        return self.estado != SIN_CAMBIOS
+
+
+def _ahora() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+
+class Manifiesto:
+    """Seguro entre hilos. Los cambios se escriben a disco con guardar()."""
+
+    def __init__(self, ruta: str | Path = RUTA_MANIFIESTO):
+        self.ruta = Path(ruta)
+        self._lock = threading.Lock()
+        try:
+            self._entradas = json.loads(self.ruta.read_text(encoding='utf-8'))
+        except (FileNotFoundError, json.JSONDecodeError):
+            self._entradas = {}
+
+    @staticmethod
+    def _clave(ruta: str | Path) -> str:
+        return Path(ruta).as_posix()
+
+    def entrada(self, ruta: str | Path) -> dict | None:
+        with self._lock:
+            return self._entradas.get(self._clave(ruta))
+
+    def cabeceras_condicionales(self, ruta: str | Path, url: str) -> dict:
+        """
+        If-None-Match / If-Modified-Since de la última descarga, solo si el
+        fichero sigue en disco tal cual y viene de la misma URL.
+        """
+        entrada = self.entrada(ruta)
+        ruta = Path(ruta)
+        if not entrada or entrada.get('url') != url or not ruta.exists() or ruta.stat().st_size != entrada.get('bytes'):
+            return {}
+
+        cabeceras = {}
+        if entrada.get('etag'):
+            cabeceras['If-None-Match'] = entrada['etag']
+        if entrada.get('last_modified'):
+            cabeceras['If-Modified-Since'] = entrada['last_modified']
+        return cabeceras
+
+    def no_modificado(self, ruta: str | Path) -> ResultadoDescarga:
+        """Registra un 304: el fichero en disco sigue vigente."""
+        with self._lock:
+            entrada = self._entradas.get(self._clave(ruta))
+            if entrada:
+                entrada['comprobado'] = _ahora()
+        return ResultadoDescarga(Path(ruta), SIN_CAMBIOS, '304 Not Modified')
+
+    def reemplazar_si_cambia(self, ruta: str | Path, temporal: Path, sha256: str, url: str | None = None,
+                             cabeceras: dict | None = None) -> ResultadoDescarga:
+        """
+        Mueve `temporal` a `ruta` si su contenido difiere del registrado; si no,
+        lo borra y deja el fichero existente intacto.
+        """
+        ruta = Path(ruta)
+        cabeceras = cabeceras or {}
+        with self._lock:
+            anterior = self._entradas.get(self._clave(ruta))
+            igual = anterior is not None and anterior.get('sha256') == sha256 and ruta.exists()
+
+            if igual:
+                temporal.unlink()
+            else:
+                os.replace(temporal, ruta)
+
+            ahora = _ahora()
+            self._entradas[self._clave(ruta)] = {
+                'url': url,
+                'etag': cabeceras.get('ETag'),
+                'last_modified': cabeceras.get('Last-Modified'),
+                'sha256': sha256,
+                'bytes': ruta.stat().st_size,
+                'comprobado': ahora,
+                'modificado': anterior['modificado'] if igual else ahora,
+            }
+
+        if igual:
+            return ResultadoDescarga(ruta, SIN_CAMBIOS, 'mismo SHA-256')
+        return ResultadoDescarga(ruta, ACTUALIZADO if anterior else NUEVO)
+
+    def escribir_si_cambia(self, ruta: str | Path, contenido: bytes, url: str | None = None,
+                           cabeceras: dict | None = None) -> ResultadoDescarga:
+        """Escribe `contenido` en `ruta` (a través de un temporal) solo si ha cambiado."""
+        ruta = Path(ruta)
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        temporal = ruta.with_name(f'{ruta.name}.parcial')
+        temporal.write_bytes(contenido)
+        return self.reemplazar_si_cambia(ruta, temporal, hashlib.sha256(contenido).hexdigest(), url, cabeceras)
+
+    def guardar(self):
+        with self._lock:
+            contenido = json.dumps(self._entradas, indent=2, ensure_ascii=False, sort_keys=True)
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        temporal = self.ruta.with_name(f'{self.ruta.name}.parcial')
+        temporal.write_text(contenido, encoding='utf-8')
+        os.replace(temporal, self.ruta)
+
+
+# Instancia compartida por los collectors; microservicio_ingesta.main la guarda tras cargar los datos
+manifiesto = Manifiesto()
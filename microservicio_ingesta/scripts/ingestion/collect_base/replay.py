@@ -0,0 +1,88 @@
+import argparse
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from microservicio_ingesta.scripts.ingestion.collect_base.descargas import clave_grabacion
+
+# Servidor HTTP local que reproduce respuestas grabadas con INGESTA_GRABAR,
+# para probar la recogida sin depender de las fuentes reales. Las rutas
+# llevan el host original delante (ver descargas.url_replay):
+#   GET /ine.es/jaxiT3/files/t/es/px/56945.px?nocab=1
+# Con --retardo se simula la latencia de la red, para comparar la recogida
+# en serie con la recogida en paralelo.
+#
+# Uso (desde la raíz del repositorio):
+#   INGESTA_GRABAR=data/grabaciones python -m microservicio_ingesta.run_ingestion   # grabar una vez
+#   python -m microservicio_ingesta.scripts.ingestion.collect_base.replay -d data/grabaciones --retardo 1
+#   INGESTA_URL_REPLAY=http://127.0.0.1:8765 python -m microservicio_ingesta.run_ingestion --fuentes eurostat ine cnmc rpc
+
+
+def crear_manejador(directorio: Path, retardo: float):
+
+    class ManejadorReplay(BaseHTTPRequestHandler):
+        def do_GET(self):
+            # La URL original sin esquema es la ruta sin la barra inicial
+            clave = clave_grabacion(f'//{self.path.lstrip("/")}')
+            cuerpo = directorio / f'{clave}.body'
+            metadatos = directorio / f'{clave}.json'
+
+            time.sleep(retardo)
+
+            if not cuerpo.exists():
+                self.send_error(404, 'Respuesta no grabada')
+                return
+
+            info = json.loads(metadatos.read_text(encoding='utf-8')) if metadatos.exists() else {}
+            validadores = {'ETag': info.get('etag'), 'Last-Modified': info.get('last_modified')}
+
+            # Peticiones condicionales con los validadores grabados
+            if (validadores['ETag'] and self.headers.get('If-None-Match') == validadores['ETag']) or \
+                    (validadores['Last-Modified'] and self.headers.get('If-Modified-Since') == validadores['Last-Modified']):
+                self.send_response(304)
+                self._enviar_validadores(validadores)
+                self.end_headers()
+                return
+
+            contenido = cuerpo.read_bytes()
+            self.send_response(info.get('status', 200))
+            self.send_header('Content-Type', info.get('content_type') or 'application/octet-stream')
+            self.send_header('Content-Length', str(len(contenido)))
+            self._enviar_validadores(validadores)
+            self.end_headers()
+            self.wfile.write(contenido)
+
+        def _enviar_validadores(self, validadores: dict):
+            for cabecera, valor in validadores.items():
+                if valor:
+                    self.send_header(cabecera, valor)
+
+        def log_message(self, formato, *args):
+            print(f'[replay] {formato % args}')
+
+    return ManejadorReplay
+
+
+def servir(directorio: Path, puerto: int = 8765, retardo: float = 0.0) -> ThreadingHTTPServer:
+    """Crea el servidor (sin arrancarlo): serve_forever() para servir, shutdown() para pararlo."""
+    return ThreadingHTTPServer(('127.0.0.1', puerto), crear_manejador(Path(directorio), retardo))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Servidor de replay de respuestas grabadas de la ingesta')
+    parser.add_argument('-d', '--directorio', default='data/grabaciones')
+    parser.add_argument('-p', '--puerto', type=int, default=8765)
+    parser.add_argument('--retardo', type=float, default=0.0, help='Segundos de latencia simulada por petición')
+    args = parser.parse_args()
+
+    servidor = servir(args.directorio, args.puerto, args.retardo)
+    print(f'Reproduciendo {args.directorio} en http://127.0.0.1:{args.puerto}')
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        servidor.shutdown()
+
+
+if __name__ == '__main__':
+    main()
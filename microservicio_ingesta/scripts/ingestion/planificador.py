@@ -0,0 +1,83 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Callable
+
+# Ejecuta las tareas de recogida en paralelo con un pool de hilos. Las
+# descargas comparten el Descargador de collect_base/descargas.py, que limita
+# las peticiones simultáneas a cada host, así que el número de hilos solo
+# acota el trabajo total en curso.
+
+
+@dataclass
+class Tarea:
+    fuente: str
+    nombre: str
+    funcion: Callable[[], object]
+
+
+@dataclass
+class ResultadoTarea:
+    tarea: Tarea
+    segundos: float
+    error: Exception | None = None
+    # Lo que devuelve la tarea; los collectors, un ResultadoDescarga (manifiesto.py)
+    valor: object = None
+
+    @property
+    def cambiado(self) -> bool:
+        """Si la tarea ha escrito datos nuevos. Tras un error queda el fichero anterior."""
+        return bool(getattr(self.valor, 'cambiado', False))
+
+
+def _ejecutar(tarea: Tarea) -> ResultadoTarea:
+    inicio = time.perf_counter()
+    try:
+        valor = tarea.funcion()
+        return ResultadoTarea(tarea, time.perf_counter() - inicio, valor=valor)
+    except Exception as e:
+        # Una fuente caída no detiene al resto: el error se informa al final
+        return ResultadoTarea(tarea, time.perf_counter() - inicio, e)
+
+
+def ejecutar_en_paralelo(tareas: list[Tarea], max_hilos: int = 8) -> tuple[list[ResultadoTarea], float]:
+    """Devuelve los resultados en el orden de las tareas y los segundos de reloj totales."""
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_hilos, thread_name_prefix='recogida') as pool:
+        futuros = {pool.submit(_ejecutar, tarea): i for i, tarea in enumerate(tareas)}
+        resultados = [None] * len(tareas)
+        for futuro in as_completed(futuros):
+            resultado = futuro.result()
+            resultados[futuros[futuro]] = resultado
+            estado = 'ERROR' if resultado.error else ('cambiado' if resultado.cambiado else 'sin cambios')
+            print(f'   [{estado}] {resultado.tarea.fuente}/{resultado.tarea.nombre} ({resultado.segundos:.1f} s)')
+
+    return resultados, time.perf_counter() - inicio
+
+
+def imprimir_informe(resultados: list[ResultadoTarea], segundos_totales: float):
+    """
+    Tiempo de reloj de la recogida frente a la suma de las tareas (lo que
+    habría tardado en serie), desglosado por fuente, conjuntos de datos que
+    han cambiado y errores.
+    """
+    por_fuente = {}
+    for resultado in resultados:
+        fuente = por_fuente.setdefault(resultado.tarea.fuente, {'tareas': 0, 'suma': 0.0, 'maximo': 0.0, 'cambiados': 0, 'errores': 0})
+        fuente['tareas'] += 1
+        fuente['suma'] += resultado.segundos
+        fuente['maximo'] = max(fuente['maximo'], resultado.segundos)
+        fuente['cambiados'] += resultado.cambiado
+        fuente['errores'] += resultado.error is not None
+
+    print('\n--- Informe de recogida ---')
+    print(f"{'fuente':<16} {'tareas':>6} {'suma (s)':>9} {'más lenta (s)':>14} {'cambiados':>10} {'errores':>8}")
+    for nombre, fuente in por_fuente.items():
+        print(f"{nombre:<16} {fuente['tareas']:>6} {fuente['suma']:>9.1f} {fuente['maximo']:>14.1f} {fuente['cambiados']:>10} {fuente['errores']:>8}")
+
+    suma = sum(resultado.segundos for resultado in resultados)
+    print(f'Tiempo total: {segundos_totales:.1f} s (en serie: {suma:.1f} s)')
+
+    for resultado in resultados:
+        if resultado.error is not None:
+            print(f'ERROR en {resultado.tarea.fuente}/{resultado.tarea.nombre}: {resultado.error}')
@@ -8,6 +8,7 @@ from database.modelos.datos_crudos import DatoCrudo
 from database.modelos.datos_macro import DatoMacro
 from database.modelos.resultados_indicadores import ResultadoIndicador
 from database.connection import SessionLocal
+from database.agregados import refrescar_agregados
 import logging
 from sqlalchemy.orm.exc import NoResultFound
 from sqlalchemy.exc import IntegrityError
@@ -158,6 +159,8 @@ def loading():
             except Exception as e:
                 logging.error(f"Fallo al procesar los datos del archivo {dato['ruta_archivo']}. Revirtiendo cambios para este archivo. Error: {e}")
                 session.rollback()
+
+        refrescar_agregados(session)
     finally:
         logging.info("Proceso de iteración finalizado. Cerrando sesión.")
         session.close()
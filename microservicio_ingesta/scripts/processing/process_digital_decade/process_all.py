@@ -1,8 +1,9 @@
-from bs4 import BeautifulSoup
 import pandas as pd
 from pathlib import Path
 import json
 
+from microservicio_ingesta.scripts.ingestion.collect_base.extraccion_desi import extraer_grafico
+
 # Lista de códigos de sector NACE para iterar
 LISTA_BREAKDOWNS_EMPRESA = [
     'c', 'e', 'f', 'g', 'h', 'i', 'ict', 'j', 'l68', 'm', 'n'
@@ -22,56 +23,39 @@ CODS_NACE = {
     'm': 'Professional, scientific and technical activities',
     'n': 'Administrative and support service activities'
 }
-def obtener_anno_display(content):
-    soup = BeautifulSoup(content, 'html.parser')
-
-    period_label = soup.find('label', attrs={'for': 'period'})
-    if period_label:
-        parent_div = period_label.find_parent('div', class_='chart-filter')
-        selected_filter_span = parent_div.select_one('div.multiselect__tags span')
-        
-        return int(selected_filter_span.text.strip())
+def _dataframe_valores(valores: dict, periodo, cod_nace: str, nombre_resultado: str) -> pd.DataFrame:
+    df = pd.DataFrame(list(valores.items()), columns=['pais', nombre_resultado])
+    df['sector'] = CODS_NACE.get(cod_nace, 'Desconocido')
+    df['periodo'] = periodo
+    return df
 
 def extraer_datos_de_html(content: str, cod_nace: str, nombre_resultado: str) -> pd.DataFrame:
     """
     Parsea el contenido HTML para extraer los datos del gráfico y los devuelve en un DataFrame.
     Si no hay datos, devuelve un DataFrame vacío.
     """
-    if not content:
-        # Si el contenido es None (porque Playwright falló o no encontró el gráfico),
-        # devolvemos un DataFrame vacío con la estructura correcta.
-        return pd.DataFrame(columns=['pais', nombre_resultado, 'sector'])
+    # Si el contenido es None (porque Playwright falló o no encontró el gráfico),
+    # el gráfico sale vacío y devolvemos un DataFrame vacío con la estructura correcta.
+    grafico = extraer_grafico(content)
 
-    soup = BeautifulSoup(content, 'html.parser')
-
-    # Buscamos directamente las barras del gráfico que contienen la información en 'aria-label'
-    grafico_paths = soup.select('g.highcharts-tracker path[aria-label]')
-    
-    if not grafico_paths:
-        print(f"No se encontraron datos de gráfico para el sector {cod_nace}.")
+    if not grafico.valores:
+        if content:
+            print(f"No se encontraron datos de gráfico para el sector {cod_nace}.")
         return pd.DataFrame(columns=['pais', nombre_resultado, 'sector'])
 
-    datos_extraidos = [i.get('aria-label') for i in grafico_paths]
+    print(f"Datos extraídos para el sector {CODS_NACE.get(cod_nace, 'Desconocido')}: {len(grafico.valores)} países.")
 
-    resultado = {}
-    for item in datos_extraidos:
-        if ',' in item:
-            partes = item.split(',', 1)
-            # Limpiamos el nombre del país y el valor (quitando el punto y el %)
-            pais = partes[0].strip()
-            valor_str = partes[1].strip().rstrip('.%')
-            resultado[pais] = valor_str
+    return _dataframe_valores(grafico.valores, grafico.anno, cod_nace, nombre_resultado)
 
-    if not resultado:
+def extraer_datos_capturados(entrada: dict, cod_nace: str, nombre_resultado: str) -> pd.DataFrame:
+    """
+    DataFrame de una entrada recogida en modo 'datos' ({'periodo', 'valores'}),
+    con las mismas columnas que extraer_datos_de_html.
+    """
+    if not entrada.get('valores'):
         return pd.DataFrame(columns=['pais', nombre_resultado, 'sector'])
 
-    print(f"Datos extraídos para el sector {CODS_NACE.get(cod_nace, 'Desconocido')}: {len(resultado)} países.")
-    
-    df = pd.DataFrame(list(resultado.items()), columns=['pais', nombre_resultado])
-    df['sector'] = CODS_NACE.get(cod_nace, 'Desconocido')
-    df['periodo'] = obtener_anno_display(content)
-    
-    return df
+    return _dataframe_valores(entrada['valores'], entrada.get('periodo'), cod_nace, nombre_resultado)
 
 def procesar_contents(ruta_crudos, ruta_filtered, nombre_resultado):
     """
@@ -84,7 +68,11 @@ def procesar_contents(ruta_crudos, ruta_filtered, nombre_resultado):
     for anno, cods_nace in json_contents.items():
         for cod_nace, content in cods_nace.items():
         # La función siempre devuelve un DF, aunque esté vacío, así que podemos añadirlo directamente.
-            df_content = extraer_datos_de_html(content, cod_nace, nombre_resultado)
+        # Cada entrada es el HTML de la página o, si se recogió en modo 'datos', los valores capturados.
+            if isinstance(content, dict):
+                df_content = extraer_datos_capturados(content, cod_nace, nombre_resultado)
+            else:
+                df_content = extraer_datos_de_html(content, cod_nace, nombre_resultado)
             if not df_content.empty:
                 lista_dataframes.append(df_content)
                 # else
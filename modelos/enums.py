@@ -0,0 +1,48 @@
+from enum import Enum
+
+# Enums del dominio. Este módulo no depende de nada más para que la API y los
+# modelos de base de datos puedan importarlo sin cargar la ingesta.
+
+
+class Dimension(Enum):
+    # TODO HAY QUE CORREGIR LA ERRATA DE INOVACCIÓN
+    EMPRENDIMIENTO_E_INNOVACION = 'Apoyo al emprendimiento e innovacción'
+    CAPITAL_HUMANO = 'Capital humano'
+    ECOSISTEMA_Y_COLABORACION = 'Ecosistema y colaboración'
+    INFRAESTRUCTURA_DIGITAL = 'Infraestructura digital'
+    SERVICIOS_PUBLICOS_DIGITALES = 'Servicios públicos digitales'
+    SOSTENIBILIDAD_DIGITAL = 'Sostenibilidad digital'
+    TRANSFORMACION_DIGITAL = 'Transformación digital empresarial'
+
+
+class Subdimension(Enum):
+    ACCESO_FINANCIACION = 'Acceso a financiación'
+    DINAMISMO_EMPRENDEDOR = 'Dinamismo emprendedor'
+    INFRAESTRUCTURA_APOYO = 'Infraestructura de apoyo'
+    POLITICAS_FOMENTO = 'Políticas públicas de fomento'
+    COMPETENCIAS_DIGITALES = 'Competencias digitales de la población'
+    FORMACION_CONTINUA = 'Formación continua y reciclaje profesional'
+    TALENTO_PROFESIONAL = 'Talento profesional TIC'
+    ATRACTIVO_ECOSISTEMA = 'Atractivo y dinamismo del ecosistema'
+    PROVISION_TECNOLOGICA = 'Entorno de provisión tecnológica'
+    TRANSFERENCIA_CONOCIMIENTO = 'Transferencia de conocimiento'
+    ACCESO_INFRAESTRUCTURAS = 'Acceso a infraestructuras'
+    DISPONIBILIDAD_SERVICIOS_DIGITALES = 'Disponibilidad de servicios públicos digitales'
+    INTEGRACION_ADMINISTRACION = 'Interacción digital con la administración'
+    ECONOMIA_CIRCULAR = 'Economía circular y estrategias verdes'
+    HUELLA_AMBIENTAL = 'Eficiencia y huella ambiental'
+    ORGANIZACION_DIGITAL = 'Cultura de organización digital'
+    DIGITALIZACION_BASICA = 'Digitalización básica'
+    E_COMMERCE = 'E-commerce'
+    TECNOLOGIAS_AVANZADAS = 'Tecnologías avanzadas'
+    
+
+class RolDato(Enum):
+    NUMERADOR = "numerador"
+    DENOMINADOR = "denominador"
+    VALOR_A_ESCALAR = "valor_a_escalar"
+    VALOR_BASE = "valor_base"
+    MINIMO_ESCALA = "minimo_escala"
+    MAXIMO_ESCALA = "maximo_escala"
+    VALOR_A_AGREGAR = "valor_a_agregar"
+    INDICE_A_PROMEDIAR = "indice_a_promediar"
@@ -1,60 +1,12 @@
 from dataclasses import dataclass, field
-from enum import Enum
 from pathlib import Path
-import pandas as pd
-
-from microservicio_ingesta.scripts.processing.process_eurostat.process_all import process_data_eurostat, process_data_poblacion_por_edad
-from microservicio_ingesta.scripts.processing.process_ine.process_all import process_data_ine
-from microservicio_ingesta.scripts.processing.process_cnmc.process_all import process_data_cnmc, calcular_precio_mensual_cnmc
-from microservicio_ingesta.scripts.processing.process_digital_decade.process_all import process_data_digital_decade
-
-from microservicio_ingesta.scripts.ingestion.collect_ine.scrapping_pc_axis import descargar_tabla_por_id
-from microservicio_ingesta.scripts.ingestion.collect_base.collect_api import collect_data_api
-from microservicio_ingesta.scripts.ingestion.collect_base.collect_digital_decade import recoger_digital
-
-
-class Dimension(Enum):
-    # TODO HAY QUE CORREGIR LA ERRATA DE INOVACCIÓN
-    EMPRENDIMIENTO_E_INNOVACION = 'Apoyo al emprendimiento e innovacción'
-    CAPITAL_HUMANO = 'Capital humano'
-    ECOSISTEMA_Y_COLABORACION = 'Ecosistema y colaboración'
-    INFRAESTRUCTURA_DIGITAL = 'Infraestructura digital'
-    SERVICIOS_PUBLICOS_DIGITALES = 'Servicios públicos digitales'
-    SOSTENIBILIDAD_DIGITAL = 'Sostenibilidad digital'
-    TRANSFORMACION_DIGITAL = 'Transformación digital empresarial'
-
-
-class Subdimension(Enum):
-    ACCESO_FINANCIACION = 'Acceso a financiación'
-    DINAMISMO_EMPRENDEDOR = 'Dinamismo emprendedor'
-    INFRAESTRUCTURA_APOYO = 'Infraestructura de apoyo'
-    POLITICAS_FOMENTO = 'Políticas públicas de fomento'
-    COMPETENCIAS_DIGITALES = 'Competencias digitales de la población'
-    FORMACION_CONTINUA = 'Formación continua y reciclaje profesional'
-    TALENTO_PROFESIONAL = 'Talento profesional TIC'
-    ATRACTIVO_ECOSISTEMA = 'Atractivo y dinamismo del ecosistema'
-    PROVISION_TECNOLOGICA = 'Entorno de provisión tecnológica'
-    TRANSFERENCIA_CONOCIMIENTO = 'Transferencia de conocimiento'
-    ACCESO_INFRAESTRUCTURAS = 'Acceso a infraestructuras'
-    DISPONIBILIDAD_SERVICIOS_DIGITALES = 'Disponibilidad de servicios públicos digitales'
-    INTEGRACION_ADMINISTRACION = 'Interacción digital con la administración'
-    ECONOMIA_CIRCULAR = 'Economía circular y estrategias verdes'
-    HUELLA_AMBIENTAL = 'Eficiencia y huella ambiental'
-    ORGANIZACION_DIGITAL = 'Cultura de organización digital'
-    DIGITALIZACION_BASICA = 'Digitalización básica'
-    E_COMMERCE = 'E-commerce'
-    TECNOLOGIAS_AVANZADAS = 'Tecnologías avanzadas'
-    
 
-class RolDato(Enum):
-    NUMERADOR = "numerador"
-    DENOMINADOR = "denominador"
-    VALOR_A_ESCALAR = "valor_a_escalar"
-    VALOR_BASE = "valor_base"
-    MINIMO_ESCALA = "minimo_escala"
-    MAXIMO_ESCALA = "maximo_escala"
-    VALOR_A_AGREGAR = "valor_a_agregar"
-    INDICE_A_PROMEDIAR = "indice_a_promediar"
+# Reexportados desde modelos.enums (antes se definían aquí)
+from modelos.enums import Dimension, Subdimension, RolDato
+
+# Las funciones de recogida y procesado (pandas, pyaxis, BeautifulSoup,
+# playwright...) se importan dentro de cada método: importar este módulo solo
+# para las clases no debe arrastrar toda la ingesta.
 
 
 @dataclass(frozen=True)
@@ -123,6 +75,8 @@ class Processor_digital_decade(Processor_base):
     _EXTENSION_FILTERED: str = 'csv'
 
     def procesar(self):
+        from microservicio_ingesta.scripts.processing.process_digital_decade.process_all import process_data_digital_decade
+
         process_data_digital_decade(
             self.ruta_datos_crudos, 
             self.ruta_datos_filtered,
@@ -143,6 +97,8 @@ class Processor_eurostat(Processor_base):
     _EXTENSION_FILTERED: str = 'csv'
 
     def processar(self):
+        from microservicio_ingesta.scripts.processing.process_eurostat.process_all import process_data_eurostat
+
         process_data_eurostat(
             self.ruta_datos_crudos,
             self.ruta_datos_unfiltered,
@@ -153,6 +109,8 @@ class Processor_eurostat(Processor_base):
         return super().procesar()
     
     def depurar_datos_franjas_edad(self):
+        from microservicio_ingesta.scripts.processing.process_eurostat.process_all import process_data_poblacion_por_edad
+
         process_data_poblacion_por_edad(
             self.ruta_datos_crudos,
             self.ruta_datos_unfiltered,
@@ -180,6 +138,8 @@ class Processor_ine(Processor_base):
     _EXTENSION_FILTERED: str = 'csv'
 
     def procesar(self):
+        from microservicio_ingesta.scripts.processing.process_ine.process_all import process_data_ine
+
         process_data_ine(
             self.ruta_datos_crudos, 
             self.ruta_datos_unfiltered, 
@@ -209,6 +169,8 @@ class Processor_cnmc(Processor_base):
     _EXTENSION_FILTERED: str = 'csv'
 
     def procesar(self):
+        from microservicio_ingesta.scripts.processing.process_cnmc.process_all import process_data_cnmc
+
         process_data_cnmc(
             self.ruta_datos_crudos,
             self.ruta_datos_unfiltered,
@@ -221,6 +183,8 @@ class Processor_cnmc(Processor_base):
         return super().procesar()
     
     def obtener_precio_mensual(self):
+        from microservicio_ingesta.scripts.processing.process_cnmc.process_all import calcular_precio_mensual_cnmc
+
         calcular_precio_mensual_cnmc(
             self.ruta_datos_crudos,
             self.ruta_datos_unfiltered,
@@ -246,6 +210,8 @@ class Processor_macro(Processor_base):
 
     # Check a esta función por semi-inutilidad
     def procesar(self):
+        import pandas as pd
+
         df = pd.read_csv(self.ruta_datos_crudos)
         df = df.rename(columns={self.nombre_antiguo: self.nombre_resultado, 'Año': 'periodo'})
         df['Euros'] = df['Euros'] / 12
@@ -261,7 +227,9 @@ class Collector_base:
     indicador: Indicador | None = None
 
     def recoger(self):
-        collect_data_api(
+        from microservicio_ingesta.scripts.ingestion.collect_base.collect_api import collect_data_api
+
+        return collect_data_api(
             self.url,
             self.nombre_archivo,
             self.ruta_datos_crudos
@@ -280,7 +248,9 @@ class Collector_ine():
         self.ruta_datos_crudos = Path("data") / "raw" / "ine"
 
     def recoger(self):
-        descargar_tabla_por_id(
+        from microservicio_ingesta.scripts.ingestion.collect_ine.scrapping_pc_axis import descargar_tabla_por_id
+
+        return descargar_tabla_por_id(
             self.id,
             self.nombre_archivo,
             self.ruta_datos_crudos,
@@ -300,7 +270,9 @@ class Collector_digital_decade:
         self.nombre_archivo += self.extension
 
     def recoger(self):
-        recoger_digital(self.empresa, self.url, self.ruta_datos_crudos, self.nombre_archivo)
+        from microservicio_ingesta.scripts.ingestion.collect_base.collect_digital_decade import recoger_digital
+
+        return recoger_digital(self.empresa, self.url, self.ruta_datos_crudos, self.nombre_archivo)
 
 @dataclass
 class Collector_eurostat(Collector_base):